@@ -1,22 +1,24 @@
 #Analisis de Regresion.py
+import os
 import numpy as np
 import statsmodels.api as sm
 import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice
+from math import comb
 from sklearn.linear_model import LinearRegression
+from MotorStepwise import seleccion_stepwise
+from MotorCorrelacion import MotorCorrelacion
+from RegistroModelos import ModeloAjustado
 
-def run_regression_and_display_results(X, y, round_name):
-    model = sm.OLS(y, X).fit()
-    print(f"\nResultados de {round_name}:")
-    # Obtener valores generales del modelo
-    r = model.rsquared ** 0.5  # R
-    r_squared = model.rsquared  # R^2
-    std_error = model.bse.mean()  # Error estándar promedio
-    observations = int(model.nobs)  # Número de observaciones
-    significance = model.f_pvalue  # Significancia del modelo (F-statistic p-value)
-
-    # Coeficientes individuales
-    coef = model.params
-    p_values = model.pvalues
+# Variables cuyo p-valor se muestra en las tablas de cada ronda
+VARIABLES_TABLA = ["pH_CAMPO", "DQO_TOT", "OD_mg/L", "TEMP_AGUA"]
+
+def tabla_resultados(round_name, r_squared, std_error, observations, significance, p_values,
+                     variables=VARIABLES_TABLA):
+    """Texto de la tabla de resultados de una ronda (R, R², error estándar, significancia y p-valores)"""
+    r = r_squared ** 0.5  # R
 
     # Crear lista con la información deseada
     elements = [
@@ -29,7 +31,6 @@ def run_regression_and_display_results(X, y, round_name):
     ]
     
     # Agregar p-valores de cada variable incluida en el modelo
-    variables = ["pH_CAMPO", "DQO_TOT", "OD_mg/L", "TEMP_AGUA"]
     for var in variables:
         elements.append((var, p_values.get(var, 'N/A'), ''))
 
@@ -41,7 +42,7 @@ def run_regression_and_display_results(X, y, round_name):
         if isinstance(val, (int, float)):
             if abs(val) < 1e-6:  # Notación científica para valores muy pequeños
                 return f"{val:.2e}"
-            elif val.is_integer():  # Sin decimales si el número es entero
+            elif float(val).is_integer():  # Sin decimales si el número es entero
                 return str(int(val))
             else:  # Hasta 6 decimales para otros números
                 return f"{val:.6f}"
@@ -50,52 +51,199 @@ def run_regression_and_display_results(X, y, round_name):
     # Aplicar formato a la columna 'Valor'
     df_results['Valor'] = df_results['Valor'].apply(format_value)
 
-    print(df_results)
-    
+    return f"\nResultados de {round_name}:\n{df_results}\n"
+def mostrar_tabla_resultados(round_name, r_squared, std_error, observations, significance, p_values,
+                             variables=VARIABLES_TABLA):
+    print(tabla_resultados(round_name, r_squared, std_error, observations, significance, p_values, variables),
+          end='')
+def run_regression_and_display_results(X, y, round_name):
+    model = sm.OLS(y, X).fit()
+    mostrar_tabla_resultados(
+        round_name,
+        model.rsquared,  # R^2
+        model.bse.mean(),  # Error estándar promedio
+        int(model.nobs),  # Número de observaciones
+        model.f_pvalue,  # Significancia del modelo (F-statistic p-value)
+        model.pvalues,
+    )
     return model
-def stepwise_regression(X, y):
-    X = sm.add_constant(X)
+class ResultadoRegresion:
+    """
+    Resultado de una regresión lineal (paso a paso o directa) como datos, sin texto de por medio:
+    coeficientes, errores, p-valores y diagnósticos del modelo final, y una fila por ronda en
+    `rondas`. Tiene los atributos de statsmodels que usan la interfaz y el modo por lotes
+    (params, bse, tvalues, pvalues, rsquared, nobs, predict...). El texto para leer (tablas
+    por ronda y summary() de statsmodels) se arma solo la primera vez que se llama a resumen().
+    """
 
-    # Ronda 1: Eliminando 'SST'
-    X_ronda_1 = X.drop(columns=['SST'])
-    model_ronda_1 = run_regression_and_display_results(X_ronda_1, y, "Ronda 1")
+    def __init__(self, X, y, seleccion, criterio='p', tabla_inicial=False):
+        self.X = X
+        self.y = y
+        self.seleccion = seleccion
+        self.criterio = criterio
+        self.tabla_inicial = tabla_inicial
+        nombres = list(seleccion.variables)
+        self.params = pd.Series([seleccion.coeficientes[v] for v in nombres], index=nombres, dtype='float64')
+        self.bse = pd.Series([seleccion.errores[v] for v in nombres], index=nombres, dtype='float64')
+        self.tvalues = pd.Series([seleccion.t[v] for v in nombres], index=nombres, dtype='float64')
+        self.pvalues = pd.Series([seleccion.p_valores[v] for v in nombres], index=nombres, dtype='float64')
+        self.rsquared = seleccion.r2
+        self.rsquared_adj = seleccion.r2_ajustado
+        self.f_pvalue = seleccion.f_pvalor
+        self.aic = seleccion.aic
+        self.bic = seleccion.bic
+        self.ssr = seleccion.rss
+        self.nobs = float(seleccion.observaciones)
+        self.df_resid = self.nobs - len(nombres)
+        self.rondas = self._tabla_rondas()
+        self._ajustados = None
+        self._statsmodels = None
+        self._resumen = None
 
-    # Ronda 2: Eliminando la variable con el P>|t| más alto en la Ronda 1
-    var_to_remove_ronda_2 = model_ronda_1.pvalues[1:].idxmax()  # Excluye el p-valor del intercepto
-    X_ronda_2 = X_ronda_1.drop(columns=[var_to_remove_ronda_2])
-    model_ronda_2 = run_regression_and_display_results(X_ronda_2, y, "Ronda 2")
+    @property
+    def variables_seleccionadas(self):
+        return [v for v in self.params.index if v != 'const']
 
-    # Ronda 3: Eliminando la variable con el P>|t| más alto en la Ronda 2
-    var_to_remove_ronda_3 = model_ronda_2.pvalues[1:].idxmax()  # Excluye el p-valor del intercepto
-    X_ronda_3 = X_ronda_2.drop(columns=[var_to_remove_ronda_3])
-    model_ronda_3 = run_regression_and_display_results(X_ronda_3, y, "Ronda 3")
-    print(model_ronda_3.summary())
+    def _tabla_rondas(self):
+        """Una fila por ronda con la variable que entró o salió y los diagnósticos del modelo resultante"""
+        filas = []
+        for ronda, paso in enumerate(self.seleccion.pasos, start=1):
+            modelo = paso['modelo']
+            fila = {'ronda': ronda, 'accion': paso['accion'], 'variable': paso['variable'], 'valor': paso['valor'],
+                    'r2': modelo.r2, 'r2_ajustado': modelo.r2_ajustado,
+                    'error_estandar': np.mean(list(modelo.errores.values())),
+                    'observaciones': modelo.observaciones, 'f_pvalor': modelo.f_pvalor,
+                    'aic': modelo.aic, 'bic': modelo.bic}
+            for variable in ['const'] + list(self.seleccion.candidatas):
+                fila[f'p_{variable}'] = modelo.p_valores.get(variable, np.nan)
+            filas.append(fila)
+        return pd.DataFrame(filas)
 
-    return model_ronda_3  # Devuelve el último modelo
-def calculate_correlation_matrix(data, target_column='DBO5'):
+    def _diseno(self, X):
+        diseno = np.asarray(X[self.variables_seleccionadas], dtype=np.float64) if hasattr(X, 'columns') \
+            else np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        if 'const' in self.params.index and diseno.shape[1] == len(self.params) - 1:
+            diseno = np.column_stack([np.ones(len(diseno)), diseno])
+        return diseno
+
+    @property
+    def fittedvalues(self):
+        if self._ajustados is None:
+            ajustados = self._diseno(self.X) @ self.params.to_numpy()
+            self._ajustados = pd.Series(ajustados, index=self.y.index) if hasattr(self.y, 'index') else ajustados
+        return self._ajustados
+
+    @property
+    def resid(self):
+        return self.y - self.fittedvalues
+
+    def predict(self, exog=None):
+        """Valores ajustados, o predicción para `exog` (con o sin la columna de la constante)"""
+        if exog is None:
+            return self.fittedvalues
+        return self._diseno(exog) @ self.params.to_numpy()
+
+    @property
+    def modelo_statsmodels(self):
+        """Ajuste de statsmodels del modelo elegido; se construye solo si se pide"""
+        if self._statsmodels is None:
+            X = self.X[self.variables_seleccionadas]
+            if 'const' in self.params.index:
+                X = sm.add_constant(X, has_constant='add')
+            self._statsmodels = sm.OLS(self.y, X).fit()
+        return self._statsmodels
+
+    def resumen(self):
+        """Texto con la tabla de cada ronda y el summary() del modelo final (se arma una sola vez)"""
+        if self._resumen is None:
+            partes = []
+            if self.tabla_inicial:
+                partes.append(tabla_resultados("Ronda 1", self.rsquared, self.bse.mean(), int(self.nobs),
+                                               self.f_pvalue, self.pvalues))
+            etiqueta = "P>|t|" if self.criterio == 'p' else self.criterio.upper()
+            for paso, (ronda, fila) in zip(self.seleccion.pasos, self.rondas.iterrows()):
+                accion = "Agregando" if paso['accion'] == 'agregar' else "Eliminando"
+                partes.append(f"\nRonda {ronda + 1}: {accion} '{paso['variable']}' ({etiqueta} = {paso['valor']:.6g})\n")
+                modelo = paso['modelo']
+                partes.append(tabla_resultados(f"Ronda {ronda + 1}", modelo.r2, fila['error_estandar'],
+                                               modelo.observaciones, modelo.f_pvalor, modelo.p_valores,
+                                               self.seleccion.candidatas))
+            partes.append(f"{self.modelo_statsmodels.summary()}\n")
+            self._resumen = "".join(partes)
+        return self._resumen
+def regresion_paso_a_paso(X, y, direccion='backward', criterio='p', umbral=None):
+    """
+    Selección paso a paso con MotorStepwise: por defecto elimina hacia atrás la variable
+    con el P>|t| más alto mientras supere 0.05. `criterio` puede ser 'p', 'aic' o 'bic'
+    y `direccion` 'backward', 'forward' o 'bidirectional'. Devuelve un ResultadoRegresion.
     """
-    Calcula y devuelve la matriz de correlación de Pearson entre las variables seleccionadas
-    y la variable objetivo (DBO5).
+    # Los datos limpios se guardan en float32; el ajuste se hace en float64
+    X = X.astype('float64')
+    y = y.astype('float64')
+    seleccion = seleccion_stepwise(X, y, direccion=direccion, criterio=criterio, umbral=umbral)
+    return ResultadoRegresion(X, y, seleccion, criterio)
+def regresion_directa(X, y):
+    """Regresión con todas las columnas de X (sin selección) como ResultadoRegresion"""
+    X = (X.to_frame() if hasattr(X, 'to_frame') else X).astype('float64')
+    y = y.astype('float64')
+    seleccion = seleccion_stepwise(X, y, fijas=list(X.columns))
+    return ResultadoRegresion(X, y, seleccion, tabla_inicial=True)
+def stepwise_regression(X, y, direccion='backward', criterio='p', umbral=None):
+    """Igual que regresion_paso_a_paso, pero imprime las rondas y devuelve el modelo de statsmodels"""
+    resultado = regresion_paso_a_paso(X, y, direccion=direccion, criterio=criterio, umbral=umbral)
+    print(resultado.resumen(), end='')
+    return resultado.modelo_statsmodels
+def texto_correlacion(resultado, target_column='DBO5'):
+    """Texto de un ResultadoCorrelacion: cada variable contra el objetivo, con p-valor y filas usadas"""
+    tabla = resultado.contra(target_column).to_string(float_format=lambda v: f"{v:.6g}")
+    return (f"\nMatriz de correlación de {resultado.metodo.capitalize()} entre las variables seleccionadas y "
+            f"{target_column} :\n{tabla}\n")
+def calculate_correlation_matrix(data, target_column='DBO5', metodo='pearson', motor=None):
+    """
+    Calcula y devuelve la matriz de correlación (pearson, spearman o kendall) entre las
+    variables seleccionadas y la variable objetivo (DBO5). Si se pasa un MotorCorrelacion
+    ya sincronizado con los datos, se reutilizan sus momentos acumulados y su caché.
     """
     # Seleccionar las variables específicas para la correlación
     selected_columns = ['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA', target_column]
-    correlation_matrix = data[selected_columns].corr(method='pearson')
+    if motor is None:
+        motor = MotorCorrelacion(selected_columns).agregar(data[selected_columns])
+    resultado = motor.correlacion(metodo, selected_columns)
     
-    # Imprimir la matriz de correlación solo con las variables seleccionadas
-    print("\nMatriz de correlación de Pearson entre las variables seleccionadas y", target_column, ":")
-    print(correlation_matrix[[target_column]].sort_values(by=target_column, ascending=False))
+    # Imprimir la correlación de cada variable con el objetivo, con su p-valor
+    print(texto_correlacion(resultado, target_column), end='')
     
-    return correlation_matrix
-def calcular_BOD5(OD, DQO):
+    return resultado.r
+def calcular_BOD5(OD, DQO, modelo=None):
+    """
+    Calcula BOD5 con el modelo OD + DQO. Sin `modelo` usa los coeficientes publicados
+    (BOD5 = -6.6283 * OD + 0.3407 * DQO + 21.3075); con un ModeloAjustado del
+    registro usa los coeficientes ajustados a los datos cargados.
     """
-    Calcula BOD5 usando la ecuación: BOD5 = 0.498992 * TSS + 0.052154 * OD_mg/L + 1013197
+    if modelo is None:
+        modelo = ModeloAjustado.publicado('dbo5_od_dqo')
+    return modelo.predecir(OD, DQO)
+def metricas_prediccion(observado, predicho):
     """
-    return -6.6283 * OD + 0.3407 * DQO + 21.3075
-def calcular_BOD5_OD(OD):
+    Métricas de error de una predicción: MAE, RMSE y R² (con respecto a la media observada)
     """
-    Calcula BOD5 usando la ecuación: BOD5 = 0.498992 * TSS + 0.052154 * OD_mg/L + 1013197
+    observado = np.asarray(observado, dtype=np.float64)
+    errores = observado - np.asarray(predicho, dtype=np.float64)
+    suma_total = np.sum((observado - np.mean(observado))**2)
+    return {
+        'n': int(len(observado)),
+        'mae': float(np.mean(np.abs(errores))),
+        'rmse': float(np.sqrt(np.mean(errores**2))),
+        'r2': float(1 - np.sum(errores**2) / suma_total) if suma_total > 0 else float('nan'),
+    }
+def calcular_BOD5_OD(OD, modelo=None):
     """
-    return 0.3597 * OD  + 1.0979
+    Calcula BOD5 con el modelo de una sola variable (DQO). Sin `modelo` usa los
+    coeficientes publicados (BOD5 = 0.3597 * DQO + 1.0979).
+    """
+    if modelo is None:
+        modelo = ModeloAjustado.publicado('dbo5_dqo')
+    return modelo.predecir(OD)
 def prediccion_cod(COD, BOD5_observado):
     model = LinearRegression()  # Crear el modelo de regresión lineal
     model.fit(COD.reshape(-1, 1), BOD5_observado)  # Ajustar el modelo a los datos
@@ -112,28 +260,129 @@ def prediccion_sst(COD, BOD5_observado, COD_range):
     BOD5_linea = model.predict(COD_range)  # Predicción de la línea de regresión
     
     return model, BOD5_predicho, BOD5_linea
-def stepwise_regression_dqo(X, y):
-    X = sm.add_constant(X)
+def stepwise_regression_dqo(X, y, direccion='backward', criterio='p', umbral=None):
+    return stepwise_regression(X, y, direccion=direccion, criterio=criterio, umbral=umbral)
+def stepwise_regression_od(X, y):
+    resultado = regresion_directa(X, y)
+    print(resultado.resumen(), end='')
+
+    return resultado.modelo_statsmodels  # Devuelve el último modelo
+# Búsqueda exhaustiva de subconjuntos: los lotes de este tamaño se resuelven juntos
+# y a partir de UMBRAL_PROCESOS_SUBCONJUNTOS candidatos se reparten entre procesos
+TAMANO_LOTE_SUBCONJUNTOS = 20000
+UMBRAL_PROCESOS_SUBCONJUNTOS = 200000
+CRITERIOS_SUBCONJUNTOS = {'r2_ajustado': False, 'aic': True, 'bic': True, 'cp': True}  # True: menor es mejor
+
+def _resolver_subconjuntos(gram, xty, yty, indices):
+    """
+    Ajusta de una vez todos los subconjuntos de `indices` (forma (m, k), incluye la constante)
+    resolviendo los sistemas G[S,S] b = X'y[S] como un arreglo apilado. Devuelve (indices, RSS de
+    cada uno), así el resultado llega emparejado con su lote aunque venga de otro proceso.
+    """
+    G = gram[indices[:, :, None], indices[:, None, :]]
+    g = xty[indices]
+    try:
+        b = np.linalg.solve(G, g[..., None])[..., 0]
+        rss = yty - np.einsum('ij,ij->i', b, g)
+    except np.linalg.LinAlgError:
+        # Algún subconjunto es colineal: se resuelven uno por uno con mínimos cuadrados
+        rss = np.empty(len(indices))
+        for i in range(len(indices)):
+            b = np.linalg.lstsq(G[i], g[i], rcond=None)[0]
+            rss[i] = yty - b @ g[i]
+    return indices, np.maximum(rss, 0.0)
 
-    # Ronda 1: Eliminando 'SST'
-    X_ronda_1 = X.drop(columns=['SST'])
-    model_ronda_1 = run_regression_and_display_results(X_ronda_1, y, "Ronda 1")
+# X'X, X'y e y'y de la búsqueda en curso dentro de cada proceso trabajador (se envían una sola vez)
+_estadisticas_subconjuntos = None
 
-    # Ronda 2: Eliminando la variable con el P>|t| más alto en la Ronda 1
-    var_to_remove_ronda_2 = model_ronda_1.pvalues[1:].idxmax()  # Excluye el p-valor del intercepto
-    X_ronda_2 = X_ronda_1.drop(columns=[var_to_remove_ronda_2])
-    model_ronda_2 = run_regression_and_display_results(X_ronda_2, y, "Ronda 2")
+def _iniciar_trabajador_subconjuntos(gram, xty, yty):
+    global _estadisticas_subconjuntos
+    _estadisticas_subconjuntos = (gram, xty, yty)
 
-    # Ronda 3: Eliminando la variable con el P>|t| más alto en la Ronda 2
-    var_to_remove_ronda_3 = model_ronda_2.pvalues[1:].idxmax()  # Excluye el p-valor del intercepto
-    X_ronda_3 = X_ronda_2.drop(columns=[var_to_remove_ronda_3])
-    model_ronda_3 = run_regression_and_display_results(X_ronda_3, y, "Ronda 3")
-    print(model_ronda_3.summary())
+def _resolver_en_trabajador(indices):
+    return _resolver_subconjuntos(*_estadisticas_subconjuntos, indices)
 
-    return model_ronda_3  # Devuelve el último modelo
-def stepwise_regression_od(X, y):
-    X = sm.add_constant(X)
-    model_ronda_1 = run_regression_and_display_results(X, y, "Ronda 1")
-    print(model_ronda_1.summary())
+def _lotes_subconjuntos(p, max_variables, tamano_lote):
+    for k in range(1, max_variables + 1):
+        combinaciones = combinations(range(1, p + 1), k)
+        while True:
+            lote = list(islice(combinaciones, tamano_lote))
+            if not lote:
+                break
+            # La columna 0 (constante) va en todos los subconjuntos
+            yield np.column_stack([np.zeros(len(lote), dtype=np.intp), np.array(lote, dtype=np.intp)])
+
+def _tabla_subconjuntos(indices, rss, nombres, n, tss, sigma2):
+    # Métricas de ajuste de un lote de subconjuntos a partir de su RSS
+    nombres_columnas = np.array([None] + nombres, dtype=object)
+    k = indices.shape[1]  # Parámetros, incluyendo la constante
+    r2 = 1 - rss / tss
+    log_l = -n / 2 * (np.log(2 * np.pi * np.maximum(rss, 1e-300) / n) + 1)
+    return pd.DataFrame({
+        'variables': list(map(tuple, nombres_columnas[indices[:, 1:]])),
+        'num_variables': k - 1,
+        'rss': rss,
+        'r2': r2,
+        'r2_ajustado': 1 - (1 - r2) * (n - 1) / (n - k),
+        'aic': -2 * log_l + 2 * k,
+        'bic': -2 * log_l + k * np.log(n),
+        'cp': rss / sigma2 - n + 2 * k,
+    })
+
+def best_subset_regression(X, y, max_variables=None, procesos=None, tamano_lote=TAMANO_LOTE_SUBCONJUNTOS):
+    """
+    Ajusta todos los subconjuntos de predictores (siempre con constante) a partir de X'X y X'y
+    calculados una sola vez, y devuelve un DataFrame con R², R² ajustado, AIC, BIC y Cp de Mallows
+    por subconjunto, ordenado por BIC.
+    """
+    nombres = [str(c) for c in X.columns]
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, p = X.shape
+    if max_variables is None:
+        max_variables = p
+    max_variables = min(max_variables, p, n - 2)
+
+    # Escalar las columnas mejora el condicionamiento de X'X sin cambiar RSS
+    diseño = np.column_stack([np.ones(n), X])
+    escala = np.linalg.norm(diseño, axis=0)
+    escala[escala == 0] = 1.0
+    diseño = diseño / escala
+    gram = diseño.T @ diseño
+    xty = diseño.T @ y
+    yty = float(y @ y)
+    tss = float(((y - y.mean()) ** 2).sum())
+
+    # Varianza del error del modelo completo para el Cp de Mallows
+    rss_completo = float(_resolver_subconjuntos(gram, xty, yty, np.arange(p + 1)[None, :])[1][0])
+    sigma2 = rss_completo / (n - p - 1) if n > p + 1 else np.nan
+
+    total = sum(comb(p, k) for k in range(1, max_variables + 1))
+    lotes = _lotes_subconjuntos(p, max_variables, tamano_lote)
+    if procesos is None:
+        procesos = 1 if total < UMBRAL_PROCESOS_SUBCONJUNTOS else None
+    if procesos == 1:
+        resultados = (_resolver_subconjuntos(gram, xty, yty, indices) for indices in lotes)
+        filas = [_tabla_subconjuntos(indices, rss, nombres, n, tss, sigma2) for indices, rss in resultados]
+    else:
+        # X'X llega a cada proceso una sola vez (initializer) y solo hay 2 lotes por proceso en
+        # vuelo: el siguiente lote se genera cuando el más antiguo termina y se resume en su tabla
+        trabajadores = procesos or os.cpu_count() or 1
+        filas = []
+        with ProcessPoolExecutor(max_workers=trabajadores, initializer=_iniciar_trabajador_subconjuntos,
+                                 initargs=(gram, xty, yty)) as pool:
+            pendientes = deque()
+            for indices in lotes:
+                pendientes.append(pool.submit(_resolver_en_trabajador, indices))
+                if len(pendientes) >= 2 * trabajadores:
+                    filas.append(_tabla_subconjuntos(*pendientes.popleft().result(), nombres, n, tss, sigma2))
+            while pendientes:
+                filas.append(_tabla_subconjuntos(*pendientes.popleft().result(), nombres, n, tss, sigma2))
+
+    resultado = pd.concat(filas, ignore_index=True)
+    return resultado.sort_values('bic', kind='stable', ignore_index=True)
 
-    return model_ronda_1  # Devuelve el último modelo
+def mejores_subconjuntos(resultado, top=5):
+    """Los `top` mejores subconjuntos según cada criterio (R² ajustado, AIC, BIC y Cp)"""
+    return {criterio: resultado.sort_values(criterio, ascending=menor_es_mejor, kind='stable').head(top)
+            for criterio, menor_es_mejor in CRITERIOS_SUBCONJUNTOS.items()}
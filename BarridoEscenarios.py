@@ -0,0 +1,89 @@
+# BarridoEscenarios.py - Evaluación de un modelo ajustado sobre una malla de escenarios y bandas de calidad
+import numpy as np
+
+# Bandas de calidad del agua según la DBO5 (mg/L): límite superior, etiqueta y color
+BANDAS_CALIDAD = (
+    (3, "🟢 Excelente (Agua muy limpia)", "#27ae60"),
+    (6, "🟡 Buena (Agua limpia)", "#f39c12"),
+    (30, "🟠 Aceptable (Algo contaminada)", "#e67e22"),
+    (100, "🔴 Contaminada", "#e74c3c"),
+    (np.inf, "⚫ Muy contaminada", "#2c3e50"),
+)
+LIMITES_CALIDAD = np.array([limite for limite, _, _ in BANDAS_CALIDAD[:-1]], dtype=np.float64)
+# Clase reservada para predicciones no finitas (NaN por datos faltantes, infinitos)
+SIN_CLASE = len(BANDAS_CALIDAD)
+SIN_CALIDAD = ("⚪ Sin predicción", "#bdc3c7")
+
+# Rangos por defecto de cada predictor cuando no hay datos cargados (mg/L, °C)
+RANGOS_TIPICOS = {
+    'OD_mg/L': (0.0, 10.0),
+    'DQO_TOT': (0.0, 500.0),
+    'SST': (0.0, 500.0),
+    'pH_CAMPO': (6.0, 9.0),
+    'TEMP_AGUA': (10.0, 30.0),
+}
+RESOLUCION = 500
+
+
+def clasificar_calidad(dbo5):
+    """
+    Índice de banda de calidad (0 = excelente ... 4 = muy contaminada) para un valor
+    o un arreglo de cualquier forma. Los límites son estrictos: 3 mg/L ya es "buena".
+    Los valores no finitos reciben SIN_CLASE en lugar de caer en la última banda.
+    """
+    dbo5 = np.asarray(dbo5, dtype=np.float64)
+    return np.where(np.isfinite(dbo5), np.searchsorted(LIMITES_CALIDAD, dbo5, side='right'), SIN_CLASE)
+
+
+def banda_calidad(dbo5):
+    """Etiqueta y color de la banda de un solo valor de DBO5"""
+    clase = int(clasificar_calidad(dbo5))
+    if clase == SIN_CLASE:
+        return SIN_CALIDAD
+    _, etiqueta, color = BANDAS_CALIDAD[clase]
+    return etiqueta, color
+
+
+class ResultadoBarrido:
+    """Malla evaluada: valores de los dos ejes, DBO5 predicha (filas = eje y) y banda de cada celda"""
+
+    def __init__(self, eje_x, eje_y, valores_x, valores_y, dbo5, fijos):
+        self.eje_x = eje_x
+        self.eje_y = eje_y
+        self.valores_x = valores_x
+        self.valores_y = valores_y
+        self.dbo5 = dbo5
+        self.clases = clasificar_calidad(dbo5)
+        self.fijos = fijos
+
+    def fracciones(self):
+        """Fracción de la malla que cae en cada banda de calidad (las celdas sin predicción no suman)"""
+        conteos = np.bincount(self.clases.ravel(), minlength=SIN_CLASE + 1)
+        return conteos[:SIN_CLASE] / self.clases.size
+
+
+def barrido(modelo, rangos, fijos=None, resolucion=RESOLUCION):
+    """
+    Evalúa `modelo` (ModeloAjustado) sobre una malla de resolucion × resolucion.
+    `rangos` da (mínimo, máximo) de exactamente dos predictores (el primero es el eje x)
+    y `fijos` el valor de los demás predictores del modelo. La malla no se materializa:
+    el eje x entra como fila y el eje y como columna, y la predicción se expande por
+    difusión (broadcasting) en una sola pasada.
+    """
+    fijos = dict(fijos or {})
+    ejes = list(rangos)
+    if len(ejes) != 2:
+        raise ValueError("El barrido necesita exactamente dos predictores con rango")
+    faltantes = [p for p in modelo.predictores if p not in rangos and p not in fijos]
+    if faltantes or any(eje not in modelo.predictores for eje in ejes):
+        raise ValueError(f"El modelo {modelo.nombre} usa {', '.join(modelo.predictores)}; "
+                         f"falta el valor de {', '.join(faltantes) or 'un eje'}")
+    if isinstance(resolucion, int):
+        resolucion = (resolucion, resolucion)
+    valores_x = np.linspace(*rangos[ejes[0]], resolucion[0])
+    valores_y = np.linspace(*rangos[ejes[1]], resolucion[1])
+    columnas = {ejes[0]: valores_x[None, :], ejes[1]: valores_y[:, None]}
+    dbo5 = modelo.predecir(*(columnas.get(p, fijos.get(p)) for p in modelo.predictores))
+    dbo5 = np.broadcast_to(dbo5, (len(valores_y), len(valores_x)))
+    return ResultadoBarrido(ejes[0], ejes[1], valores_x, valores_y, dbo5,
+                            {p: fijos[p] for p in modelo.predictores if p not in rangos})
@@ -0,0 +1,195 @@
+# Bootstrap.py - Intervalos de confianza bootstrap para coeficientes y predicciones de DBO5
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy import stats
+from ConjuntoDatos import ConjuntoDatos
+
+REPETICIONES = 2000
+NIVEL = 0.95
+# Máximo de elementos float64 de la matriz de pesos de un lote (remuestreos × filas, ~32 MB);
+# el número de remuestreos por lote se deriva de él según las filas de los datos
+LIMITE_ELEMENTOS = 4_000_000
+
+
+def tamano_lote(filas, ancho=1):
+    """Remuestreos (o filas del jackknife) por lote para que lote × filas × ancho no pase de LIMITE_ELEMENTOS"""
+    return max(1, LIMITE_ELEMENTOS // max(filas * ancho, 1))
+
+
+def _preparar(X, y, constante):
+    nombres = [str(c) for c in X.columns] if hasattr(X, 'columns') else None
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    if nombres is None:
+        nombres = [f"x{i}" for i in range(X.shape[1])]
+    if constante:
+        X = np.column_stack([np.ones(len(X)), X])
+        nombres = ['const'] + nombres
+    return X, np.asarray(y, dtype=np.float64), nombres
+
+
+def _productos(X, y):
+    """Por fila: x⊗x y x·y aplanados, para sumarlos con pesos en una sola multiplicación"""
+    n, p = X.shape
+    return np.column_stack([(X[:, :, None] * X[:, None, :]).reshape(n, p * p), X * y[:, None]])
+
+
+def _resolver_pesos(productos, pesos, p):
+    """Resuelve por mínimos cuadrados ponderados todos los remuestreos de `pesos` (forma (B, n))"""
+    sumas = pesos @ productos
+    xtx = sumas[:, :p * p].reshape(-1, p, p)
+    xty = sumas[:, p * p:]
+    try:
+        return np.linalg.solve(xtx, xty[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # Un remuestreo degenerado (pocas filas distintas) no debe tirar todo el lote
+        return np.stack([np.linalg.lstsq(a, b, rcond=None)[0] for a, b in zip(xtx, xty)])
+
+
+def _lote_bootstrap(productos, p, n, repeticiones, semilla, lote):
+    generador = np.random.default_rng(semilla)
+    coeficientes = np.empty((repeticiones, p))
+    for inicio in range(0, repeticiones, lote):
+        fin = min(inicio + lote, repeticiones)
+        # Remuestreo con reemplazo expresado como número de veces que se repite cada fila
+        pesos = generador.multinomial(n, np.full(n, 1.0 / n), size=fin - inicio).astype(np.float64)
+        coeficientes[inicio:fin] = _resolver_pesos(productos, pesos, p)
+    return coeficientes
+
+
+def _lote_memmap(ruta, columnas, objetivo, constante, escala, repeticiones, semilla, lote):
+    # El proceso abre el mismo archivo memmap que los demás y arma sus propios productos,
+    # en lugar de recibir por pickle una copia de filas × (p² + p)
+    datos = ConjuntoDatos.abrir_memmap(ruta)
+    X, y, _ = _preparar(datos.tabla(columnas), datos[objetivo], constante)
+    return _lote_bootstrap(_productos(X / escala, y), X.shape[1], len(y), repeticiones, semilla, lote)
+
+
+def _jackknife(X, y):
+    """Coeficientes dejando fuera cada fila, a partir de X'X menos la contribución de la fila"""
+    xtx = X.T @ X
+    xty = X.T @ y
+    coeficientes = np.empty((len(y), X.shape[1]))
+    lote = tamano_lote(X.shape[1], X.shape[1])  # Cada fila del lote es una matriz p × p
+    for inicio in range(0, len(y), lote):
+        fin = min(inicio + lote, len(y))
+        filas = X[inicio:fin]
+        a = xtx - filas[:, :, None] * filas[:, None, :]
+        b = xty - filas * y[inicio:fin, None]
+        coeficientes[inicio:fin] = np.linalg.solve(a, b[..., None])[..., 0]
+    return coeficientes
+
+
+def _intervalos(estimacion, muestras, jackknife, nivel):
+    """Intervalos percentil y BCa por columna de `muestras` (forma (B, m))"""
+    alfa = (1 - nivel) / 2
+    percentil = np.percentile(muestras, [100 * alfa, 100 * (1 - alfa)], axis=0)
+
+    # Corrección de sesgo: proporción de remuestreos por debajo de la estimación
+    proporcion = (np.sum(muestras < estimacion, axis=0) + 0.5 * np.sum(muestras == estimacion, axis=0)) / len(muestras)
+    z0 = stats.norm.ppf(np.clip(proporcion, 1e-10, 1 - 1e-10))
+
+    # Aceleración a partir del jackknife
+    desvio = jackknife.mean(axis=0) - jackknife
+    denominador = 6 * np.sum(desvio ** 2, axis=0) ** 1.5
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aceleracion = np.where(denominador > 0, np.sum(desvio ** 3, axis=0) / denominador, 0.0)
+
+    bca = []
+    for z_alfa in stats.norm.ppf([alfa, 1 - alfa]):
+        ajustado = stats.norm.cdf(z0 + (z0 + z_alfa) / (1 - aceleracion * (z0 + z_alfa)))
+        bca.append([np.percentile(muestras[:, j], 100 * q) for j, q in enumerate(ajustado)])
+    return percentil, np.array(bca)
+
+
+class ResultadoBootstrap:
+    """Remuestreos de coeficientes (y de predicciones, si se pidieron) con sus intervalos"""
+
+    def __init__(self, nombres, coeficientes, muestras, intervalos, predicciones=None,
+                 muestras_prediccion=None, intervalos_prediccion=None, nivel=NIVEL):
+        self.nombres = nombres
+        self.coeficientes = coeficientes
+        self.muestras = muestras
+        self.intervalos = intervalos
+        self.predicciones = predicciones
+        self.muestras_prediccion = muestras_prediccion
+        self.intervalos_prediccion = intervalos_prediccion
+        self.nivel = nivel
+
+
+def _tabla(indice, estimacion, muestras, percentil, bca):
+    return pd.DataFrame({
+        'estimacion': estimacion,
+        'error_estandar': muestras.std(axis=0, ddof=1),
+        'percentil_inf': percentil[0],
+        'percentil_sup': percentil[1],
+        'bca_inf': bca[0],
+        'bca_sup': bca[1],
+    }, index=indice)
+
+
+def bootstrap_regresion(X, y, repeticiones=REPETICIONES, nivel=NIVEL, X_nuevo=None, procesos=1,
+                        semilla=None, constante=True, lote=None, datos=None):
+    """
+    Bootstrap de pares para una regresión lineal. Cada remuestreo es un vector de
+    pesos (cuántas veces entra cada fila), así que los ajustes de un lote salen de
+    una sola multiplicación pesos × [x⊗x, x·y] y un np.linalg.solve apilado.
+    Con procesos > 1 los remuestreos se reparten entre procesos con semillas independientes.
+    `lote` fija cuántos remuestreos se resuelven juntos; por defecto sale de LIMITE_ELEMENTOS
+    y del número de filas, así la memoria de la matriz de pesos no crece con los datos.
+    `datos` es el ConjuntoDatos del que salen X (con sus columnas) e y (con su nombre); si
+    está abierto con memmap, cada proceso lee el mismo archivo en lugar de recibir una copia.
+    Devuelve intervalos percentil y BCa de los coeficientes y, si se da X_nuevo,
+    de la DBO5 predicha en esos puntos.
+    """
+    y_original = y
+    X, y, nombres = _preparar(X, y, constante)
+    n, p = X.shape
+    lote = lote or tamano_lote(n)
+
+    # Columnas escaladas a norma 1 para que los sistemas estén bien condicionados
+    escala = np.linalg.norm(X, axis=0)
+    escala[escala == 0] = 1.0
+    Xs = X / escala
+    estimacion = np.linalg.lstsq(Xs, y, rcond=None)[0] / escala
+
+    semillas = np.random.SeedSequence(semilla).spawn(max(procesos, 1))
+    partes = [len(r) for r in np.array_split(np.arange(repeticiones), max(procesos, 1)) if len(r)]
+    # Los procesos solo pueden abrir el archivo si X e y son columnas completas del conjunto
+    memmap = (datos is not None and datos.ruta is not None and len(datos) == n
+              and all(c in datos for c in nombres[constante:]) and getattr(y_original, 'name', None) in datos)
+    if procesos > 1 and memmap:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            tareas = [pool.submit(_lote_memmap, datos.ruta, nombres[constante:], y_original.name, constante,
+                                  escala, parte, s, lote) for parte, s in zip(partes, semillas)]
+            muestras = np.concatenate([t.result() for t in tareas])
+    elif procesos > 1:
+        productos = _productos(Xs, y)
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            tareas = [pool.submit(_lote_bootstrap, productos, p, n, parte, s, lote)
+                      for parte, s in zip(partes, semillas)]
+            muestras = np.concatenate([t.result() for t in tareas])
+    else:
+        muestras = _lote_bootstrap(_productos(Xs, y), p, n, repeticiones, semillas[0], lote)
+
+    muestras /= escala
+    jackknife = _jackknife(Xs, y) / escala
+    percentil, bca = _intervalos(estimacion, muestras, jackknife, nivel)
+    intervalos = _tabla(nombres, estimacion, muestras, percentil, bca)
+
+    resultado = ResultadoBootstrap(nombres, estimacion, muestras, intervalos, nivel=nivel)
+    if X_nuevo is not None:
+        X_nuevo = np.asarray(X_nuevo, dtype=np.float64)
+        if X_nuevo.ndim == 1:
+            X_nuevo = X_nuevo[:, None]
+        if constante:
+            X_nuevo = np.column_stack([np.ones(len(X_nuevo)), X_nuevo])
+        predicho = X_nuevo @ estimacion
+        muestras_prediccion = muestras @ X_nuevo.T
+        percentil, bca = _intervalos(predicho, muestras_prediccion, jackknife @ X_nuevo.T, nivel)
+        resultado.predicciones = predicho
+        resultado.muestras_prediccion = muestras_prediccion
+        resultado.intervalos_prediccion = _tabla(range(len(predicho)), predicho, muestras_prediccion, percentil, bca)
+    return resultado
@@ -0,0 +1,252 @@
+# CacheDatos.py - Caché en disco de los datos ya limpiados
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Carpeta de caché (junto al archivo de origen) y tamaño máximo permitido
+CARPETA_CACHE = ".cache_dbo5"
+TAMANO_MAXIMO_CACHE = 200 * 1024 * 1024  # 200 MB
+_INDICE = "indice.json"
+_BLOQUE_LECTURA = 1024 * 1024
+
+# Máscara de permisos del proceso (leerla exige cambiarla, así que se lee una vez al importar)
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def carpeta_cache(file_path):
+    """Devuelve la carpeta de caché que corresponde al archivo de origen"""
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CARPETA_CACHE)
+
+
+def huella_logica(*partes):
+    """
+    Huella de la lógica de limpieza (funciones y configuraciones como el esquema).
+    Si cambia alguna de las partes, cambia la huella y las entradas anteriores
+    dejan de ser válidas.
+    """
+    h = hashlib.sha256()
+    for parte in partes:
+        if callable(parte):
+            try:
+                codigo = inspect.getsource(parte)
+            except (OSError, TypeError):
+                codigo = parte.__code__.co_code.hex()
+        else:
+            codigo = repr(parte)
+        h.update(codigo.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _leer_indice(carpeta):
+    try:
+        with open(os.path.join(carpeta, _INDICE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _reemplazar_atomico(ruta, escribir, sufijo=".tmp"):
+    # Escribe en un temporal con nombre único en la misma carpeta y lo mueve sobre `ruta`;
+    # así dos procesos que guardan a la vez no comparten ni pisan el mismo temporal
+    descriptor, ruta_tmp = tempfile.mkstemp(prefix=os.path.basename(ruta) + ".", suffix=sufijo,
+                                            dir=os.path.dirname(ruta))
+    os.close(descriptor)
+    try:
+        escribir(ruta_tmp)
+        # mkstemp crea el archivo solo para el dueño (0600); el destino lleva los permisos normales
+        os.chmod(ruta_tmp, 0o666 & ~_UMASK)
+        os.replace(ruta_tmp, ruta)
+    except BaseException:
+        try:
+            os.remove(ruta_tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _escribir_indice(carpeta, indice):
+    def escribir(ruta_tmp):
+        with open(ruta_tmp, "w", encoding="utf-8") as f:
+            json.dump(indice, f)
+    _reemplazar_atomico(os.path.join(carpeta, _INDICE), escribir)
+
+
+def huella_archivo(file_path):
+    """
+    Huella del contenido del archivo (sha256). El resultado se recuerda en el índice
+    junto con el tamaño y la fecha de modificación, así que el archivo solo se vuelve
+    a leer completo cuando cambia alguno de los dos.
+    """
+    ruta = os.path.abspath(file_path)
+    estado = os.stat(ruta)
+    carpeta = carpeta_cache(ruta)
+    indice = _leer_indice(carpeta)
+    previo = indice.get(ruta)
+    if previo and previo["tamano"] == estado.st_size and previo["mtime"] == estado.st_mtime_ns:
+        return previo["huella"]
+
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(_BLOQUE_LECTURA), b""):
+            h.update(bloque)
+    huella = h.hexdigest()
+
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        indice[ruta] = {"tamano": estado.st_size, "mtime": estado.st_mtime_ns, "huella": huella}
+        _escribir_indice(carpeta, indice)
+    except OSError:
+        pass  # Sin permisos de escritura: la huella sigue siendo válida
+    return huella
+
+
+def clave_cache(file_path, *partes_limpieza):
+    """Clave de la entrada: contenido del archivo + versión de la lógica de limpieza"""
+    h = hashlib.sha256()
+    h.update(huella_archivo(file_path).encode("ascii"))
+    h.update(huella_logica(*partes_limpieza).encode("ascii"))
+    return h.hexdigest()[:32]
+
+
+def _ruta_entrada(file_path, clave):
+    return os.path.join(carpeta_cache(file_path), f"{clave}.npz")
+
+
+def ruta_memmap(file_path, clave):
+    """Archivo memmap de ConjuntoDatos que acompaña a la entrada `clave` de la caché"""
+    return os.path.join(carpeta_cache(file_path), f"{clave}.mmap")
+
+
+def _guardar_columnar(data, ruta, extras=None):
+    """Guarda cada columna como un arreglo binario independiente dentro de un .npz"""
+    arreglos = {"__columnas__": np.array([str(c) for c in data.columns])}
+    for nombre, valor in (extras or {}).items():
+        arreglos[f"__extra_{nombre}__"] = np.asarray(valor)
+    tipos = []
+    for i, columna in enumerate(data.columns):
+        serie = data[columna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            tipos.append(str(serie.dtype))
+            arreglos[f"c{i}"] = serie.to_numpy()
+        elif pd.api.types.is_numeric_dtype(serie):
+            tipos.append(str(serie.dtype))
+            arreglos[f"c{i}"] = serie.to_numpy()
+        else:
+            # Texto: arreglo unicode de ancho fijo más máscara de valores faltantes
+            tipos.append("texto")
+            faltantes = serie.isna().to_numpy()
+            arreglos[f"c{i}"] = serie.fillna("").astype(str).to_numpy().astype("U")
+            arreglos[f"m{i}"] = faltantes
+    arreglos["__tipos__"] = np.array(tipos)
+    arreglos["__indice__"] = data.index.to_numpy()
+    _reemplazar_atomico(ruta, lambda ruta_tmp: np.savez(ruta_tmp, **arreglos), sufijo=".tmp.npz")
+
+
+def _leer_columnar(ruta, extras=()):
+    with np.load(ruta, allow_pickle=False) as archivo:
+        valores_extra = {nombre: archivo[f"__extra_{nombre}__"] for nombre in extras}
+        columnas = archivo["__columnas__"].tolist()
+        tipos = archivo["__tipos__"].tolist()
+        datos = {}
+        for i, (columna, tipo) in enumerate(zip(columnas, tipos)):
+            valores = archivo[f"c{i}"]
+            if tipo == "texto":
+                valores = pd.Series(valores, dtype=object).where(~archivo[f"m{i}"], None)
+            datos[columna] = valores
+        indice = archivo["__indice__"]
+    data = pd.DataFrame(datos, index=indice, columns=columnas)
+    if extras:
+        return data, valores_extra
+    return data
+
+
+def leer_cache(file_path, clave):
+    """Devuelve el DataFrame guardado para la clave o None si no existe"""
+    ruta = _ruta_entrada(file_path, clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        data = _leer_columnar(ruta)
+    except (OSError, ValueError, KeyError):
+        return None
+    try:
+        os.utime(ruta)  # Marca de uso reciente para la política de desalojo
+    except OSError:
+        pass
+    return data
+
+
+def guardar_cache(file_path, clave, data, tamano_maximo=TAMANO_MAXIMO_CACHE):
+    """Guarda el DataFrame limpio y aplica la política de tamaño máximo"""
+    carpeta = carpeta_cache(file_path)
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        _guardar_columnar(data, _ruta_entrada(file_path, clave))
+        desalojar(carpeta, tamano_maximo)
+    except OSError:
+        pass  # La caché es opcional: si no se puede escribir se ignora
+
+
+def _ruta_estado_incremental(file_path):
+    ruta = os.path.abspath(file_path)
+    nombre = hashlib.sha256(ruta.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(carpeta_cache(ruta), f"inc_{nombre}.npz")
+
+
+def leer_estado_incremental(file_path):
+    """
+    Devuelve el último estado de ingesta incremental del archivo como
+    (datos limpios, huellas de filas crudas, huella del contenido, huella de la limpieza)
+    o None si no hay estado guardado.
+    """
+    ruta = _ruta_estado_incremental(file_path)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        data, extras = _leer_columnar(ruta, extras=("filas", "contenido", "limpieza"))
+    except (OSError, ValueError, KeyError):
+        return None
+    return data, extras["filas"], str(extras["contenido"]), str(extras["limpieza"])
+
+
+def guardar_estado_incremental(file_path, data, huellas_filas, huella_contenido, huella_limpieza):
+    """Guarda los datos limpios junto con las huellas de las filas crudas ya procesadas"""
+    try:
+        os.makedirs(carpeta_cache(file_path), exist_ok=True)
+        _guardar_columnar(data, _ruta_estado_incremental(file_path), extras={
+            "filas": huellas_filas,
+            "contenido": huella_contenido,
+            "limpieza": huella_limpieza,
+        })
+    except OSError:
+        pass
+
+
+def desalojar(carpeta, tamano_maximo=TAMANO_MAXIMO_CACHE):
+    """Elimina las entradas usadas hace más tiempo hasta quedar bajo el tamaño máximo"""
+    entradas = []
+    for nombre in os.listdir(carpeta):
+        if nombre.endswith((".npz", ".mmap")) and ".tmp" not in nombre:  # Temporales en curso no cuentan
+            ruta = os.path.join(carpeta, nombre)
+            estado = os.stat(ruta)
+            entradas.append((estado.st_mtime, estado.st_size, ruta))
+
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in sorted(entradas):
+        if total <= tamano_maximo:
+            break
+        os.remove(ruta)
+        total -= tamano
+
+
+def limpiar_cache(file_path):
+    """Borra todas las entradas de caché asociadas a la carpeta del archivo"""
+    carpeta = carpeta_cache(file_path)
+    if os.path.isdir(carpeta):
+        for nombre in os.listdir(carpeta):
+            os.remove(os.path.join(carpeta, nombre))
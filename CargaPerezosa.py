@@ -0,0 +1,157 @@
+# CargaPerezosa.py - Importación diferida de módulos pesados y medición del arranque
+import builtins
+import importlib
+import sys
+import threading
+import time
+
+_bloqueo = threading.Lock()
+
+# Momento en que arrancó el programa y tiempos registrados por etapa
+_INICIO = time.perf_counter()
+_etapas = []
+
+
+class ModuloPerezoso:
+    """
+    Representa a un módulo que todavía no se ha importado. La importación real
+    ocurre la primera vez que se accede a un atributo (o al llamar a cargar()).
+    `antes` es una función opcional que se ejecuta justo antes de importar,
+    por ejemplo para elegir el backend de matplotlib.
+    """
+    __slots__ = ('_nombre', '_antes', '_modulo')
+
+    def __init__(self, nombre, antes=None):
+        object.__setattr__(self, '_nombre', nombre)
+        object.__setattr__(self, '_antes', antes)
+        object.__setattr__(self, '_modulo', None)
+
+    def cargar(self):
+        modulo = self._modulo
+        if modulo is None:
+            with _bloqueo:
+                modulo = self._modulo
+                if modulo is None:
+                    if self._antes is not None:
+                        self._antes()
+                    modulo = importlib.import_module(self._nombre)
+                    object.__setattr__(self, '_modulo', modulo)
+        return modulo
+
+    @property
+    def cargado(self):
+        return self._modulo is not None
+
+    def __getattr__(self, atributo):
+        return getattr(self.cargar(), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(self.cargar(), atributo, valor)
+
+    def __dir__(self):
+        return dir(self.cargar())
+
+    def __repr__(self):
+        estado = "cargado" if self.cargado else "sin cargar"
+        return f"<módulo perezoso {self._nombre!r} ({estado})>"
+
+
+def modulo_perezoso(nombre, antes=None):
+    """Devuelve el módulo si ya está importado o un ModuloPerezoso si no"""
+    if antes is None and nombre in sys.modules:
+        return sys.modules[nombre]
+    return ModuloPerezoso(nombre, antes)
+
+
+def calentar(modulos, al_terminar=None):
+    """
+    Importa los módulos en un hilo aparte mientras la interfaz está esperando
+    al usuario. El hilo solo importa: nunca toca widgets de Tk.
+    """
+    def trabajar():
+        for modulo in modulos:
+            inicio = time.perf_counter()
+            try:
+                if isinstance(modulo, ModuloPerezoso):
+                    nombre = modulo._nombre
+                    modulo.cargar()
+                else:
+                    nombre = modulo
+                    importlib.import_module(modulo)
+            except Exception:
+                continue  # Si falla, el error aparecerá en el primer uso real
+            registrar_etapa(f"precarga {nombre}", time.perf_counter() - inicio)
+        if al_terminar is not None:
+            al_terminar()
+
+    hilo = threading.Thread(target=trabajar, name="precarga", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def registrar_etapa(nombre, segundos=None):
+    """
+    Guarda una etapa del arranque. Sin `segundos` se registra el tiempo
+    transcurrido desde el inicio del programa.
+    """
+    if segundos is None:
+        segundos = time.perf_counter() - _INICIO
+    _etapas.append((nombre, segundos))
+
+
+class MedidorImportaciones:
+    """
+    Desglose de importaciones al estilo de `python -X importtime`: por cada módulo
+    nuevo se guarda el tiempo propio y el acumulado (incluyendo sus dependencias).
+    Solo mide lo que se importa entre activar() y desactivar().
+    """
+
+    def __init__(self):
+        self.registros = []  # (profundidad, nombre, propio, acumulado)
+        self._original = None
+        self._pila = []
+
+    def activar(self):
+        self._original = builtins.__import__
+        builtins.__import__ = self._importar
+
+    def desactivar(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _importar(self, nombre, *args, **kwargs):
+        # Solo se mide el hilo principal; la precarga se reporta por separado
+        if threading.current_thread() is not threading.main_thread() or nombre in sys.modules:
+            return self._original(nombre, *args, **kwargs)
+
+        hijos = [0.0]
+        self._pila.append(hijos)
+        posicion = len(self.registros)
+        self.registros.append(None)
+        inicio = time.perf_counter()
+        try:
+            return self._original(nombre, *args, **kwargs)
+        finally:
+            acumulado = time.perf_counter() - inicio
+            self._pila.pop()
+            if self._pila:
+                self._pila[-1][0] += acumulado
+            nivel = args[3] if len(args) > 3 else kwargs.get('level', 0)
+            self.registros[posicion] = (len(self._pila), '.' * nivel + nombre, acumulado - hijos[0], acumulado)
+
+    def reporte(self, minimo=0.001):
+        lineas = ["import time:  propio [us] | acumulado [us] | módulo"]
+        for profundidad, nombre, propio, acumulado in self.registros:
+            if acumulado >= minimo:
+                lineas.append(f"import time: {propio * 1e6:12.0f} | {acumulado * 1e6:14.0f} | "
+                              f"{'  ' * profundidad}{nombre}")
+        return "\n".join(lineas)
+
+
+def reporte_tiempos():
+    """Resumen de las etapas registradas, en el orden en que ocurrieron"""
+    if not _etapas:
+        return "Sin etapas registradas"
+    ancho = max(len(nombre) for nombre, _ in _etapas)
+    return "\n".join(f"{nombre:<{ancho}}  {segundos * 1000:9.1f} ms" for nombre, segundos in _etapas)
@@ -0,0 +1,221 @@
+# ConjuntoDatos.py - Contenedor compacto de solo lectura para los datos limpios
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import CacheDatos
+from ProcesoDatos import SUFIJO_LIMITE, cargar_limpiar_datos, guardar_memmap, _partes_limpieza, _sin_progreso
+
+# Orden de almacenamiento: los predictores quedan contiguos para poder tomarlos sin copiar
+PARAMETROS = ['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA', 'DBO5']
+
+# Valor que se usa en años y meses para las filas sin fecha válida
+SIN_FECHA = -1
+
+# Archivo binario para compartir el conjunto entre procesos con np.memmap:
+# encabezado JSON de tamaño fijo seguido de los arreglos, cada uno alineado a 64 bytes
+FIRMA_MEMMAP = b"DBO5MMAP"
+TAMANO_ENCABEZADO = 4096
+_ALINEACION = 64
+
+
+def _solo_lectura(arreglo):
+    arreglo.flags.writeable = False
+    return arreglo
+
+
+class ConjuntoDatos:
+    """
+    Datos limpios organizados por columnas: cada parámetro es un arreglo float32 contiguo,
+    año y mes son enteros pequeños y las filas están ordenadas por fecha, así el filtro
+    por año es un rango de filas y las vistas no copian datos.
+    """
+    __slots__ = ('nombres', 'valores', 'años', 'meses', 'fechas', 'ruta', '_posiciones')
+
+    def __init__(self, nombres, valores, años, meses, fechas, ruta=None):
+        self.nombres = tuple(nombres)
+        self.valores = valores  # Forma (parámetros, filas)
+        self.años = años
+        self.meses = meses
+        self.fechas = fechas
+        self.ruta = ruta  # Archivo memmap del que se leen los arreglos (None si están en memoria)
+        self._posiciones = {nombre: i for i, nombre in enumerate(self.nombres)}
+
+    @classmethod
+    def desde_dataframe(cls, data):
+        """Construye el conjunto a partir del DataFrame que devuelve cargar_limpiar_datos"""
+        flotantes = [c for c in data.columns
+                     if pd.api.types.is_float_dtype(data[c]) and not str(c).endswith(SUFIJO_LIMITE)
+                     and c not in ('AÑO', 'MES')]
+        nombres = [c for c in PARAMETROS if c in flotantes] + [c for c in flotantes if c not in PARAMETROS]
+
+        # Orden por fecha (las filas sin fecha quedan al final)
+        if 'FECHA_DT' in data.columns:
+            fechas = data['FECHA_DT'].to_numpy()
+            orden = np.argsort(fechas, kind='stable')  # NumPy ordena NaT al final
+            fechas = fechas[orden]
+        else:
+            orden = np.arange(len(data))
+            fechas = np.full(len(data), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+        valores = np.empty((len(nombres), len(data)), dtype=np.float32)
+        for i, nombre in enumerate(nombres):
+            valores[i] = data[nombre].to_numpy(dtype=np.float32)[orden]
+
+        def entero(columna, tipo):
+            if columna not in data.columns:
+                return np.full(len(data), SIN_FECHA, dtype=tipo)
+            return data[columna].fillna(SIN_FECHA).to_numpy()[orden].astype(tipo)
+
+        return cls(nombres, _solo_lectura(valores), _solo_lectura(entero('AÑO', np.int16)),
+                   _solo_lectura(entero('MES', np.int8)), _solo_lectura(fechas))
+
+    @classmethod
+    def desde_archivo(cls, file_path, usar_cache=True, progreso=_sin_progreso):
+        """
+        Conjunto de un libro de datos abierto con memmap desde la caché: si el archivo y la
+        limpieza no cambiaron no se lee ni se limpia nada y todos los procesos que abren el
+        mismo libro comparten una sola copia en memoria. Sin caché se construye en memoria.
+        """
+        if not usar_cache:
+            return cls.desde_dataframe(cargar_limpiar_datos(file_path, usar_cache=False, progreso=progreso))
+        clave = CacheDatos.clave_cache(file_path, *_partes_limpieza())
+        ruta = CacheDatos.ruta_memmap(file_path, clave)
+        data = None
+        if not os.path.exists(ruta):
+            # cargar_limpiar_datos deja el memmap junto a la caché; si los datos salieron de
+            # una entrada guardada sin memmap, se exporta aquí
+            data = cargar_limpiar_datos(file_path, progreso=progreso)
+            if not os.path.exists(ruta):
+                guardar_memmap(file_path, clave, data)
+        try:
+            return cls.abrir_memmap(ruta)
+        except (OSError, ValueError):
+            # Carpeta sin permisos de escritura o archivo dañado: el conjunto queda en memoria
+            return cls.desde_dataframe(data if data is not None else cargar_limpiar_datos(file_path, progreso=progreso))
+
+    def __len__(self):
+        return self.valores.shape[1]
+
+    def __contains__(self, nombre):
+        return nombre in self._posiciones
+
+    def __getitem__(self, nombre):
+        """Arreglo de un parámetro (vista, sin copia)"""
+        return self.valores[self._posiciones[nombre]]
+
+    def _vista(self, inicio, fin):
+        vista = object.__new__(ConjuntoDatos)
+        vista.nombres = self.nombres
+        vista._posiciones = self._posiciones
+        vista.valores = self.valores[:, inicio:fin]
+        vista.años = self.años[inicio:fin]
+        vista.meses = self.meses[inicio:fin]
+        vista.fechas = self.fechas[inicio:fin]
+        vista.ruta = None  # La vista no es el archivo completo
+        return vista
+
+    def _filas_con_fecha(self):
+        return len(self) - int(np.count_nonzero(self.años == SIN_FECHA))
+
+    def rango_año(self, año):
+        """Filas (inicio, fin) del año indicado; los años están ordenados por la fecha"""
+        años = self.años[:self._filas_con_fecha()]
+        return int(np.searchsorted(años, año, side='left')), int(np.searchsorted(años, año, side='right'))
+
+    def por_año(self, año):
+        """Subconjunto de un año como vista del conjunto completo"""
+        return self._vista(*self.rango_año(año))
+
+    def años_disponibles(self):
+        años = self.años[:self._filas_con_fecha()]
+        if len(años) == 0:
+            return []
+        cambios = np.flatnonzero(np.diff(años)) + 1
+        return [int(a) for a in años[np.concatenate(([0], cambios))]]
+
+    def matriz(self, nombres):
+        """
+        Matriz (filas, len(nombres)) con los parámetros pedidos. Si están contiguos
+        en el almacenamiento se devuelve una vista; si no, una sola copia.
+        """
+        posiciones = [self._posiciones[n] for n in nombres]
+        inicio = posiciones[0]
+        if posiciones == list(range(inicio, inicio + len(posiciones))):
+            return self.valores[inicio:inicio + len(posiciones)].T
+        return self.valores[posiciones].T
+
+    def serie(self, nombre):
+        return pd.Series(self[nombre], name=nombre, copy=False)
+
+    def tabla(self, nombres):
+        """DataFrame con los parámetros pedidos, sin copiar cuando es posible"""
+        return pd.DataFrame(self.matriz(nombres), columns=list(nombres), copy=False)
+
+    def huella(self, nombres):
+        """Huella (sha256) del contenido de los parámetros pedidos; cambia si cambia cualquier valor"""
+        h = hashlib.sha256()
+        for nombre in nombres:
+            h.update(nombre.encode('utf-8'))
+            h.update(np.ascontiguousarray(self[nombre]).tobytes())
+        return h.hexdigest()
+
+    def exportar_memmap(self, ruta):
+        """
+        Escribe el conjunto en un archivo binario de columnas de ancho fijo que
+        cualquier proceso puede abrir sin copiar con ConjuntoDatos.abrir_memmap.
+        """
+        arreglos = {
+            'valores': np.ascontiguousarray(self.valores),
+            'años': np.ascontiguousarray(self.años),
+            'meses': np.ascontiguousarray(self.meses),
+            'fechas': np.ascontiguousarray(self.fechas),
+        }
+        secciones = {}
+        desplazamiento = TAMANO_ENCABEZADO
+        for nombre, arreglo in arreglos.items():
+            secciones[nombre] = {'dtype': arreglo.dtype.str, 'forma': list(arreglo.shape), 'inicio': desplazamiento}
+            desplazamiento += -(-arreglo.nbytes // _ALINEACION) * _ALINEACION
+
+        encabezado = json.dumps({'nombres': list(self.nombres), 'filas': len(self), 'secciones': secciones},
+                                ensure_ascii=False).encode('utf-8')
+        if len(FIRMA_MEMMAP) + 4 + len(encabezado) > TAMANO_ENCABEZADO:
+            raise ValueError("Demasiadas columnas para el encabezado del archivo memmap")
+
+        # Temporal con nombre único: varios procesos pueden exportar el mismo libro a la vez
+        descriptor, ruta_tmp = tempfile.mkstemp(prefix=os.path.basename(ruta) + '.', suffix='.tmp',
+                                                dir=os.path.dirname(os.path.abspath(ruta)))
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(FIRMA_MEMMAP + len(encabezado).to_bytes(4, 'little') + encabezado)
+                for nombre, arreglo in arreglos.items():
+                    f.seek(secciones[nombre]['inicio'])
+                    f.write(arreglo.tobytes())
+                f.truncate(max(desplazamiento, f.tell()))
+            os.replace(ruta_tmp, ruta)
+        except BaseException:
+            try:
+                os.remove(ruta_tmp)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def abrir_memmap(cls, ruta):
+        """Abre un archivo creado con exportar_memmap; los arreglos se leen del disco bajo demanda"""
+        with open(ruta, 'rb') as f:
+            inicio = f.read(len(FIRMA_MEMMAP) + 4)
+            if inicio[:len(FIRMA_MEMMAP)] != FIRMA_MEMMAP:
+                raise ValueError(f"{ruta} no es un archivo memmap de ConjuntoDatos")
+            encabezado = json.loads(f.read(int.from_bytes(inicio[len(FIRMA_MEMMAP):], 'little')).decode('utf-8'))
+
+        def abrir(nombre):
+            seccion = encabezado['secciones'][nombre]
+            if 0 in seccion['forma']:
+                return _solo_lectura(np.empty(seccion['forma'], dtype=seccion['dtype']))
+            return np.memmap(ruta, dtype=seccion['dtype'], mode='r', offset=seccion['inicio'],
+                             shape=tuple(seccion['forma']))
+
+        return cls(encabezado['nombres'], abrir('valores'), abrir('años'), abrir('meses'), abrir('fechas'), ruta)
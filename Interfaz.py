@@ -1,16 +1,38 @@
 # interface.py
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from ProcesoDatos import cargar_limpiar_datos
-from AnalisisRegresion import calcular_BOD5, stepwise_regression, calculate_correlation_matrix, stepwise_regression_od
-import io
-import sys
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-import matplotlib
-matplotlib.use('TkAgg')
-import mplcursors
+import os
+import queue
+import threading
+from CargaPerezosa import modulo_perezoso, calentar
+
+
+def _usar_backend_tk():
+    import matplotlib
+    matplotlib.use('TkAgg')
+
+
+# Los módulos pesados se importan en el primer uso (o en la precarga), no al abrir la ventana
+np = modulo_perezoso('numpy')
+plt = modulo_perezoso('matplotlib.pyplot', antes=_usar_backend_tk)
+backend_tkagg = modulo_perezoso('matplotlib.backends.backend_tkagg', antes=_usar_backend_tk)
+matplotlib_colors = modulo_perezoso('matplotlib.colors')
+matplotlib_patches = modulo_perezoso('matplotlib.patches')
+mplcursors = modulo_perezoso('mplcursors')
+ProcesoDatos = modulo_perezoso('ProcesoDatos')
+ConjuntoDatos = modulo_perezoso('ConjuntoDatos')
+AnalisisRegresion = modulo_perezoso('AnalisisRegresion')
+Bootstrap = modulo_perezoso('Bootstrap')
+RegistroModelos = modulo_perezoso('RegistroModelos')
+RegresionGrupos = modulo_perezoso('RegresionGrupos')
+RegresionRobusta = modulo_perezoso('RegresionRobusta')
+Regularizacion = modulo_perezoso('Regularizacion')
+BarridoEscenarios = modulo_perezoso('BarridoEscenarios')
+PuntuacionEscenarios = modulo_perezoso('PuntuacionEscenarios')
+MotorCorrelacion = modulo_perezoso('MotorCorrelacion')
+
+# Orden de precarga: primero lo que necesita la carga del archivo, luego las gráficas y los modelos
+MODULOS_PRECARGA = (ProcesoDatos, ConjuntoDatos, plt, backend_tkagg, mplcursors, AnalisisRegresion, Bootstrap)
 
 # Nombres de meses en español
 MESES_ESP = {1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun',
@@ -27,6 +49,9 @@ COLOR_WHITE = "#FFFFFF"
 COLOR_LIGHT_GRAY = "#f8f9fa"
 COLOR_BORDER = "#e0e0e0"
 
+# Espera tras la última tecla antes de recalcular el simulador (ms)
+DEMORA_SIMULADOR = 150
+
 class App:
     def __init__(self, root):
         self.root = root
@@ -38,11 +63,32 @@ class App:
         # Variable para almacenar el archivo cargado
         self.file_path = None
         self.data = None
+        self.conjunto = None  # Versión compacta de self.data para las vistas
+        self.model = None
         self.current_figure = None
         self.current_canvas = None
         
+        # Resultados que dependen de los datos; se recalculan solo si cambia la versión de los datos
+        self.version_datos = 0
+        self._ruta_resultados = None
+        self._resultados = {}
+        self.registro_modelos = None  # Modelos ajustados guardados junto a la caché del archivo
+        self.motor_correlacion = None  # Co-momentos acumulados; al actualizar datos solo suma las filas nuevas
+        self.norma_robusta = 'huber'  # M-estimador elegido en "Regresión Robusta" (también se usa en Predicción DQO)
+        
+        # Estado de la carga y de la puntuación de escenarios en segundo plano
+        self._carga_activa = None
+        self._puntuacion_activa = None
+        
+        # Simulador: modelo fijado al abrir la vista y recálculo pendiente mientras se escribe
+        self.modelo_simulador = None
+        self._simulador_pendiente = None
+        
         # Crear la pantalla inicial
         self.create_initial_screen()
+        
+        # Importar los módulos pesados mientras el usuario elige el archivo
+        self.precarga = calentar(MODULOS_PRECARGA)
 
     def create_initial_screen(self):
         """Crea la pantalla inicial con el botón para cargar archivo"""
@@ -115,10 +161,15 @@ class App:
             borderwidth=0
         )
         load_button.pack()
+        self.load_button = load_button
         
         # Hover effect
         load_button.bind("<Enter>", lambda e: load_button.config(bg=COLOR_LIGHT_GREEN))
         load_button.bind("<Leave>", lambda e: load_button.config(bg=COLOR_GREEN))
+        
+        # Contenedor para el avance de la carga (vacío hasta que se elige un archivo)
+        self.progress_container = tk.Frame(center_container, bg=COLOR_LIGHT_GRAY)
+        self.progress_container.pack(fill="x", pady=(25, 0))
 
     def create_main_interface(self):
         """Crea la interfaz principal con barra lateral y área de resultados"""
@@ -163,6 +214,26 @@ class App:
         reload_button.bind("<Enter>", lambda e: reload_button.config(bg=COLOR_GREEN))
         reload_button.bind("<Leave>", lambda e: reload_button.config(bg=COLOR_TEAL))
         
+        # Botón para incorporar las filas nuevas del mismo archivo
+        update_button = tk.Button(
+            header_frame,
+            text="🔁  Actualizar Datos",
+            font=("Segoe UI", 10),
+            bg=COLOR_TEAL,
+            fg=COLOR_WHITE,
+            activebackground=COLOR_GREEN,
+            activeforeground=COLOR_WHITE,
+            relief="flat",
+            padx=15,
+            pady=6,
+            cursor="hand2",
+            command=self.actualizar_datos,
+            borderwidth=0
+        )
+        update_button.pack(side="right", padx=10, pady=12)
+        update_button.bind("<Enter>", lambda e: update_button.config(bg=COLOR_GREEN))
+        update_button.bind("<Leave>", lambda e: update_button.config(bg=COLOR_TEAL))
+        
         # Botón para salir
         exit_button = tk.Button(
             header_frame,
@@ -249,11 +320,40 @@ class App:
 
     def get_available_years(self):
         """Obtiene los años disponibles en los datos"""
-        if self.data is not None and 'AÑO' in self.data.columns:
-            years = sorted(self.data['AÑO'].dropna().unique().astype(int).tolist())
-            return years
+        if self.conjunto is not None:
+            return self.resultado_en_cache('años', self.conjunto.años_disponibles)
         return []
 
+    def resultado_en_cache(self, nombre, calcular):
+        """Devuelve el resultado guardado si los datos no cambiaron desde que se calculó"""
+        guardado = self._resultados.get(nombre)
+        if guardado is not None and guardado[0] == self.version_datos:
+            return guardado[1]
+        resultado = calcular()
+        self._resultados[nombre] = (self.version_datos, resultado)
+        return resultado
+
+    def _registrar_datos(self, data, cambio):
+        """Guarda los datos cargados y marca como obsoletos los resultados solo si algo cambió"""
+        self.data = data
+        self.conjunto = ConjuntoDatos.ConjuntoDatos.desde_dataframe(data)
+        if cambio or self.file_path != self._ruta_resultados:
+            self.version_datos += 1
+            self._ruta_resultados = self.file_path
+            self._resultados.clear()
+            self.model = None
+        if self.registro_modelos is None or self.registro_modelos.carpeta != self._carpeta_modelos():
+            self.registro_modelos = RegistroModelos.RegistroModelos.para_archivo(self.file_path)
+
+    def _carpeta_modelos(self):
+        return RegistroModelos.CacheDatos.carpeta_cache(self.file_path)
+
+    def modelo_actual(self, nombre='dbo5_od_dqo'):
+        """Modelo ajustado a los datos cargados; solo se vuelve a ajustar si cambian los datos"""
+        if self.conjunto is None:
+            return RegistroModelos.ModeloAjustado.publicado(nombre)
+        return self.registro_modelos.obtener(nombre, self.conjunto)
+
     def embed_figure_with_filter(self, plot_function, title="", column_name="", y_label="", color="#3d8b6e", log_scale=False):
         """Embebe una figura con filtro por año"""
         self.clear_display()
@@ -336,12 +436,12 @@ class App:
         if self.current_figure:
             plt.close(self.current_figure)
         
-        # Obtener datos filtrados
+        # Obtener datos filtrados (vista sin copia, ya ordenada por fecha)
         selected_year = self.year_var.get()
         if selected_year == "Todos los años":
-            filtered_data = self.data.copy()
+            filtered_data = self.conjunto
         else:
-            filtered_data = self.data[self.data['AÑO'] == int(selected_year)].copy()
+            filtered_data = self.conjunto.por_año(int(selected_year))
         
         params = self.current_plot_params
         
@@ -349,11 +449,7 @@ class App:
         fig, ax = plt.subplots(figsize=(10, 6))
         
         if len(filtered_data) > 0:
-            # Ordenar por fecha si existe
-            if 'FECHA_DT' in filtered_data.columns:
-                filtered_data = filtered_data.sort_values('FECHA_DT')
-            
-            valores = filtered_data[params['column_name']].values
+            valores = filtered_data[params['column_name']]
             x_pos = range(len(filtered_data))
             
             # Graficar
@@ -363,10 +459,10 @@ class App:
             if selected_year == "Todos los años":
                 # Mostrar observaciones cuando se selecciona "Todos los años"
                 ax.set_xlabel("Observaciones", fontsize=10)
-            elif 'MES' in filtered_data.columns and 'AÑO' in filtered_data.columns:
+            else:
                 # Mostrar meses cuando se filtra por un año específico
-                meses = filtered_data['MES'].values
-                años = filtered_data['AÑO'].values
+                meses = filtered_data.meses
+                años = filtered_data.años
                 x_labels = [f"{MESES_ESP.get(int(m), m)}" for m, a in zip(meses, años)]
                 
                 # Configurar etiquetas del eje X (mostrar cada N etiquetas para evitar saturación)
@@ -379,11 +475,9 @@ class App:
                 ax.set_xticks(range(0, n_labels, step))
                 ax.set_xticklabels([x_labels[i] for i in range(0, n_labels, step)], rotation=45, ha='right')
                 ax.set_xlabel("Mes", fontsize=10)
-            else:
-                ax.set_xlabel("Observaciones", fontsize=10)
             
             # Agregar estadísticas
-            mean_val = filtered_data[params['column_name']].mean()
+            mean_val = valores.mean()
             ax.axhline(y=mean_val, color='red', linestyle='--', alpha=0.7, 
                       label=f'Media: {mean_val:.2f}')
             ax.legend(loc='upper right')
@@ -394,8 +488,8 @@ class App:
             # Guardar datos para el cursor
             self._cursor_data = {
                 'valores': valores,
-                'meses': filtered_data['MES'].values if 'MES' in filtered_data.columns else None,
-                'años': filtered_data['AÑO'].values if 'AÑO' in filtered_data.columns else None,
+                'meses': filtered_data.meses,
+                'años': filtered_data.años,
                 'y_label': params['y_label']
             }
             
@@ -433,13 +527,13 @@ class App:
         
         # Canvas de matplotlib
         self.current_figure = fig
-        self.current_canvas = FigureCanvasTkAgg(fig, master=self.fig_container)
+        self.current_canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=self.fig_container)
         self.current_canvas.draw()
         
         # Toolbar de navegación
         toolbar_frame = tk.Frame(self.fig_container, bg=COLOR_LIGHT_GRAY)
         toolbar_frame.pack(side="bottom", fill="x")
-        toolbar = NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
+        toolbar = backend_tkagg.NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
         toolbar.update()
         
         # Widget del canvas
@@ -493,7 +587,9 @@ class App:
                 "title": "📊 Análisis Estadístico",
                 "buttons": [
                     ("📋", "Matriz de Correlación", self.show_correlation),
-                    ("📐", "Regresión Paso a Paso", self.run_regression)
+                    ("📐", "Regresión Paso a Paso", self.run_regression),
+                    ("🛡️", "Regresión Robusta", self.vista_regresion_robusta),
+                    ("〰️", "Ridge y Lasso", self.vista_regularizacion)
                 ]
             },
             {
@@ -514,14 +610,17 @@ class App:
                     ("📉", "DBO5 vs Predicción", self.vista_dbo5_vs_pred),
                     ("⚠️", "Residuales", self.vista_residuals),
                     ("🎯", "Predicción OD", self.vista_tss_bod5),
-                    ("🎯", "Predicción DQO", self.run_regression_dqo)
+                    ("🎯", "Predicción DQO", self.run_regression_dqo),
+                    ("🗓️", "Regresión por Año y Mes", self.vista_regresion_grupos)
                 ]
             },
             {
                 "title": "🔮 Herramientas Avanzadas",
                 "buttons": [
                     ("📅", "Tendencia Temporal", self.vista_tendencia_temporal),
-                    ("🖩", "Simulador DBO5", self.vista_simulador)
+                    ("🖩", "Simulador DBO5", self.vista_simulador),
+                    ("🗺️", "Barrido de Escenarios", self.vista_barrido_simulador),
+                    ("📑", "Puntuar Archivo de Escenarios", self.vista_puntuar_escenarios)
                 ]
             }
         ]
@@ -631,20 +730,23 @@ class App:
         
         # Canvas de matplotlib
         self.current_figure = fig
-        self.current_canvas = FigureCanvasTkAgg(fig, master=fig_frame)
+        self.current_canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=fig_frame)
         self.current_canvas.draw()
         
         # Toolbar de navegación
         toolbar_frame = tk.Frame(fig_frame, bg=COLOR_LIGHT_GRAY)
         toolbar_frame.pack(side="bottom", fill="x")
-        toolbar = NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
+        toolbar = backend_tkagg.NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
         toolbar.update()
         
         # Widget del canvas
         self.current_canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
 
-    def show_text_result(self, title, content, description=""):
-        """Muestra resultados de texto en el área de contenido"""
+    def show_text_result(self, title, content, description="", controles=None):
+        """
+        Muestra resultados de texto en el área de contenido. `controles(frame)` puede
+        agregar selectores sobre el texto; se devuelve el widget de texto para actualizarlo.
+        """
         self.clear_display()
         
         # Título
@@ -675,6 +777,11 @@ class App:
             )
             desc_label.pack(anchor="w")
         
+        if controles is not None:
+            controles_frame = tk.Frame(self.display_frame, bg=COLOR_WHITE)
+            controles_frame.pack(fill="x", pady=(0, 10))
+            controles(controles_frame)
+        
         # Frame con borde para el contenido
         content_frame = tk.Frame(self.display_frame, bg=COLOR_LIGHT_GRAY, relief="solid", borderwidth=1)
         content_frame.pack(fill="both", expand=True)
@@ -699,6 +806,7 @@ class App:
         
         text_widget.insert("1.0", content)
         text_widget.config(state="disabled")
+        return text_widget
 
     def load_file(self):
         """Dialogo para cargar archivo"""
@@ -710,16 +818,182 @@ class App:
             return
 
         self.file_path = file_path
+        self.load_button.config(state="disabled")
+        self.iniciar_carga(self.progress_container, self._carga_inicial_terminada)
+
+    def _carga_inicial_terminada(self, data, cambio):
+        self._registrar_datos(data, cambio)
+        messagebox.showinfo("✅ Éxito", "Datos cargados y limpiados exitosamente.")
+        self.create_main_interface()
+
+    def actualizar_datos(self):
+        """Incorpora las filas agregadas al archivo actual sin volver a limpiar todo el historial"""
+        if self._carga_activa is not None:
+            return
+        filas_antes = len(self.data)
+        
+        def terminada(data, cambio):
+            self._registrar_datos(data, cambio)
+            if cambio:
+                messagebox.showinfo("✅ Datos actualizados",
+                                    f"Se incorporaron los cambios del archivo ({len(data) - filas_antes:+d} filas).")
+            else:
+                messagebox.showinfo("Sin cambios", "El archivo no tiene filas nuevas.")
+            self.show_welcome()
+        
+        self.clear_display()
+        contenedor = tk.Frame(self.display_frame, bg=COLOR_WHITE)
+        contenedor.place(relx=0.5, rely=0.5, anchor="center")
+        self.iniciar_carga(contenedor, terminada, fondo=COLOR_WHITE)
+
+    def iniciar_carga(self, parent, al_terminar, fondo=COLOR_LIGHT_GRAY):
+        """Carga self.file_path en un hilo aparte y muestra el avance en `parent`"""
+        def terminar(evento):
+            if evento[0] == 'listo':
+                al_terminar(evento[1], evento[2])
+            else:
+                if evento[0] == 'error':
+                    messagebox.showerror("❌ Error", f"No se pudo cargar el archivo:\n{evento[1]}")
+                self._carga_interrumpida()
+        
+        self._iniciar_tarea('_carga_activa', self._cargar_en_segundo_plano, (self.file_path,), parent,
+                            "Preparando carga...", fondo, self.cancelar_carga, terminar)
+
+    def _iniciar_tarea(self, atributo, trabajo, argumentos, parent, texto, fondo, cancelar_comando, al_terminar):
+        """
+        Ejecuta trabajo(*argumentos, cancelar, eventos) en un hilo aparte, muestra su avance en
+        `parent` y guarda la tarea en self.<atributo> hasta que termine. al_terminar(evento)
+        recibe el evento final ('listo', 'error' o 'cancelada').
+        """
+        for widget in parent.winfo_children():
+            widget.destroy()
+        
+        etapa_label = tk.Label(parent, text=texto, font=("Segoe UI", 10), bg=fondo, fg=COLOR_TEAL)
+        etapa_label.pack(pady=(0, 6))
+        
+        barra = ttk.Progressbar(parent, mode="indeterminate", length=360, maximum=100)
+        barra.pack(pady=(0, 10))
+        barra.start(12)
+        
+        cancel_button = tk.Button(
+            parent,
+            text="✖  Cancelar",
+            font=("Segoe UI", 10),
+            bg="#8b3a3a",
+            fg=COLOR_WHITE,
+            activebackground="#a04545",
+            activeforeground=COLOR_WHITE,
+            relief="flat",
+            padx=15,
+            pady=4,
+            cursor="hand2",
+            command=cancelar_comando,
+            borderwidth=0
+        )
+        cancel_button.pack()
+        
+        cancelar = threading.Event()
+        eventos = queue.Queue()
+        tarea = {
+            'cancelar': cancelar,
+            'eventos': eventos,
+            'parent': parent,
+            'etapa_label': etapa_label,
+            'barra': barra,
+            'al_terminar': al_terminar,
+        }
+        setattr(self, atributo, tarea)
+        
+        hilo = threading.Thread(target=trabajo, args=tuple(argumentos) + (cancelar, eventos), daemon=True)
+        hilo.start()
+        self.root.after(100, self._revisar_tarea, atributo, tarea)
+
+    @staticmethod
+    def _cargar_en_segundo_plano(file_path, cancelar, eventos):
+        # Se ejecuta fuera del hilo de Tk: solo se comunica con la interfaz a través de la cola
+        def progreso(etapa, filas=None, total=None):
+            if cancelar.is_set():
+                raise ProcesoDatos.CargaCancelada()
+            eventos.put(('progreso', etapa, filas, total))
+        
         try:
-            self.data = cargar_limpiar_datos(self.file_path)
-            messagebox.showinfo("✅ Éxito", "Datos cargados y limpiados exitosamente.")
-            self.create_main_interface()
+            data, cambio = ProcesoDatos.cargar_incremental(file_path, progreso=progreso)
+            eventos.put(('listo', data, cambio))
+        except ProcesoDatos.CargaCancelada:
+            eventos.put(('cancelada',))
         except Exception as e:
-            messagebox.showerror("❌ Error", f"No se pudo cargar el archivo:\n{e}")
+            eventos.put(('error', e))
+
+    @staticmethod
+    def _widget_existe(widget):
+        # Los widgets de avance viven en display_frame: si el usuario cambió de vista ya no existen
+        try:
+            return bool(widget.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def _revisar_tarea(self, atributo, tarea):
+        """
+        Procesa los eventos de una tarea en segundo plano; se vuelve a programar con root.after.
+        La cola se sigue vaciando aunque la vista de avance ya no exista, así la tarea siempre
+        termina y self.<atributo> vuelve a None.
+        """
+        if getattr(self, atributo) is not tarea:
+            return  # La tarea se abandonó (por ejemplo al recargar el archivo)
+        
+        while True:
+            try:
+                evento = tarea['eventos'].get_nowait()
+            except queue.Empty:
+                break
+            
+            if evento[0] == 'progreso':
+                _, etapa, filas, total = evento
+                if self._widget_existe(tarea['etapa_label']):
+                    texto = etapa if filas is None else f"{etapa}: {filas:,} filas"
+                    tarea['etapa_label'].config(text=texto)
+                    if filas is not None and total:
+                        tarea['barra'].stop()
+                        tarea['barra'].config(mode="determinate", value=min(100, 100 * filas / total))
+                continue
+            
+            setattr(self, atributo, None)
+            if self._widget_existe(tarea['parent']):
+                for widget in tarea['parent'].winfo_children():
+                    widget.destroy()
+            tarea['al_terminar'](evento)
+            return
+        
+        self.root.after(100, self._revisar_tarea, atributo, tarea)
+
+    def _cancelar_tarea(self, atributo):
+        # Pide al hilo que se detenga en el siguiente aviso de progreso
+        tarea = getattr(self, atributo)
+        if tarea is not None:
+            tarea['cancelar'].set()
+            if self._widget_existe(tarea['etapa_label']):
+                tarea['etapa_label'].config(text="Cancelando...")
+
+    def _carga_interrumpida(self):
+        # Volver al estado anterior a la carga
+        if self.data is None:
+            self.file_path = None
+            self.load_button.config(state="normal")
+        else:
+            self.show_welcome()
+
+    def cancelar_carga(self):
+        """Pide al hilo de carga que se detenga en el siguiente aviso de progreso"""
+        self._cancelar_tarea('_carga_activa')
 
     def reload_file(self):
         """Recargar archivo y volver a la pantalla inicial"""
+        if self._carga_activa is not None:
+            self.cancelar_carga()
+            self._carga_activa = None
+        # Los resultados calculados se conservan: si se vuelve a cargar el mismo archivo sin cambios se reutilizan
         self.data = None
+        self.conjunto = None
         self.file_path = None
         if self.current_figure:
             plt.close(self.current_figure)
@@ -743,17 +1017,21 @@ class App:
     def show_correlation(self):
         """Muestra la matriz de correlación"""
         if self.data is not None:
-            old_stdout = sys.stdout
-            sys.stdout = captured_output = io.StringIO()
-            
-            correlation_matrix = calculate_correlation_matrix(self.data, target_column='DBO5')
+            def calcular():
+                columnas = ['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA', 'DBO5']
+                if self.motor_correlacion is None:
+                    self.motor_correlacion = MotorCorrelacion.MotorCorrelacion(columnas)
+                # self.data crece por el final al actualizar, así que solo se suman las filas nuevas
+                self.motor_correlacion.sincronizar(self.data[columnas])
+                return [self.motor_correlacion.correlacion(metodo, columnas) for metodo in MotorCorrelacion.METODOS]
             
-            sys.stdout = old_stdout
-            output = captured_output.getvalue()
+            resultados = self.resultado_en_cache('correlacion', calcular)
+            output = "".join(AnalisisRegresion.texto_correlacion(r, 'DBO5') for r in resultados)
             
             description = ("La matriz de correlación muestra qué tan relacionadas están las variables entre sí. "
                           "Valores cercanos a 1 o -1 indican fuerte relación (positiva o negativa), mientras que "
-                          "valores cercanos a 0 indican poca o ninguna relación lineal. Esto ayuda a identificar "
+                          "valores cercanos a 0 indican poca o ninguna relación lineal. Spearman y Kendall miden la "
+                          "relación por rangos (monótona, menos sensible a valores extremos). Esto ayuda a identificar "
                           "qué variables son mejores predictores de la DBO5.")
             
             self.show_text_result("📊 Matriz de Correlación", output, description)
@@ -763,15 +1041,24 @@ class App:
     def run_regression(self):
         """Ejecuta la regresión paso a paso"""
         if self.data is not None:
-            old_stdout = sys.stdout
-            sys.stdout = captured_output = io.StringIO()
+            def calcular():
+                X = self.conjunto.tabla(['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA'])
+                y = self.conjunto.serie('DBO5')
+                resultado = AnalisisRegresion.regresion_paso_a_paso(X, y)
+                
+                # Intervalos bootstrap de los coeficientes del modelo elegido
+                seleccion = resultado.variables_seleccionadas
+                remuestreo = Bootstrap.bootstrap_regresion(X[seleccion], y, semilla=0) if seleccion else None
+                return resultado, remuestreo
             
-            X = self.data[['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA']]
-            y = self.data['DBO5']
-            self.model = stepwise_regression(X, y)
+            self.model, remuestreo = self.resultado_en_cache('stepwise', calcular)
             
-            sys.stdout = old_stdout
-            output = captured_output.getvalue()
+            # El texto se arma al abrir la vista; el resultado lo guarda para las siguientes veces
+            output = self.model.resumen()
+            if remuestreo is not None:
+                output += (f"\nIntervalos de confianza bootstrap ({Bootstrap.REPETICIONES} remuestreos, "
+                           f"{remuestreo.nivel:.0%}):\n"
+                           + remuestreo.intervalos.to_string(float_format=lambda v: f"{v:.6g}") + "\n")
             
             description = ("La regresión paso a paso (stepwise) construye un modelo predictivo seleccionando automáticamente "
                           "las variables más significativas. Comienza sin variables y añade una a una las que más mejoran "
@@ -916,13 +1203,13 @@ class App:
         
         # Canvas de matplotlib
         self.current_figure = fig
-        self.current_canvas = FigureCanvasTkAgg(fig, master=fig_frame)
+        self.current_canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=fig_frame)
         self.current_canvas.draw()
         
         # Toolbar de navegación
         toolbar_frame = tk.Frame(fig_frame, bg=COLOR_LIGHT_GRAY)
         toolbar_frame.pack(side="bottom", fill="x")
-        toolbar = NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
+        toolbar = backend_tkagg.NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
         toolbar.update()
         
         # Widget del canvas
@@ -980,16 +1267,15 @@ class App:
             messagebox.showerror("Error", "Por favor, cargue un archivo primero.")
             return
             
-        OD_values = self.data['OD_mg/L'].values
-        DQO_values = self.data['DQO_TOT'].values
-        BOD5_values = self.data['DBO5'].values
-        BOD5_predichos = calcular_BOD5(self.data['OD_mg/L'], self.data['DQO_TOT'])
+        OD_values = self.conjunto['OD_mg/L']
+        DQO_values = self.conjunto['DQO_TOT']
+        BOD5_values = self.conjunto['DBO5']
+        BOD5_predichos = AnalisisRegresion.calcular_BOD5(OD_values, DQO_values, self.modelo_actual())
         
-        # Calcular métricas de error
+        # Calcular métricas de error (las mismas que reporta el modo por lotes)
         errores = BOD5_values - BOD5_predichos
-        mae = np.mean(np.abs(errores))
-        rmse = np.sqrt(np.mean(errores**2))
-        r2 = 1 - (np.sum(errores**2) / np.sum((BOD5_values - np.mean(BOD5_values))**2))
+        metricas = AnalisisRegresion.metricas_prediccion(BOD5_values, BOD5_predichos)
+        mae, rmse, r2 = metricas['mae'], metricas['rmse'], metricas['r2']
         
         fig, ax = plt.subplots(figsize=(10, 6))
         
@@ -1157,9 +1443,9 @@ class App:
         # Obtener datos filtrados
         selected_year = self.comp_year_var.get()
         if selected_year == "Todos los años":
-            filtered_data = self.data.copy()
+            filtered_data = self.conjunto
         else:
-            filtered_data = self.data[self.data['AÑO'] == int(selected_year)].copy()
+            filtered_data = self.conjunto.por_año(int(selected_year))
         
         if len(filtered_data) == 0:
             # Mostrar mensaje si no hay datos
@@ -1173,15 +1459,11 @@ class App:
             no_data_label.pack(expand=True)
             return
         
-        # Ordenar por fecha si existe
-        if 'FECHA_DT' in filtered_data.columns:
-            filtered_data = filtered_data.sort_values('FECHA_DT')
-        
-        # Obtener valores
-        OD_values = filtered_data['OD_mg/L'].values
-        DQO_values = filtered_data['DQO_TOT'].values
-        BOD5_values = filtered_data['DBO5'].values
-        BOD5_predichos = calcular_BOD5(filtered_data['OD_mg/L'], filtered_data['DQO_TOT'])
+        # Obtener valores (ya ordenados por fecha)
+        OD_values = filtered_data['OD_mg/L']
+        DQO_values = filtered_data['DQO_TOT']
+        BOD5_values = filtered_data['DBO5']
+        BOD5_predichos = AnalisisRegresion.calcular_BOD5(OD_values, DQO_values, self.modelo_actual())
         
         # Calcular métricas
         errores = BOD5_values - BOD5_predichos
@@ -1204,8 +1486,8 @@ class App:
         # Configurar eje X según el filtro
         if selected_year == "Todos los años":
             ax.set_xlabel("Observaciones", fontsize=10)
-        elif 'MES' in filtered_data.columns:
-            meses = filtered_data['MES'].values
+        else:
+            meses = filtered_data.meses
             x_labels = [f"{MESES_ESP.get(int(m), m)}" for m in meses]
             
             n_labels = len(x_labels)
@@ -1217,8 +1499,6 @@ class App:
             ax.set_xticks(range(0, n_labels, step))
             ax.set_xticklabels([x_labels[i] for i in range(0, n_labels, step)], rotation=45, ha='right')
             ax.set_xlabel("Mes", fontsize=10)
-        else:
-            ax.set_xlabel("Observaciones", fontsize=10)
         
         ax.set_ylabel("Demanda Bioquímica de Oxígeno (mg/L)", fontsize=10)
         
@@ -1242,8 +1522,8 @@ class App:
             'errores': errores,
             'OD_values': OD_values,
             'DQO_values': DQO_values,
-            'meses': filtered_data['MES'].values if 'MES' in filtered_data.columns else None,
-            'años': filtered_data['AÑO'].values if 'AÑO' in filtered_data.columns else None
+            'meses': filtered_data.meses,
+            'años': filtered_data.años
         }
         
         @cursor1.connect("add")
@@ -1274,13 +1554,13 @@ class App:
         
         # Canvas de matplotlib
         self.current_figure = fig
-        self.current_canvas = FigureCanvasTkAgg(fig, master=self.comp_fig_container)
+        self.current_canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=self.comp_fig_container)
         self.current_canvas.draw()
         
         # Toolbar
         toolbar_frame = tk.Frame(self.comp_fig_container, bg=COLOR_LIGHT_GRAY)
         toolbar_frame.pack(side="bottom", fill="x")
-        toolbar = NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
+        toolbar = backend_tkagg.NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
         toolbar.update()
         
         self.current_canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
@@ -1343,12 +1623,12 @@ class App:
 
     def vista_residuals(self):
         """Gráfica de residuales (errores) con tooltips"""
-        if not hasattr(self, 'model'):
+        if self.model is None:
             messagebox.showerror("Error", "Por favor, ejecute primero la 'Regresión Paso a Paso'\nen la sección de Análisis Estadístico.")
             return
             
         y_pred = self.model.predict()
-        y_real = self.data['DBO5'].values
+        y_real = self.conjunto['DBO5']
         residuos = y_real - y_pred
         
         # Calcular estadísticas de residuos
@@ -1429,15 +1709,192 @@ class App:
         
         self.embed_prediction_figure(fig, "⚠️ Análisis de Errores (Residuales)", stats_info, description)
     
+    def vista_regresion_grupos(self):
+        """Coeficientes de DBO5 ~ OD + DQO ajustados por año y por mes calendario"""
+        if self.data is None:
+            messagebox.showerror("Error", "Por favor, cargue un archivo primero.")
+            return
+        
+        por_año, por_mes = self.resultado_en_cache(
+            'regresion_grupos', lambda: RegresionGrupos.regresion_por_año_y_mes(self.conjunto))
+        
+        fig, ejes = plt.subplots(2, 3, figsize=(13, 7))
+        for fila, (tabla, etiqueta) in enumerate([(por_año, "Año"), (por_mes, "Mes")]):
+            x = np.arange(len(tabla))
+            marcas = [str(g) for g in tabla['grupo']] if etiqueta == "Año" else \
+                [MESES_ESP.get(int(g), str(g)) for g in tabla['grupo']]
+            for columna, (variable, titulo, color) in enumerate([('OD_mg/L', "Coeficiente OD", COLOR_TEAL),
+                                                                  ('DQO_TOT', "Coeficiente DQO", COLOR_GREEN)]):
+                ax = ejes[fila, columna]
+                ax.errorbar(x, tabla[f'coef_{variable}'], yerr=1.96 * tabla[f'error_{variable}'],
+                            fmt='o-', color=color, ecolor='#999999', capsize=3, markersize=5)
+                ax.axhline(0, color='black', linestyle='--', linewidth=0.8)
+                ax.set_title(f"{titulo} por {etiqueta.lower()}", fontsize=10, fontweight='bold')
+                ax.set_xticks(x, marcas, rotation=45 if etiqueta == "Año" else 0, fontsize=8)
+                ax.grid(True, alpha=0.3)
+            
+            ax = ejes[fila, 2]
+            ax.bar(x, tabla['r2'], color=COLOR_LIGHT_GREEN, edgecolor=COLOR_TEAL)
+            for i, n in enumerate(tabla['n']):
+                ax.text(i, 0.02, f"n={n}", ha='center', va='bottom', fontsize=7, rotation=90)
+            ax.set_ylim(0, 1)
+            ax.set_title(f"R² por {etiqueta.lower()}", fontsize=10, fontweight='bold')
+            ax.set_xticks(x, marcas, rotation=45 if etiqueta == "Año" else 0, fontsize=8)
+            ax.grid(True, alpha=0.3, axis='y')
+        
+        description = ("Se ajusta DBO5 = a × OD + b × DQO + c por separado para cada año y cada mes calendario. "
+                       "Las barras verticales son intervalos de confianza del 95% de cada coeficiente; si cambian "
+                       "mucho entre meses o años, la relación tiene deriva estacional o temporal.")
+        self.embed_figure_with_description(fig, "🗓️ Regresión por Año y Mes", description)
+
+    def ajuste_robusto(self, norma, predictores):
+        """Regresión OLS y robusta de DBO5 sobre `predictores`; se recalcula solo si cambian los datos"""
+        def calcular():
+            X = self.conjunto.tabla(list(predictores))
+            y = self.conjunto.serie('DBO5')
+            return AnalisisRegresion.regresion_directa(X, y), RegresionRobusta.regresion_robusta(X, y, norma)
+        return self.resultado_en_cache(f"robusta_{norma}_{'_'.join(predictores)}", calcular)
+
+    def _texto_regresion_robusta(self, norma):
+        partes = []
+        for predictores in (('OD_mg/L', 'DQO_TOT'), ('DQO_TOT',)):
+            ols, robusto = self.ajuste_robusto(norma, predictores)
+            reponderadas, descartadas = robusto.filas_reponderadas
+            tabla = ols.params.to_frame('Coef. OLS')
+            tabla['Error OLS'] = ols.bse
+            tabla[f'Coef. {norma.capitalize()}'] = robusto.params
+            tabla[f'Error {norma.capitalize()}'] = robusto.bse
+            tabla['P>|z|'] = robusto.pvalues
+            partes.append(f"\nDBO5 ~ {' + '.join(predictores)}\n{'─' * 60}\n")
+            partes.append(tabla.to_string(float_format=lambda v: f"{v:.6g}") + "\n")
+            partes.append(f"\nEscala robusta (MAD): {robusto.scale:.4f} mg/L   |   "
+                          f"Iteraciones: {robusto.iteraciones}{'' if robusto.convergio else ' (sin convergencia)'}\n")
+            partes.append(f"Filas con peso reducido: {reponderadas} de {int(robusto.nobs)}"
+                          + (f"   |   con peso 0: {descartadas}" if norma == 'tukey' else "") + "\n")
+            
+            # Observaciones que el ajuste robusto casi ignora (típicamente picos de tormenta)
+            menores = np.argsort(robusto.weights.to_numpy(), kind='stable')[:5]
+            partes.append("\nObservaciones con menor peso:\n")
+            for i in menores:
+                fecha = self.conjunto.fechas[i]
+                fecha = str(fecha)[:10] if not np.isnat(fecha) else "sin fecha"
+                partes.append(f"  {fecha}  DQO {self.conjunto['DQO_TOT'][i]:8.2f}  SST {self.conjunto['SST'][i]:8.2f}  "
+                              f"DBO5 {self.conjunto['DBO5'][i]:8.2f}  peso {robusto.weights.iat[i]:.3f}\n")
+        return "".join(partes)
+
+    def vista_regresion_robusta(self):
+        """Ajustes robustos (Huber o Tukey) de los modelos de DBO5 comparados con mínimos cuadrados"""
+        if self.data is None:
+            messagebox.showerror("Error", "Por favor, cargue un archivo primero.")
+            return
+        
+        opciones = {"Huber": 'huber', "Tukey (bicuadrada)": 'tukey'}
+        norma_var = tk.StringVar(value=next(k for k, v in opciones.items() if v == self.norma_robusta))
+        
+        def controles(frame):
+            tk.Label(frame, text="🛡️ Norma:", font=("Segoe UI", 10), bg=COLOR_WHITE,
+                     fg=COLOR_DARK_TEAL).pack(side="left", padx=(0, 5))
+            combo = ttk.Combobox(frame, textvariable=norma_var, values=list(opciones), state="readonly",
+                                 width=20, font=("Segoe UI", 10))
+            combo.pack(side="left")
+            combo.bind("<<ComboboxSelected>>", lambda _evento: actualizar())
+        
+        def actualizar():
+            self.norma_robusta = opciones[norma_var.get()]
+            texto.config(state="normal")
+            texto.delete("1.0", "end")
+            texto.insert("1.0", self._texto_regresion_robusta(self.norma_robusta))
+            texto.config(state="disabled")
+        
+        description = ("Los picos de DQO y SST de los eventos de tormenta pesan mucho en mínimos cuadrados. "
+                       "La regresión robusta (mínimos cuadrados reponderados) reduce el peso de las observaciones "
+                       "con residuos grandes: Huber las pondera de forma gradual y Tukey puede descartarlas por "
+                       "completo. La norma elegida también se usa en la vista Predicción DQO.")
+        texto = self.show_text_result("🛡️ Regresión Robusta", self._texto_regresion_robusta(self.norma_robusta),
+                                      description, controles)
+
+    def vista_regularizacion(self):
+        """Rutas de ridge y lasso de DBO5 sobre potencias e interacciones de los parámetros, con validación cruzada"""
+        if self.data is None:
+            messagebox.showerror("Error", "Por favor, cargue un archivo primero.")
+            return
+        
+        def calcular():
+            X = self.conjunto.tabla(list(Regularizacion.PREDICTORES))
+            y = self.conjunto.serie('DBO5')
+            return {metodo: Regularizacion.ruta_regularizacion(X, y, metodo) for metodo in Regularizacion.METODOS}
+        rutas = self.resultado_en_cache('regularizacion', calcular)
+        
+        fig, ejes = plt.subplots(2, 2, figsize=(12, 7))
+        lineas = []
+        for fila, (metodo, titulo) in enumerate([('lasso', "Lasso"), ('ridge', "Ridge")]):
+            ruta = rutas[metodo]
+            log_lambda = np.log10(ruta.lambdas)
+            ax = ejes[fila, 0]
+            for nombre, coeficientes in ruta.coeficientes_estandarizados.items():
+                linea, = ax.plot(log_lambda, coeficientes, linewidth=1.2, label=nombre)
+                lineas.append(linea)
+            ax.axvline(np.log10(ruta.lambda_min), color='gray', linestyle=':', linewidth=1)
+            ax.axvline(np.log10(ruta.lambda_1se), color=COLOR_TEAL, linestyle='--', linewidth=1)
+            ax.axhline(0, color='black', linewidth=0.6)
+            ax.set_title(f"Ruta {titulo}: coeficientes estandarizados", fontsize=10, fontweight='bold')
+            ax.set_xlabel("log₁₀ λ", fontsize=9)
+            ax.invert_xaxis()
+            ax.grid(True, alpha=0.3)
+            
+            ax = ejes[fila, 1]
+            ax.errorbar(log_lambda, ruta.error_cv, yerr=ruta.error_cv_se, fmt='o', color=COLOR_GREEN,
+                        ecolor='#cccccc', markersize=3, capsize=0)
+            ax.axvline(np.log10(ruta.lambda_min), color='gray', linestyle=':', linewidth=1, label="λ mínimo")
+            ax.axvline(np.log10(ruta.lambda_1se), color=COLOR_TEAL, linestyle='--', linewidth=1, label="λ 1-SE")
+            ax.set_title(f"{titulo}: RMSE de validación cruzada (10 pliegues)", fontsize=10, fontweight='bold')
+            ax.set_xlabel("log₁₀ λ", fontsize=9)
+            ax.set_ylabel("RMSE (mg/L)", fontsize=9)
+            ax.invert_xaxis()
+            ax.legend(fontsize=8)
+            ax.grid(True, alpha=0.3)
+        
+        # Tooltips: nombre del término de cada curva
+        cursor = mplcursors.cursor(lineas, hover=True)
+        
+        @cursor.connect("add")
+        def on_add(sel):
+            sel.annotation.set_text(f"{sel.artist.get_label()}\nlog₁₀ λ = {sel.target[0]:.2f}\n"
+                                    f"coef. = {sel.target[1]:.4f}")
+            sel.annotation.get_bbox_patch().set(fc="white", alpha=0.95)
+        
+        lasso, ridge = rutas['lasso'], rutas['ridge']
+        terminos = lasso.terminos()
+        stats_info = (
+            f"📐 Lasso (λ 1-SE = {lasso.lambda_1se:.3g}):\n\n"
+            f"• Términos elegidos: {len(terminos)} de {len(lasso.nombres)}\n"
+            + "".join(f"  {nombre}: {valor:.4g}\n" for nombre, valor in terminos.items())
+            + f"  const: {lasso.constantes[lasso.indice_1se]:.4g}\n\n"
+            f"• RMSE CV: {lasso.error_cv[lasso.indice_1se]:.2f} mg/L\n"
+            f"  (mínimo {lasso.error_cv[lasso.indice_min]:.2f})\n\n"
+            f"─────────────────\n"
+            f"〰️ Ridge (λ 1-SE = {ridge.lambda_1se:.3g}):\n\n"
+            f"• Grados de libertad:\n  {ridge.grados_libertad[ridge.indice_1se]:.1f} de {len(ridge.nombres)}\n\n"
+            f"• RMSE CV: {ridge.error_cv[ridge.indice_1se]:.2f} mg/L\n"
+            f"  (mínimo {ridge.error_cv[ridge.indice_min]:.2f})"
+        )
+        
+        description = ("DBO5 se ajusta sobre pH, DQO, OD, SST y temperatura más sus cuadrados e interacciones. "
+                       "A la izquierda, cómo cambia cada coeficiente a medida que "
+                       "baja la penalización λ (de izquierda a derecha): Lasso anula términos y Ridge solo los encoge. A la derecha, el error de "
+                       "validación cruzada; la línea discontinua marca el λ más penalizado cuyo error está a un error "
+                       "estándar del mínimo, y es el modelo que resume el panel.")
+        self.embed_prediction_figure(fig, "〰️ Ridge y Lasso: términos polinomiales", stats_info, description)
+
     def vista_tss_bod5(self):
         """Relación DQO-DBO5 con tooltips"""
         if self.data is None:
             messagebox.showerror("Error", "Por favor, cargue un archivo primero.")
             return
             
-        sorted_data = self.data.sort_values(by='DQO_TOT', ascending=True)
-        cod_sorted = sorted_data['DQO_TOT'].values
-        dbo5_sorted = sorted_data['DBO5'].values
+        orden = np.argsort(self.conjunto['DQO_TOT'], kind='stable')
+        cod_sorted = self.conjunto['DQO_TOT'][orden]
+        dbo5_sorted = self.conjunto['DBO5'][orden]
         
         # Calcular correlación y regresión
         correlacion = np.corrcoef(cod_sorted, dbo5_sorted)[0, 1]
@@ -1514,8 +1971,8 @@ class App:
             messagebox.showerror("Error", "Por favor, cargue un archivo primero.")
             return
             
-        X = self.data['DQO_TOT'].values
-        y = self.data['DBO5'].values
+        X = self.conjunto['DQO_TOT']
+        y = self.conjunto['DBO5']
         
         # Calcular regresión
         z = np.polyfit(X, y, 1)
@@ -1542,6 +1999,13 @@ class App:
         ax.fill_between(x_line, p(x_line) - 2*se, p(x_line) + 2*se, 
                        alpha=0.15, color='red', label='Intervalo ±2σ')
         
+        # Ajuste robusto con la norma elegida en "Regresión Robusta" (menos sensible a los picos)
+        _, robusto = self.ajuste_robusto(self.norma_robusta, ('DQO_TOT',))
+        b_robusto = robusto.params
+        ax.plot(x_line, b_robusto['const'] + b_robusto['DQO_TOT'] * x_line, "--", color=COLOR_TEAL, linewidth=2,
+                label=f"Robusta ({self.norma_robusta.capitalize()}): DBO5 = {b_robusto['DQO_TOT']:.4f}×DQO "
+                      f"{b_robusto['const']:+.2f}")
+        
         ax.set_xlabel("Demanda Química de Oxígeno (mg/L)", fontsize=10)
         ax.set_ylabel("Demanda Bioquímica de Oxígeno (mg/L)", fontsize=10)
         ax.set_title("Regresión Lineal: DQO → DBO5", fontsize=12, fontweight='bold')
@@ -1579,6 +2043,8 @@ class App:
             f"• R² (Determinación):\n  {r2:.4f}\n\n"
             f"• Correlación:\n  {correlacion:.4f}\n\n"
             f"• Error Estándar:\n  {se:.2f} mg/L\n\n"
+            f"• Robusta ({self.norma_robusta.capitalize()}):\n  DBO5 = {b_robusto['DQO_TOT']:.4f}×DQO\n"
+            f"  {b_robusto['const']:+.2f}\n\n"
             f"─────────────────\n"
             f"🎯 Uso del Modelo:\n\n"
             f"Para estimar DBO5,\n"
@@ -1587,7 +2053,8 @@ class App:
         )
         
         description = ("Modelo de regresión lineal que permite estimar la DBO5 a partir de la DQO. La línea roja representa "
-                      "la ecuación del modelo, y el área sombreada indica el intervalo de confianza (±2σ). Este modelo es útil "
+                      "la ecuación del modelo, y el área sombreada indica el intervalo de confianza (±2σ); la línea punteada es el "
+                      "ajuste robusto, que resta peso a los picos extremos. Este modelo es útil "
                       "cuando solo se dispone de mediciones de DQO y se necesita estimar rápidamente la DBO5.")
         
         self.embed_prediction_figure(fig, "🎯 Regresión DQO → DBO5", stats_info, description)
@@ -1775,18 +2242,19 @@ class App:
         años_proyeccion = min(int(proyeccion_str.split()[0]), 4)  # Máximo 4 años
         
         # Obtener datos
-        n_puntos = len(self.data)
+        n_puntos = len(self.conjunto)
         tiempo = np.arange(n_puntos)
         
         # Determinar qué parámetro graficar
         selected = self.tendencia_param_var.get()
         
         # Obtener último año de los datos
-        ultimo_año = int(self.data['AÑO'].max()) if 'AÑO' in self.data.columns else 2024
+        años_disponibles = self.get_available_years()
+        ultimo_año = años_disponibles[-1] if años_disponibles else 2024
         
         # Configuración según parámetro
         if "OD" in selected:
-            valores = self.data['OD_mg/L'].values
+            valores = self.conjunto['OD_mg/L']
             color_datos = "#3d8b6e"
             color_linea = "#2980b9"
             y_label = "Oxígeno Disuelto (mg/L)"
@@ -1796,7 +2264,7 @@ class App:
             descripcion = (f"💡 Proyección del Oxígeno Disuelto para los próximos {años_proyeccion} año(s). "
                           f"Cada gráfica muestra los valores mensuales predichos. Valores >6 mg/L indican buena calidad del agua.")
         elif "DQO" in selected:
-            valores = self.data['DQO_TOT'].values
+            valores = self.conjunto['DQO_TOT']
             color_datos = "#e67e22"
             color_linea = "#d35400"
             y_label = "Demanda Química de Oxígeno (mg/L)"
@@ -1806,7 +2274,7 @@ class App:
             descripcion = (f"💡 Proyección de la DQO para los próximos {años_proyeccion} año(s). "
                           f"Valores altos indican mayor contaminación. La tendencia ayuda a planificar acciones de control.")
         else:  # DBO5
-            valores = self.data['DBO5'].values
+            valores = self.conjunto['DBO5']
             color_datos = "#9b59b6"
             color_linea = "#8e44ad"
             y_label = "Demanda Bioquímica de Oxígeno (mg/L)"
@@ -1976,13 +2444,13 @@ class App:
         
         # Embeber la figura en el frame scrollable
         self.current_figure = fig
-        canvas = FigureCanvasTkAgg(fig, master=self.tendencia_scrollable_frame)
+        canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=self.tendencia_scrollable_frame)
         canvas.draw()
         
         # Toolbar
         toolbar_frame = tk.Frame(self.tendencia_scrollable_frame, bg=COLOR_LIGHT_GRAY)
         toolbar_frame.pack(fill="x", pady=(5, 0))
-        toolbar = NavigationToolbar2Tk(canvas, toolbar_frame)
+        toolbar = backend_tkagg.NavigationToolbar2Tk(canvas, toolbar_frame)
         toolbar.update()
         
         canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
@@ -2088,7 +2556,9 @@ class App:
         
         # Generar estadísticas por año proyectado
         n_puntos = len(tiempo)
-        meses_por_año = n_puntos // max(1, (int(self.data['AÑO'].max()) - int(self.data['AÑO'].min()) + 1))
+        años_disponibles = self.get_available_years()
+        n_años = (años_disponibles[-1] - años_disponibles[0] + 1) if años_disponibles else 1
+        meses_por_año = n_puntos // max(1, n_años)
         if meses_por_año == 0:
             meses_por_año = 12
         
@@ -2268,13 +2738,13 @@ class App:
         
         # Canvas de matplotlib
         self.current_figure = fig
-        self.current_canvas = FigureCanvasTkAgg(fig, master=fig_frame)
+        self.current_canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=fig_frame)
         self.current_canvas.draw()
         
         # Toolbar
         toolbar_frame = tk.Frame(fig_frame, bg=COLOR_LIGHT_GRAY)
         toolbar_frame.pack(side="bottom", fill="x")
-        toolbar = NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
+        toolbar = backend_tkagg.NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
         toolbar.update()
         
         self.current_canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
@@ -2317,10 +2787,14 @@ class App:
         )
         desc_info.pack(anchor="w")
         
+        # Modelo activo: su covarianza y varianza residual ya están guardadas, así que cada
+        # tecla solo evalúa la predicción y sus intervalos (sin volver a ajustar)
+        self.modelo_simulador = self.modelo_actual()
+        
         # Ecuación del modelo
         eq_label = tk.Label(
             main_frame,
-            text="Modelo: DBO5 = -6.6283 × OD + 0.3407 × DQO + 21.3075",
+            text="Modelo: " + self.modelo_simulador.ecuacion({'OD_mg/L': 'OD', 'DQO_TOT': 'DQO'}),
             font=("Segoe UI", 10, "italic"),
             bg=COLOR_LIGHT_TEAL,
             fg="#555555",
@@ -2335,6 +2809,8 @@ class App:
         # Variables para entries
         self.od_var = tk.StringVar(value="5.0")
         self.dqo_var = tk.StringVar(value="100.0")
+        self.od_var.trace_add("write", self._programar_simulador)
+        self.dqo_var.trace_add("write", self._programar_simulador)
         
         # Input OD
         od_frame = tk.Frame(input_frame, bg=COLOR_LIGHT_TEAL)
@@ -2382,9 +2858,12 @@ class App:
         )
         dqo_entry.pack(side="left")
         
-        # Botón calcular
+        # Botones: calcular y barrido de escenarios
+        botones_frame = tk.Frame(main_frame, bg=COLOR_LIGHT_TEAL)
+        botones_frame.pack(pady=30)
+        
         calc_button = tk.Button(
-            main_frame,
+            botones_frame,
             text="🧮 Calcular DBO5",
             font=("Segoe UI", 12, "bold"),
             bg=COLOR_GREEN,
@@ -2397,7 +2876,23 @@ class App:
             cursor="hand2",
             command=self.calcular_dbo5_simulador
         )
-        calc_button.pack(pady=30)
+        calc_button.pack(side="left", padx=10)
+        
+        barrido_button = tk.Button(
+            botones_frame,
+            text="🗺️ Barrido de escenarios",
+            font=("Segoe UI", 12, "bold"),
+            bg=COLOR_TEAL,
+            fg="white",
+            activebackground=COLOR_LIGHT_GREEN,
+            activeforeground="white",
+            relief="flat",
+            padx=30,
+            pady=10,
+            cursor="hand2",
+            command=self.vista_barrido_simulador
+        )
+        barrido_button.pack(side="left", padx=10)
         
         # Frame para resultado
         self.result_frame = tk.Frame(main_frame, bg="white", relief="solid", bd=2)
@@ -2413,13 +2908,29 @@ class App:
         )
         self.result_label.pack()
         
+        self.intervalo_label = tk.Label(
+            self.result_frame,
+            text="",
+            font=("Segoe UI", 10),
+            bg="white",
+            fg="#555555",
+            justify="center"
+        )
+        self.intervalo_label.pack(pady=(0, 15))
+        
         # Información adicional
         info_frame = tk.Frame(main_frame, bg=COLOR_LIGHT_TEAL)
         info_frame.pack(fill="x", pady=30)
         
-        info_text = """
+        metricas = self.modelo_simulador.metricas
+        if self.modelo_simulador.ajustado:
+            ajuste = (f"• Coeficiente de determinación (R²): {metricas['r2']:.4f}  |  "
+                      f"Error estándar residual: {np.sqrt(metricas['sigma2']):.2f} mg/L  |  n = {metricas['n']}")
+        else:
+            ajuste = "• Coeficientes publicados: cargue un archivo para ajustar el modelo y obtener intervalos"
+        info_text = f"""
 Información del Modelo:
-• Coeficiente de determinación (R²): El modelo explica una porción significativa de la variabilidad
+{ajuste}
 • Rango típico de OD: 2.0 - 10.0 mg/L
 • Rango típico de DQO: 50 - 500 mg/L
 • La predicción es más precisa dentro de los rangos de datos de entrenamiento
@@ -2433,33 +2944,36 @@ Información del Modelo:
             fg="#666666",
             justify="left"
         ).pack(anchor="w", padx=50)
+        
+        self.calcular_dbo5_simulador(en_vivo=True)
+    
+    def _programar_simulador(self, *_):
+        """Recalcula el simulador cuando el usuario deja de escribir (cada tecla reinicia la espera)"""
+        if self._simulador_pendiente is not None:
+            self.root.after_cancel(self._simulador_pendiente)
+        self._simulador_pendiente = self.root.after(DEMORA_SIMULADOR, self._recalcular_simulador)
     
-    def calcular_dbo5_simulador(self):
-        """Calcula DBO5 con los valores ingresados en el simulador"""
+    def _recalcular_simulador(self):
+        self._simulador_pendiente = None
+        if self.result_label.winfo_exists():  # La vista pudo cerrarse mientras se esperaba
+            self.calcular_dbo5_simulador(en_vivo=True)
+    
+    def calcular_dbo5_simulador(self, en_vivo=False):
+        """
+        Calcula DBO5 con los valores ingresados en el simulador, con intervalos del 95%.
+        En vivo (al escribir) un valor incompleto no abre un mensaje de error.
+        """
         try:
             od = float(self.od_var.get())
             dqo = float(self.dqo_var.get())
             
-            # Aplicar modelo de regresión
-            # DBO5 = -6.6283 × OD + 0.3407 × DQO + 21.3075
-            dbo5_pred = -6.6283 * od + 0.3407 * dqo + 21.3075
+            # Aplicar el modelo de regresión ajustado a los datos cargados
+            modelo = self.modelo_simulador or self.modelo_actual()
+            dbo5_pred, confianza, prediccion = modelo.intervalos(od, dqo)
+            dbo5_pred = float(dbo5_pred)
             
-            # Determinar calidad del agua según DBO5
-            if dbo5_pred < 3:
-                calidad = "🟢 Excelente (Agua muy limpia)"
-                color = "#27ae60"
-            elif dbo5_pred < 6:
-                calidad = "🟡 Buena (Agua limpia)"
-                color = "#f39c12"
-            elif dbo5_pred < 30:
-                calidad = "🟠 Aceptable (Algo contaminada)"
-                color = "#e67e22"
-            elif dbo5_pred < 100:
-                calidad = "🔴 Contaminada"
-                color = "#e74c3c"
-            else:
-                calidad = "⚫ Muy contaminada"
-                color = "#2c3e50"
+            # Determinar calidad del agua según DBO5 (las mismas bandas que el barrido de escenarios)
+            calidad, color = BarridoEscenarios.banda_calidad(dbo5_pred)
             
             # Actualizar resultado
             self.result_label.config(
@@ -2467,6 +2981,252 @@ Información del Modelo:
                 fg=color,
                 font=("Segoe UI", 16, "bold")
             )
+            if np.isfinite(confianza[0]):
+                # La DBO5 no puede ser negativa: los límites inferiores se recortan en 0
+                self.intervalo_label.config(
+                    text=f"IC 95% de la media: {max(float(confianza[0]), 0.0):.2f} – {float(confianza[1]):.2f} mg/L\n"
+                         f"IP 95% de una muestra nueva: {max(float(prediccion[0]), 0.0):.2f} – "
+                         f"{float(prediccion[1]):.2f} mg/L"
+                )
+            else:
+                self.intervalo_label.config(text="Sin intervalos: el modelo publicado no incluye su covarianza")
             
         except ValueError:
-            messagebox.showerror("Error", "Por favor, ingrese valores numéricos válidos para OD y DQO.")
+            if en_vivo:
+                self.result_label.config(text="Ingrese valores numéricos para OD y DQO", fg="#888888",
+                                         font=("Segoe UI", 14))
+                self.intervalo_label.config(text="")
+            else:
+                messagebox.showerror("Error", "Por favor, ingrese valores numéricos válidos para OD y DQO.")
+
+    def vista_barrido_simulador(self):
+        """Mapa de DBO5 y bandas de calidad sobre una malla de valores de los predictores del modelo"""
+        self.clear_display()
+        modelo = self.modelo_actual()
+        
+        # Frame superior para título y descripción
+        header_frame = tk.Frame(self.display_frame, bg=COLOR_WHITE)
+        header_frame.pack(fill="x", pady=(0, 10))
+        
+        tk.Label(
+            header_frame,
+            text="🗺️ Barrido de Escenarios DBO5",
+            font=("Segoe UI", 16, "bold"),
+            bg=COLOR_WHITE,
+            fg=COLOR_DARK_TEAL
+        ).pack(anchor="w")
+        
+        desc_frame = tk.Frame(header_frame, bg="#e3f2fd", relief="flat")
+        desc_frame.pack(fill="x", pady=(8, 0))
+        tk.Label(
+            desc_frame,
+            text="💡 Evalúa el modelo del simulador en todas las combinaciones de los rangos indicados y colorea cada "
+                 "punto según la banda de calidad del agua. Las líneas blancas son las isolíneas de DBO5 en los "
+                 "límites de las bandas (3, 6, 30 y 100 mg/L); los puntos negros son las observaciones.",
+            font=("Segoe UI", 9),
+            bg="#e3f2fd",
+            fg="#1565c0",
+            justify="left",
+            wraplength=800,
+            pady=8,
+            padx=10
+        ).pack(anchor="w")
+        
+        # Controles: rango de los dos primeros predictores y valor fijo de los demás
+        controles_frame = tk.Frame(self.display_frame, bg=COLOR_WHITE)
+        controles_frame.pack(fill="x", pady=(0, 10))
+        
+        def campo(texto, valor, ancho=8):
+            tk.Label(controles_frame, text=texto, font=("Segoe UI", 10), bg=COLOR_WHITE,
+                     fg=COLOR_DARK_TEAL).pack(side="left", padx=(10, 4))
+            variable = tk.StringVar(value=valor)
+            tk.Entry(controles_frame, textvariable=variable, font=("Segoe UI", 10), width=ancho,
+                     justify="center", relief="solid", bd=1).pack(side="left")
+            return variable
+        
+        # Por defecto los rangos típicos (los picos de tormenta estirarían el mapa) y la media de los datos
+        rangos, fijos = {}, {}
+        for i, predictor in enumerate(modelo.predictores):
+            minimo, maximo = BarridoEscenarios.RANGOS_TIPICOS.get(predictor, (0.0, 100.0))
+            media = np.nanmean(self.conjunto[predictor]) if self.conjunto is not None else (minimo + maximo) / 2
+            if i < 2:
+                rangos[predictor] = (campo(f"{predictor} de", f"{minimo:.4g}"), campo("a", f"{maximo:.4g}"))
+            else:
+                fijos[predictor] = campo(f"{predictor} =", f"{media:.4g}")
+        resolucion = campo("Resolución", str(BarridoEscenarios.RESOLUCION), ancho=6)
+        
+        tk.Button(
+            controles_frame,
+            text="🔄 Actualizar",
+            font=("Segoe UI", 10, "bold"),
+            bg=COLOR_GREEN,
+            fg="white",
+            relief="flat",
+            padx=12,
+            cursor="hand2",
+            command=self.update_barrido_plot
+        ).pack(side="left", padx=(15, 0))
+        
+        # Frame para la figura
+        self.fig_container = tk.Frame(self.display_frame, bg=COLOR_WHITE, relief="solid", borderwidth=1)
+        self.fig_container.pack(fill="both", expand=True)
+        
+        # Guardar parámetros para actualizar
+        self.barrido_params = {'modelo': modelo, 'rangos': rangos, 'fijos': fijos, 'resolucion': resolucion}
+        
+        self.update_barrido_plot()
+
+    def update_barrido_plot(self):
+        """Evalúa la malla con los rangos actuales y vuelve a dibujar el mapa"""
+        params = self.barrido_params
+        try:
+            rangos = {p: (float(minimo.get()), float(maximo.get())) for p, (minimo, maximo) in params['rangos'].items()}
+            fijos = {p: float(valor.get()) for p, valor in params['fijos'].items()}
+            resolucion = int(params['resolucion'].get())
+        except ValueError:
+            messagebox.showerror("Error", "Por favor, ingrese valores numéricos válidos para los rangos y la resolución.")
+            return
+        if any(minimo >= maximo for minimo, maximo in rangos.values()) or not 2 <= resolucion <= 2000:
+            messagebox.showerror("Error", "Cada rango debe tener el mínimo menor que el máximo y la resolución "
+                                          "debe estar entre 2 y 2000.")
+            return
+        
+        modelo = params['modelo']
+        resultado = BarridoEscenarios.barrido(modelo, rangos, fijos, resolucion)
+        
+        # Limpiar contenedor de figura
+        for widget in self.fig_container.winfo_children():
+            widget.destroy()
+        if self.current_figure:
+            plt.close(self.current_figure)
+        
+        bandas = BarridoEscenarios.BANDAS_CALIDAD
+        colores = matplotlib_colors.ListedColormap([color for _, _, color in bandas])
+        colores.set_over(BarridoEscenarios.SIN_CALIDAD[1])  # celdas con SIN_CLASE
+        limites = matplotlib_colors.BoundaryNorm(np.arange(len(bandas) + 1) - 0.5, len(bandas))
+        extension = [*rangos[resultado.eje_x], *rangos[resultado.eje_y]]
+        
+        fig, ax = plt.subplots(figsize=(10, 6))
+        imagen = ax.imshow(resultado.clases, origin='lower', extent=extension, aspect='auto',
+                           cmap=colores, norm=limites, interpolation='nearest')
+        isolineas = ax.contour(resultado.valores_x, resultado.valores_y, resultado.dbo5,
+                               levels=BarridoEscenarios.LIMITES_CALIDAD, colors='white', linewidths=1.2)
+        ax.clabel(isolineas, fmt='%g mg/L', fontsize=8)
+        
+        if self.conjunto is not None:
+            ax.scatter(self.conjunto[resultado.eje_x], self.conjunto[resultado.eje_y], s=8, c='black',
+                       alpha=0.4, label='Observaciones')
+        ax.set_xlim(extension[:2])
+        ax.set_ylim(extension[2:])
+        
+        # Leyenda: banda (sin emoji, que la fuente de matplotlib no dibuja) y fracción de la malla
+        fracciones = resultado.fracciones()
+        marcas = [matplotlib_patches.Patch(color=color, label=f"{etiqueta.split(' ', 1)[1]}: {fraccion:.0%}")
+                  for (_, etiqueta, color), fraccion in zip(bandas, fracciones)]
+        ax.legend(handles=marcas + ax.get_legend_handles_labels()[0], loc='upper left', fontsize=8,
+                  framealpha=0.9)
+        
+        fijos_texto = ", ".join(f"{p} = {v:g}" for p, v in resultado.fijos.items())
+        ax.set_title(f"DBO5 predicha por banda de calidad ({resolucion}×{resolucion})"
+                     + (f" con {fijos_texto}" if fijos_texto else ""), fontsize=12, fontweight='bold')
+        ax.set_xlabel(resultado.eje_x, fontsize=10)
+        ax.set_ylabel(resultado.eje_y, fontsize=10)
+        
+        # Tooltips: DBO5 y banda en el punto señalado
+        cursor = mplcursors.cursor(imagen, hover=True)
+        
+        @cursor.connect("add")
+        def on_add(sel):
+            x, y = sel.target
+            punto = {resultado.eje_x: x, resultado.eje_y: y, **resultado.fijos}
+            dbo5 = float(modelo.predecir(*(punto[p] for p in modelo.predictores)))
+            calidad, _ = BarridoEscenarios.banda_calidad(dbo5)
+            sel.annotation.set_text(f"{resultado.eje_x}: {x:.2f}\n{resultado.eje_y}: {y:.2f}\n"
+                                    f"DBO5: {dbo5:.2f} mg/L\n{calidad}")
+            sel.annotation.get_bbox_patch().set(fc="white", alpha=0.95)
+        
+        fig.tight_layout()
+        
+        # Canvas de matplotlib
+        self.current_figure = fig
+        self.current_canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=self.fig_container)
+        self.current_canvas.draw()
+        
+        # Toolbar de navegación
+        toolbar_frame = tk.Frame(self.fig_container, bg=COLOR_LIGHT_GRAY)
+        toolbar_frame.pack(side="bottom", fill="x")
+        toolbar = backend_tkagg.NavigationToolbar2Tk(self.current_canvas, toolbar_frame)
+        toolbar.update()
+        
+        # Widget del canvas
+        self.current_canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+
+    def vista_puntuar_escenarios(self):
+        """Predice DBO5 para un archivo de escenarios OD/DQO (CSV o Excel) y guarda los resultados"""
+        if self._puntuacion_activa is not None:
+            return
+        entrada = filedialog.askopenfilename(
+            title="Selecciona el archivo de escenarios (columnas OD y DQO)",
+            filetypes=[("CSV o Excel", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Archivos de Excel", "*.xlsx")]
+        )
+        if not entrada:
+            return
+        salida = filedialog.asksaveasfilename(
+            title="Guardar resultados como",
+            initialfile=os.path.splitext(os.path.basename(entrada))[0] + "_dbo5.csv",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Archivos de Excel", "*.xlsx")]
+        )
+        if not salida:
+            return
+        
+        # El mismo modelo del simulador; el hilo solo lee sus coeficientes y covarianza
+        modelo = self.modelo_actual()
+        
+        self.clear_display()
+        tk.Label(
+            self.display_frame,
+            text="📑 Puntuación de Escenarios",
+            font=("Segoe UI", 16, "bold"),
+            bg=COLOR_WHITE,
+            fg=COLOR_DARK_TEAL
+        ).pack(anchor="w")
+        
+        contenedor = tk.Frame(self.display_frame, bg=COLOR_WHITE)
+        contenedor.place(relx=0.5, rely=0.5, anchor="center")
+        
+        def terminar(evento):
+            if evento[0] == 'listo':
+                description = ("Cada fila del archivo se guardó con la DBO5 predicha, el intervalo de confianza del 95% "
+                               "de la media (ic_inferior, ic_superior), el intervalo de predicción del 95% de una "
+                               "muestra nueva (ip_inferior, ip_superior) y la banda de calidad del agua. El archivo se "
+                               "lee y se escribe por bloques, así que su tamaño no limita la memoria.")
+                self.show_text_result("📑 Puntuación de Escenarios",
+                                      PuntuacionEscenarios.texto_resumen(evento[1]), description)
+            else:
+                if evento[0] == 'error':
+                    messagebox.showerror("❌ Error", f"No se pudo puntuar el archivo:\n{evento[1]}")
+                self.show_welcome()
+        
+        self._iniciar_tarea('_puntuacion_activa', self._puntuar_en_segundo_plano, (entrada, salida, modelo),
+                            contenedor, f"Leyendo {os.path.basename(entrada)}...", COLOR_WHITE,
+                            self.cancelar_puntuacion, terminar)
+
+    @staticmethod
+    def _puntuar_en_segundo_plano(entrada, salida, modelo, cancelar, eventos):
+        # Igual que la carga: fuera del hilo de Tk, solo se comunica a través de la cola
+        def progreso(etapa, filas=None, total=None):
+            if cancelar.is_set():
+                raise ProcesoDatos.CargaCancelada()
+            eventos.put(('progreso', etapa, filas, total))
+        
+        try:
+            eventos.put(('listo', PuntuacionEscenarios.puntuar_archivo(entrada, salida, modelo, progreso=progreso)))
+        except ProcesoDatos.CargaCancelada:
+            eventos.put(('cancelada',))
+        except Exception as e:
+            eventos.put(('error', e))
+
+    def cancelar_puntuacion(self):
+        """Pide al hilo de puntuación que se detenga en el siguiente aviso de progreso"""
+        self._cancelar_tarea('_puntuacion_activa')
@@ -0,0 +1,404 @@
+# Lote.py - Modo por lotes (sin Tk) para correr el análisis sobre uno o varios archivos
+#
+# Uso:
+#   python Lote.py datos/*.xlsx --salida resultados --procesos 4
+#
+# Por cada libro se crea una carpeta dentro de --salida con:
+#   resumen.json        métricas, coeficientes y p-valores de los modelos
+#   correlacion.csv     matriz de correlación de Pearson
+#   correlacion_dbo5.csv   Pearson, Spearman y Kendall contra DBO5 con p-valores
+#   coeficientes.csv    coeficientes de las regresiones paso a paso
+#   rondas.csv          variable que entró o salió en cada ronda y diagnósticos del modelo resultante
+#   registro.txt        tablas de cada ronda y resumen de statsmodels de los modelos
+#   regresion_por_año.csv / regresion_por_mes.csv   DBO5 ~ OD + DQO ajustada por grupo
+#   regularizacion.csv  coeficientes de lasso y ridge (λ mínimo y λ 1-SE) sobre potencias e interacciones
+#   robusta.csv         con --robusta: coeficientes OLS y robustos (Huber o Tukey) del modelo elegido
+#   bootstrap.csv       intervalos bootstrap (percentil y BCa) de los coeficientes
+#   validacion.csv      error fuera de muestra (k-fold repetido y un año fuera)
+#   subconjuntos.csv    todos los subconjuntos de predictores con R² ajustado, AIC, BIC y Cp
+#   recursivo.csv       DBO5 ~ OD + DQO actualizada fila a fila en orden de fecha (ventana deslizante)
+#                       con el error de predicción un paso adelante
+#   *.png               gráficas (backend Agg, sin ventana)
+# y en --salida queda resumen_lote.csv con una fila por archivo. Si dos libros de carpetas
+# distintas se llaman igual, sus carpetas llevan además la huella de la ruta (datos_1a2b3c4d).
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from MotorStepwise import DIRECCIONES, CRITERIOS
+from RegresionRobusta import NORMAS
+
+# Parámetros que entran a la regresión paso a paso y variable objetivo
+PREDICTORES = ['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA']
+OBJETIVO = 'DBO5'
+# Modelo del registro con el que se predice la DBO5 (el mismo del simulador)
+MODELO_PREDICCION = 'dbo5_od_dqo'
+
+
+def expandir_rutas(rutas):
+    """Acepta archivos, carpetas (se toman sus .xlsx) y patrones glob"""
+    encontrados = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            encontrados.extend(sorted(glob.glob(os.path.join(ruta, '*.xlsx'))))
+        elif any(c in ruta for c in '*?['):
+            encontrados.extend(sorted(glob.glob(ruta)))
+        else:
+            encontrados.append(ruta)
+    # Sin duplicados (el mismo archivo escrito de dos formas cuenta una vez) y sin los
+    # temporales que deja Excel abierto (~$archivo.xlsx)
+    vistos = set()
+    return [r for r in encontrados
+            if not os.path.basename(r).startswith('~$')
+            and not (_ruta_normal(r) in vistos or vistos.add(_ruta_normal(r)))]
+
+
+def _ruta_normal(ruta):
+    return os.path.normcase(os.path.abspath(ruta))
+
+
+def carpetas_libros(rutas, salida):
+    """
+    Carpeta de resultados de cada libro: salida/<nombre del archivo>. Si dos libros de carpetas
+    distintas se llaman igual, cada uno lleva además la huella de su ruta (salida/datos_1a2b3c4d)
+    para que dos trabajadores nunca escriban en la misma carpeta.
+    """
+    nombres = [os.path.splitext(os.path.basename(ruta))[0] for ruta in rutas]
+    repeticiones = Counter(nombre.casefold() for nombre in nombres)  # Sistemas de archivos sin mayúsculas
+    carpetas = {}
+    for ruta, nombre in zip(rutas, nombres):
+        if repeticiones[nombre.casefold()] > 1:
+            nombre = f"{nombre}_{hashlib.sha256(_ruta_normal(ruta).encode('utf-8')).hexdigest()[:8]}"
+        carpetas[ruta] = os.path.join(salida, nombre)
+    return carpetas
+
+
+def _resumen_modelo(modelo):
+    return {
+        'variables': [str(v) for v in modelo.params.index],
+        'coeficientes': {str(k): float(v) for k, v in modelo.params.items()},
+        'p_valores': {str(k): float(v) for k, v in modelo.pvalues.items()},
+        'r2': float(modelo.rsquared),
+        'r2_ajustado': float(modelo.rsquared_adj),
+        'observaciones': int(modelo.nobs),
+    }
+
+
+def _resumen_robusta(ajuste):
+    reponderadas, descartadas = ajuste.filas_reponderadas
+    return {
+        'norma': ajuste.norma,
+        'coeficientes': {str(k): float(v) for k, v in ajuste.params.items()},
+        'p_valores': {str(k): float(v) for k, v in ajuste.pvalues.items()},
+        'escala': float(ajuste.scale),
+        'iteraciones': ajuste.iteraciones,
+        'convergio': ajuste.convergio,
+        'filas_reponderadas': reponderadas,
+        'filas_descartadas': descartadas,
+    }
+
+
+def _resumen_regularizacion(ruta):
+    return {
+        'lambda_min': ruta.lambda_min,
+        'lambda_1se': ruta.lambda_1se,
+        'rmse_cv_min': float(ruta.error_cv[ruta.indice_min]),
+        'rmse_cv_1se': float(ruta.error_cv[ruta.indice_1se]),
+        'terminos_1se': [str(t) for t in ruta.terminos().index],
+    }
+
+
+def _resumen_recursivo(tabla, ventana):
+    errores = tabla['error_un_paso'].dropna()
+    ultimos = tabla.drop(columns=['FECHA', 'error_un_paso']).dropna()
+    return {
+        'ventana': ventana,
+        'rmse_un_paso': float((errores ** 2).mean() ** 0.5) if len(errores) else None,
+        'coeficientes_finales': {str(k): float(v) for k, v in ultimos.iloc[-1].items()} if len(ultimos) else None,
+    }
+
+
+def _graficas(carpeta, conjunto, correlacion, predichos):
+    import matplotlib.pyplot as plt
+
+    # Matriz de correlación
+    fig, ax = plt.subplots(figsize=(7, 6))
+    imagen = ax.imshow(correlacion.to_numpy(), cmap='RdYlGn', vmin=-1, vmax=1)
+    ax.set_xticks(range(len(correlacion.columns)), correlacion.columns, rotation=45, ha='right')
+    ax.set_yticks(range(len(correlacion.index)), correlacion.index)
+    for i in range(len(correlacion.index)):
+        for j in range(len(correlacion.columns)):
+            ax.text(j, i, f"{correlacion.iat[i, j]:.2f}", ha='center', va='center', fontsize=8)
+    fig.colorbar(imagen, ax=ax)
+    ax.set_title('Matriz de correlación de Pearson')
+    fig.tight_layout()
+    fig.savefig(os.path.join(carpeta, 'correlacion.png'), dpi=120)
+    plt.close(fig)
+
+    # DBO5 observada contra la predicha por el modelo del simulador (registro de modelos)
+    observado = conjunto[OBJETIVO]
+    fig, ax = plt.subplots(figsize=(7, 6))
+    ax.scatter(observado, predichos, s=18, alpha=0.7, color='#3d8b6e')
+    limite = float(max(observado.max(), predichos.max())) if len(observado) else 1.0
+    ax.plot([0, limite], [0, limite], '--', color='gray', linewidth=1)
+    ax.set_xlabel('DBO5 observada (mg/L)')
+    ax.set_ylabel('DBO5 predicha (mg/L)')
+    ax.set_title('DBO5 observada vs predicción')
+    fig.tight_layout()
+    fig.savefig(os.path.join(carpeta, 'dbo5_vs_prediccion.png'), dpi=120)
+    plt.close(fig)
+
+
+def procesar_libro(ruta, salida, figuras=True, usar_cache=True, direccion='backward', criterio='p', robusta=None,
+                   carpeta=None):
+    """
+    Corre limpieza, correlación, regresiones paso a paso y métricas de predicción
+    sobre un libro y escribe los resultados en su carpeta (por defecto salida/<nombre>;
+    procesar_lote la asigna con carpetas_libros). Devuelve el resumen.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import pandas as pd
+    from ConjuntoDatos import ConjuntoDatos
+    from RegistroModelos import RegistroModelos
+    from Bootstrap import bootstrap_regresion
+    from RegresionRobusta import regresion_robusta
+    from MinimosCuadradosRecursivos import trayectoria, VENTANA as VENTANA_RECURSIVA
+    from Regularizacion import ruta_regularizacion, METODOS as METODOS_REGULARIZACION
+    from MotorCorrelacion import MotorCorrelacion, METODOS
+    from RegresionGrupos import regresion_por_año_y_mes
+    from ValidacionCruzada import (pliegues_aleatorios, pliegues_por_año, validacion_cruzada,
+                                   validacion_modelo_fijo, PLIEGUES, REPETICIONES)
+    from AnalisisRegresion import (texto_correlacion, regresion_paso_a_paso, regresion_directa,
+                                   calcular_BOD5, metricas_prediccion, best_subset_regression,
+                                   mejores_subconjuntos)
+
+    inicio = time.perf_counter()
+    carpeta = carpeta or carpetas_libros([ruta], salida)[ruta]
+    os.makedirs(carpeta, exist_ok=True)
+
+    # Con caché, el conjunto se abre con memmap: si el libro no cambió no se lee ni se limpia
+    conjunto = ConjuntoDatos.desde_archivo(ruta, usar_cache=usar_cache)
+
+    # Resultados estructurados; el texto de registro.txt se arma solo al final
+    motor = MotorCorrelacion(PREDICTORES + [OBJETIVO]).agregar(conjunto.matriz(PREDICTORES + [OBJETIVO]))
+    correlacion = motor.correlacion('pearson').r
+    modelo = regresion_paso_a_paso(conjunto.tabla(PREDICTORES), conjunto.serie(OBJETIVO),
+                                   direccion=direccion, criterio=criterio)
+    modelo_dqo = regresion_directa(conjunto.serie('DQO_TOT'), conjunto.serie(OBJETIVO))
+
+    subconjuntos = best_subset_regression(conjunto.tabla(PREDICTORES), conjunto.serie(OBJETIVO))
+    # Predicción con el mismo modelo OD + DQO que usan la interfaz y la puntuación de escenarios:
+    # ajustado a este libro y guardado en su registro de modelos
+    modelo_prediccion = RegistroModelos.para_archivo(ruta).obtener(MODELO_PREDICCION, conjunto)
+    predichos = calcular_BOD5(conjunto['OD_mg/L'], conjunto['DQO_TOT'], modelo_prediccion)
+
+    # Error fuera de muestra del modelo elegido (k-fold repetido y un año fuera) y de la ecuación fija
+    seleccion = modelo.variables_seleccionadas
+    validaciones = {}
+    if seleccion and len(conjunto) >= PLIEGUES:
+        pliegues = pliegues_aleatorios(len(conjunto), PLIEGUES, REPETICIONES, semilla=0)
+        validaciones['stepwise_kfold'] = validacion_cruzada(conjunto.tabla(seleccion), conjunto[OBJETIVO], pliegues)
+    if len(set(conjunto.años_disponibles())) >= 2:
+        por_año = pliegues_por_año(conjunto.años)
+        if seleccion:
+            validaciones['stepwise_por_año'] = validacion_cruzada(conjunto.tabla(seleccion), conjunto[OBJETIVO], por_año)
+        # La ecuación publicada es la única fija: el modelo del registro se ajustó con todos los años
+        publicados = calcular_BOD5(conjunto['OD_mg/L'], conjunto['DQO_TOT'])
+        validaciones['ecuacion_por_año'] = validacion_modelo_fijo(conjunto[OBJETIVO], publicados, por_año)
+    validaciones = {nombre: v.resumen() for nombre, v in validaciones.items()}
+
+    # Incertidumbre de los coeficientes del modelo elegido (bootstrap de pares, percentil y BCa)
+    remuestreo = bootstrap_regresion(conjunto.tabla(seleccion), conjunto.serie(OBJETIVO), semilla=0,
+                                     datos=conjunto) if seleccion else None
+
+    # Rutas de lasso y ridge sobre cuadrados e interacciones de los predictores
+    rutas = {}
+    if len(conjunto) >= PLIEGUES:
+        rutas = {metodo: ruta_regularizacion(conjunto.tabla(PREDICTORES), conjunto.serie(OBJETIVO), metodo)
+                 for metodo in METODOS_REGULARIZACION}
+
+    # Mismo modelo ajustado con un M-estimador, para ver cuánto lo mueven los picos de tormenta
+    ajuste_robusto = None
+    if robusta and seleccion:
+        ajuste_robusto = regresion_robusta(conjunto.tabla(seleccion), conjunto.serie(OBJETIVO), robusta)
+
+    # Modelo de la ecuación publicada actualizado como en una sonda: muestra cómo derivan los coeficientes
+    recursivo = trayectoria(conjunto.tabla(['OD_mg/L', 'DQO_TOT']), conjunto[OBJETIVO], ventana=VENTANA_RECURSIVA)
+    recursivo.insert(0, 'FECHA', conjunto.fechas[recursivo.index])
+
+    resumen = {
+        'archivo': os.path.abspath(ruta),
+        'carpeta': os.path.abspath(carpeta),
+        'filas': len(conjunto),
+        'años': conjunto.años_disponibles(),
+        'correlacion_dbo5': {str(k): float(v) for k, v in correlacion[OBJETIVO].items()},
+        'stepwise': _resumen_modelo(modelo),
+        'regresion_dqo': _resumen_modelo(modelo_dqo),
+        'mejor_subconjunto': {criterio: list(tabla['variables'].iloc[0])
+                              for criterio, tabla in mejores_subconjuntos(subconjuntos, top=1).items()},
+        'prediccion': {'modelo': modelo_prediccion.ecuacion(), **metricas_prediccion(conjunto[OBJETIVO], predichos)},
+        'bootstrap': remuestreo.intervalos.to_dict(orient='index') if remuestreo is not None else None,
+        'validacion_cruzada': {nombre: tabla.to_dict(orient='index') for nombre, tabla in validaciones.items()},
+        'regularizacion': {metodo: _resumen_regularizacion(ruta) for metodo, ruta in rutas.items()},
+        'robusta': _resumen_robusta(ajuste_robusto) if ajuste_robusto is not None else None,
+        'recursivo': _resumen_recursivo(recursivo, VENTANA_RECURSIVA),
+    }
+
+    correlacion.to_csv(os.path.join(carpeta, 'correlacion.csv'), encoding='utf-8')
+    contra_dbo5 = {}
+    for metodo in METODOS:
+        resultado = motor.correlacion(metodo)
+        contra_dbo5[metodo] = resultado.r[OBJETIVO]
+        contra_dbo5[f'p_{metodo}'] = resultado.p_valores[OBJETIVO]
+    contra_dbo5['n'] = resultado.n[OBJETIVO]
+    pd.DataFrame(contra_dbo5).to_csv(os.path.join(carpeta, 'correlacion_dbo5.csv'), encoding='utf-8')
+    subconjuntos.assign(variables=subconjuntos['variables'].map(' + '.join)).to_csv(
+        os.path.join(carpeta, 'subconjuntos.csv'), index=False, encoding='utf-8')
+    with open(os.path.join(carpeta, 'coeficientes.csv'), 'w', encoding='utf-8') as f:
+        f.write('modelo,variable,coeficiente,p_valor\n')
+        for nombre in ('stepwise', 'regresion_dqo'):
+            for variable, coef in resumen[nombre]['coeficientes'].items():
+                f.write(f"{nombre},{variable},{coef!r},{resumen[nombre]['p_valores'][variable]!r}\n")
+    por_año, por_mes = regresion_por_año_y_mes(conjunto)
+    por_año.to_csv(os.path.join(carpeta, 'regresion_por_año.csv'), index=False, encoding='utf-8')
+    por_mes.to_csv(os.path.join(carpeta, 'regresion_por_mes.csv'), index=False, encoding='utf-8')
+    if remuestreo is not None:
+        remuestreo.intervalos.to_csv(os.path.join(carpeta, 'bootstrap.csv'), index_label='variable', encoding='utf-8')
+    if rutas:
+        pd.DataFrame({f'{metodo}_{cual}': ruta.coeficientes_en(indice) for metodo, ruta in rutas.items()
+                      for cual, indice in (('min', ruta.indice_min), ('1se', ruta.indice_1se))}).to_csv(
+            os.path.join(carpeta, 'regularizacion.csv'), index_label='termino', encoding='utf-8')
+    if ajuste_robusto is not None:
+        pd.DataFrame({'coef_ols': modelo.params, 'error_ols': modelo.bse, 'p_ols': modelo.pvalues,
+                      'coef_robusto': ajuste_robusto.params, 'error_robusto': ajuste_robusto.bse,
+                      'p_robusto': ajuste_robusto.pvalues}).to_csv(
+            os.path.join(carpeta, 'robusta.csv'), index_label='variable', encoding='utf-8')
+    if validaciones:
+        pd.concat(validaciones, names=['validacion', 'metrica']).to_csv(
+            os.path.join(carpeta, 'validacion.csv'), encoding='utf-8')
+    recursivo.to_csv(os.path.join(carpeta, 'recursivo.csv'), index=False, encoding='utf-8')
+    modelo.rondas.to_csv(os.path.join(carpeta, 'rondas.csv'), index=False, encoding='utf-8')
+    with open(os.path.join(carpeta, 'registro.txt'), 'w', encoding='utf-8') as f:
+        f.write(texto_correlacion(motor.correlacion('pearson'), OBJETIVO))
+        f.write(modelo.resumen())
+        f.write(modelo_dqo.resumen())
+
+    if figuras:
+        _graficas(carpeta, conjunto, correlacion, predichos)
+
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    with open(os.path.join(carpeta, 'resumen.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    return resumen
+
+
+def _fila_lote(ruta, resumen=None, error=None):
+    if error is not None:
+        return {'archivo': ruta, 'estado': 'error', 'detalle': error}
+    return {
+        'archivo': ruta,
+        'estado': 'ok',
+        'carpeta': resumen['carpeta'],
+        'filas': resumen['filas'],
+        'r2_stepwise': resumen['stepwise']['r2'],
+        'variables_stepwise': ' '.join(v for v in resumen['stepwise']['variables'] if v != 'const'),
+        'mae_prediccion': resumen['prediccion']['mae'],
+        'rmse_prediccion': resumen['prediccion']['rmse'],
+        'r2_prediccion': resumen['prediccion']['r2'],
+        'segundos': resumen['segundos'],
+    }
+
+
+def escribir_resumen_lote(filas, salida):
+    import csv
+    columnas = ['archivo', 'estado', 'carpeta', 'filas', 'r2_stepwise', 'variables_stepwise',
+                'mae_prediccion', 'rmse_prediccion', 'r2_prediccion', 'segundos', 'detalle']
+    ruta = os.path.join(salida, 'resumen_lote.csv')
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=columnas)
+        escritor.writeheader()
+        escritor.writerows(filas)
+    return ruta
+
+
+def procesar_lote(rutas, salida, procesos=None, figuras=True, usar_cache=True, direccion='backward', criterio='p',
+                  robusta=None):
+    """
+    Procesa todos los libros; con más de un proceso cada libro va a un trabajador
+    distinto. Devuelve las filas del resumen en el mismo orden que `rutas`.
+    """
+    os.makedirs(salida, exist_ok=True)
+    if procesos is None:
+        procesos = min(len(rutas), os.cpu_count() or 1)
+
+    carpetas = carpetas_libros(rutas, salida)
+    filas = {}
+    if procesos <= 1 or len(rutas) <= 1:
+        for ruta in rutas:
+            try:
+                resumen = procesar_libro(ruta, salida, figuras, usar_cache, direccion, criterio, robusta,
+                                         carpetas[ruta])
+                filas[ruta] = _fila_lote(ruta, resumen)
+            except Exception as e:
+                filas[ruta] = _fila_lote(ruta, error=f"{type(e).__name__}: {e}")
+            _avisar(filas[ruta])
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            tareas = {pool.submit(procesar_libro, ruta, salida, figuras, usar_cache, direccion, criterio, robusta,
+                                  carpetas[ruta]): ruta
+                      for ruta in rutas}
+            for tarea in as_completed(tareas):
+                ruta = tareas[tarea]
+                try:
+                    filas[ruta] = _fila_lote(ruta, tarea.result())
+                except Exception as e:
+                    filas[ruta] = _fila_lote(ruta, error=f"{type(e).__name__}: {e}")
+                _avisar(filas[ruta])
+
+    return [filas[ruta] for ruta in rutas]
+
+
+def _avisar(fila):
+    if fila['estado'] == 'ok':
+        print(f"✔ {fila['archivo']}: {fila['filas']} filas, R² stepwise {fila['r2_stepwise']:.4f} "
+              f"({fila['segundos']:.1f} s)")
+    else:
+        print(f"✖ {fila['archivo']}: {fila['detalle']}", file=sys.stderr)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Análisis de DBO5 por lotes, sin interfaz gráfica.")
+    parser.add_argument('archivos', nargs='+', help="Libros de Excel, carpetas o patrones (*.xlsx)")
+    parser.add_argument('--salida', default='resultados', help="Carpeta de resultados (por defecto: resultados)")
+    parser.add_argument('--procesos', type=int, default=None,
+                        help="Número de procesos trabajadores (por defecto: uno por núcleo)")
+    parser.add_argument('--sin-figuras', action='store_true', help="No generar las gráficas PNG")
+    parser.add_argument('--sin-cache', action='store_true', help="No usar ni escribir la caché de datos limpios")
+    parser.add_argument('--direccion', choices=DIRECCIONES, default='backward',
+                        help="Sentido de la selección paso a paso (por defecto: backward)")
+    parser.add_argument('--criterio', choices=CRITERIOS, default='p',
+                        help="Criterio de la selección: p-valor, AIC o BIC (por defecto: p)")
+    parser.add_argument('--robusta', choices=tuple(NORMAS), default=None,
+                        help="Ajustar también el modelo elegido con regresión robusta (Huber o Tukey)")
+    args = parser.parse_args(argumentos)
+
+    rutas = expandir_rutas(args.archivos)
+    if not rutas:
+        parser.error("no se encontró ningún archivo .xlsx")
+
+    filas = procesar_lote(rutas, args.salida, args.procesos, not args.sin_figuras, not args.sin_cache,
+                          args.direccion, args.criterio, args.robusta)
+    ruta_resumen = escribir_resumen_lote(filas, args.salida)
+    errores = sum(fila['estado'] != 'ok' for fila in filas)
+    print(f"\n{len(filas) - errores} de {len(filas)} archivos procesados. Resumen: {ruta_resumen}")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
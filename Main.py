@@ -1,8 +1,32 @@
 # main.py
+import sys
+from CargaPerezosa import registrar_etapa, reporte_tiempos, MedidorImportaciones
+
+# Con --tiempos se muestra el desglose del arranque (similar a python -X importtime)
+MOSTRAR_TIEMPOS = "--tiempos" in sys.argv
+
+medidor = MedidorImportaciones()
+if MOSTRAR_TIEMPOS:
+    medidor.activar()
+
 import tkinter as tk
 from Interfaz import App
 
+medidor.desactivar()
+registrar_etapa("importar interfaz")
+
 # Configuración de la aplicación de tkinter
 root = tk.Tk()
 app = App(root)
+
+if MOSTRAR_TIEMPOS:
+    def mostrar_tiempos():
+        registrar_etapa("primera ventana")
+        print(medidor.reporte())
+        print()
+        print(reporte_tiempos())
+
+    # Se reporta cuando Tk ya dibujó la ventana; la precarga sigue en segundo plano
+    root.after_idle(mostrar_tiempos)
+
 root.mainloop()
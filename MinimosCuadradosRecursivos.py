@@ -0,0 +1,263 @@
+# MinimosCuadradosRecursivos.py - Modelo de DBO5 que se actualiza con cada observación nueva
+from collections import deque
+import numpy as np
+from scipy import stats
+
+# Si la matriz acumulada está peor condicionada que esto, se sigue esperando observaciones
+_CONDICION_MAXIMA = 1e12
+
+# Observaciones de la ventana deslizante que usa trayectoria() por defecto
+VENTANA = 60
+
+
+class MinimosCuadradosRecursivos:
+    """
+    Mínimos cuadrados recursivos para flujos de monitoreo continuo (sondas).
+
+    Cada observación actualiza los coeficientes y la inversa P = (X'X)⁻¹ con la
+    fórmula de Sherman-Morrison, con costo O(p²) sin importar cuánta historia haya.
+    - `olvido` (0 < λ ≤ 1): cada observación nueva multiplica el peso de las anteriores por λ.
+    - `ventana`: solo cuentan las últimas N observaciones; la que sale se descuenta
+      (downdate) con la misma fórmula, así que tampoco se recalcula nada.
+
+    Expone los mismos atributos que los resultados de statsmodels usados en
+    AnalisisRegresion (params, bse, tvalues, pvalues, rsquared, rsquared_adj, nobs,
+    ssr, aic, bic, predict).
+
+    Ejemplo (cada lectura de la sonda ajusta el modelo DBO5 ~ OD + DQO de los últimos 60 datos):
+
+        modelo = MinimosCuadradosRecursivos(['OD_mg/L', 'DQO_TOT'], ventana=60)
+        for od, dqo, dbo5 in lecturas:
+            if modelo.listo:
+                esperado = modelo.predict([od, dqo])  # Antes de conocer la DBO5 medida
+            modelo.actualizar([od, dqo], dbo5)
+        modelo.params, modelo.pvalues, modelo.rsquared
+    """
+
+    def __init__(self, nombres, constante=True, olvido=1.0, ventana=None):
+        if not 0 < olvido <= 1:
+            raise ValueError("El factor de olvido debe estar en (0, 1]")
+        if ventana is not None and ventana < 1:
+            raise ValueError("La ventana debe tener al menos una observación")
+        self.nombres = (['const'] if constante else []) + [str(n) for n in nombres]
+        self.constante = constante
+        self.olvido = olvido
+        self.ventana = ventana
+
+        p = len(self.nombres)
+        # Estadísticas suficientes ponderadas: X'X, X'y, y'y, suma de y y suma de pesos
+        self._xtx = np.zeros((p, p))
+        self._xty = np.zeros(p)
+        self._yty = 0.0
+        self._suma_y = 0.0
+        self._peso = 0.0
+        self._P = None
+        self._theta = np.zeros(p)
+        self._filas = deque() if ventana is not None else None
+        self.nobs = 0
+
+    # --- Actualización ---------------------------------------------------------------
+
+    def _fila(self, x):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        if self.constante:
+            x = np.concatenate(([1.0], x))
+        if len(x) != len(self.nombres):
+            raise ValueError(f"Se esperaban {len(self.nombres) - self.constante} predictores")
+        return x
+
+    def _acumular(self, x, y, peso):
+        self._xtx += peso * np.outer(x, x)
+        self._xty += peso * x * y
+        self._yty += peso * y * y
+        self._suma_y += peso * y
+        self._peso += peso
+
+    def actualizar(self, x, y):
+        """Incorpora una observación (predictores sin la constante, y) en O(p²)"""
+        x = self._fila(x)
+        y = float(y)
+        λ = self.olvido
+
+        if λ < 1:
+            self._xtx *= λ
+            self._xty *= λ
+            self._yty *= λ
+            self._suma_y *= λ
+            self._peso *= λ
+        self._acumular(x, y, 1.0)
+        self.nobs += 1
+
+        if self._P is None:
+            self._inicializar()
+        else:
+            Px = self._P @ x
+            k = Px / (λ + x @ Px)
+            self._theta = self._theta + k * (y - x @ self._theta)
+            self._P = (self._P - np.outer(k, Px)) / λ
+
+        if self._filas is not None:
+            self._filas.append((x, y))
+            if len(self._filas) > self.ventana:
+                x_viejo, y_viejo = self._filas.popleft()
+                # Con olvido, la fila que sale ya pesa λ^ventana
+                self._descontar(x_viejo, y_viejo, λ ** self.ventana)
+        return self
+
+    def _descontar(self, x, y, peso):
+        self._acumular(x, y, -peso)
+        self.nobs -= 1
+        if self._P is None:
+            return
+        Px = self._P @ x
+        denominador = 1 - peso * (x @ Px)
+        if denominador <= 1e-12:
+            # Quedarían menos filas independientes que parámetros: se vuelve a la fase inicial
+            self._P = None
+            self._inicializar()
+            return
+        self._P = self._P + peso * np.outer(Px, Px) / denominador
+        self._theta = self._theta - peso * (self._P @ x) * (y - x @ self._theta)
+
+    def _inicializar(self):
+        """Mientras no haya suficientes observaciones se acumula X'X; después se invierte una vez"""
+        if self.nobs < len(self.nombres):
+            return
+        if np.linalg.cond(self._xtx) > _CONDICION_MAXIMA:
+            return
+        self._P = np.linalg.inv(self._xtx)
+        self._theta = self._P @ self._xty
+
+    def actualizar_lote(self, X, y):
+        """Incorpora varias observaciones en orden (cada una con costo O(p²))"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        for fila, valor in zip(X, np.asarray(y, dtype=np.float64)):
+            self.actualizar(fila, valor)
+        return self
+
+    # --- Interfaz de resultados (como statsmodels) -------------------------------------
+
+    @property
+    def listo(self):
+        """True cuando ya hay suficientes observaciones para estimar todos los coeficientes"""
+        return self._P is not None
+
+    @property
+    def params(self):
+        import pandas as pd
+        return pd.Series(self._theta if self.listo else np.nan, index=self.nombres)
+
+    @property
+    def ssr(self):
+        if not self.listo:
+            return np.nan
+        return max(self._yty - self._theta @ self._xty, 0.0)
+
+    @property
+    def df_resid(self):
+        return self._peso - len(self.nombres)
+
+    @property
+    def df_model(self):
+        return len(self.nombres) - (1 if self.constante else 0)
+
+    @property
+    def mse_resid(self):
+        return self.ssr / self.df_resid if self.df_resid > 0 else np.nan
+
+    @property
+    def cov_params(self):
+        if not self.listo:
+            return np.full((len(self.nombres),) * 2, np.nan)
+        return self.mse_resid * self._P
+
+    @property
+    def bse(self):
+        import pandas as pd
+        return pd.Series(np.sqrt(np.diag(self.cov_params)), index=self.nombres)
+
+    @property
+    def tvalues(self):
+        return self.params / self.bse
+
+    @property
+    def pvalues(self):
+        import pandas as pd
+        gl = max(self.df_resid, 1)
+        return pd.Series(2 * stats.t.sf(np.abs(self.tvalues.to_numpy()), gl), index=self.nombres)
+
+    @property
+    def centered_tss(self):
+        if self._peso <= 0:
+            return np.nan
+        return self._yty - self._suma_y ** 2 / self._peso
+
+    @property
+    def rsquared(self):
+        tss = self.centered_tss if self.constante else self._yty
+        return 1 - self.ssr / tss if tss > 0 else np.nan
+
+    @property
+    def rsquared_adj(self):
+        if self.df_resid <= 0:
+            return np.nan
+        return 1 - (1 - self.rsquared) * (self._peso - (1 if self.constante else 0)) / self.df_resid
+
+    @property
+    def llf(self):
+        n = self._peso
+        return -n / 2 * (np.log(2 * np.pi * max(self.ssr, 1e-300) / n) + 1)
+
+    @property
+    def aic(self):
+        return -2 * self.llf + 2 * len(self.nombres)
+
+    @property
+    def bic(self):
+        return -2 * self.llf + len(self.nombres) * np.log(self._peso)
+
+    def predict(self, exog):
+        """DBO5 predicha para una fila o una matriz de predictores (con o sin la columna de la constante)"""
+        if hasattr(exog, 'columns') and all(n in exog.columns for n in self.nombres[self.constante:]):
+            exog = exog[[n for n in self.nombres if n in exog.columns]]
+        X = np.asarray(exog, dtype=np.float64)
+        predictores = len(self.nombres) - self.constante
+        # Un escalar, o un vector con un valor por predictor (con o sin la constante), es una sola fila
+        una_fila = X.ndim == 0 or (X.ndim == 1 and predictores > 1)
+        con_constante = (X.ndim == 2 and X.shape[1] == len(self.nombres)) or (una_fila and X.size == len(self.nombres))
+        X = X.reshape(-1, len(self.nombres) if con_constante else predictores)
+        if self.constante and not con_constante:
+            X = np.column_stack([np.ones(len(X)), X])
+        resultado = X @ self._theta if self.listo else np.full(len(X), np.nan)
+        return resultado[0] if una_fila else resultado
+
+
+def trayectoria(X, y, olvido=1.0, ventana=VENTANA):
+    """
+    Recorre las filas en orden (por ejemplo, por fecha) como lo haría una sonda: antes de
+    incorporar cada observación predice su DBO5 con el modelo vigente. Devuelve un DataFrame
+    con el error de esa predicción un paso adelante y los coeficientes después de cada fila;
+    las filas con valores faltantes se omiten.
+    """
+    import pandas as pd
+    nombres = [str(c) for c in X.columns] if hasattr(X, 'columns') else None
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    y = np.asarray(y, dtype=np.float64)
+    modelo = MinimosCuadradosRecursivos(nombres or [f"x{i}" for i in range(X.shape[1])],
+                                        olvido=olvido, ventana=ventana)
+    validas = np.flatnonzero(np.isfinite(X).all(axis=1) & np.isfinite(y))
+    errores = np.full(len(validas), np.nan)
+    coeficientes = np.full((len(validas), len(modelo.nombres)), np.nan)
+    for i, fila in enumerate(validas):
+        if modelo.listo:
+            errores[i] = y[fila] - modelo.predict(X[fila])
+        modelo.actualizar(X[fila], y[fila])
+        if modelo.listo:
+            coeficientes[i] = modelo._theta
+    tabla = pd.DataFrame(coeficientes, index=validas, columns=modelo.nombres)
+    tabla.insert(0, 'error_un_paso', errores)
+    return tabla
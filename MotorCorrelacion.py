@@ -0,0 +1,303 @@
+# MotorCorrelacion.py - Correlaciones de Pearson, Spearman y Kendall con co-momentos acumulados
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+METODOS = ('pearson', 'spearman', 'kendall')
+
+
+class MomentosConjuntos:
+    """
+    Co-momentos por par de columnas con casos completos por par (una fila cuenta para
+    el par i, j solo si ambas columnas tienen valor). Se acumulan por bloques con la
+    fórmula de combinación de Welford/Chan, así que agregar filas no recorre las anteriores.
+
+    Para el par (i, j): n[i, j] filas, media[i, j] media de la columna i en esas filas,
+    m2[i, j] suma de cuadrados centrados de la columna i y c[i, j] co-momento.
+    """
+
+    def __init__(self, p):
+        self.n = np.zeros((p, p))
+        self.media = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))
+        self.c = np.zeros((p, p))
+
+    def agregar(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return self
+        validos = np.isfinite(X)
+        M = validos.astype(np.float64)
+        # Se centra el bloque con su propia media para que las sumas no pierdan precisión
+        desplazamiento = np.where(validos, X, 0.0).sum(axis=0) / np.maximum(validos.sum(axis=0), 1)
+        Z = np.where(validos, X - desplazamiento, 0.0)
+
+        # Estadísticas del bloque para todos los pares con multiplicaciones matriciales
+        n_b = M.T @ M
+        suma = Z.T @ M
+        with np.errstate(divide='ignore', invalid='ignore'):
+            media_b = np.where(n_b > 0, suma / n_b, 0.0)
+        m2_b = (Z * Z).T @ M - media_b * suma
+        c_b = Z.T @ Z - media_b * suma.T
+        media_b = media_b + desplazamiento[:, None]
+
+        # Combinación con lo acumulado
+        n = self.n + n_b
+        with np.errstate(divide='ignore', invalid='ignore'):
+            proporcion = np.where(n > 0, n_b / n, 0.0)
+        delta = media_b - self.media
+        peso = self.n * proporcion
+        self.m2 = self.m2 + m2_b + delta * delta * peso
+        self.c = self.c + c_b + delta * delta.T * peso
+        self.media = self.media + delta * proporcion
+        self.n = n
+        return self
+
+    def pearson(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = self.c / np.sqrt(self.m2 * self.m2.T)
+        return np.clip(r, -1.0, 1.0)
+
+
+def _rangos(columna):
+    """
+    Rangos densos (enteros, -1 para faltantes) y rangos promedio (empates promediados,
+    NaN para faltantes) a partir de un único argsort de la columna.
+    """
+    orden = np.argsort(columna, kind='stable')  # Los NaN quedan al final
+    ordenados = columna[orden]
+    validos = int(np.isfinite(columna).sum())
+    nuevo_grupo = np.r_[True, ordenados[1:validos] != ordenados[:validos - 1]] if validos else np.array([], bool)
+    grupo = np.cumsum(nuevo_grupo) - 1
+    densos = np.full(len(columna), -1, dtype=np.int64)
+    densos[orden[:validos]] = grupo
+    return densos, _promedio_por_grupo(densos, densos >= 0)
+
+
+def _promedio_por_grupo(densos, filas):
+    """Rangos promedio de las filas seleccionadas a partir de sus rangos densos, sin volver a ordenar"""
+    tamaños = np.bincount(densos[filas], minlength=int(densos.max()) + 1 if len(densos) else 0)
+    fin = np.cumsum(tamaños)
+    promedio = np.full(len(densos), np.nan)
+    promedio[filas] = (fin - (tamaños - 1) / 2.0)[densos[filas]]
+    return promedio
+
+
+def _inversiones(secuencia, base):
+    """
+    Pares i < j con secuencia[i] > secuencia[j] (valores enteros en [0, base)), con
+    una mezcla ordenada de abajo hacia arriba vectorizada: en cada nivel se cuentan los
+    elementos del bloque izquierdo mayores que cada elemento del derecho con un solo searchsorted.
+    """
+    n = len(secuencia)
+    valores = secuencia.astype(np.int64)
+    posicion = np.arange(n)
+    total = 0
+    ancho = 1
+    while ancho < n:
+        par = posicion // (2 * ancho)
+        izquierda = (posicion % (2 * ancho)) < ancho
+        clave = par * base + valores
+        claves_izquierda = clave[izquierda]  # Ordenadas: cada bloque izquierdo ya está ordenado
+        derecha = ~izquierda
+        # Todo bloque izquierdo con pareja derecha está completo: empieza en par * ancho
+        inicio = par[derecha] * ancho
+        menores_o_iguales = np.searchsorted(claves_izquierda, clave[derecha], 'right') - inicio
+        total += int((ancho - menores_o_iguales).sum())
+        valores = np.sort(clave, kind="stable") - par * base  # timsort: mezcla de bloques ya ordenados
+        ancho *= 2
+    return total
+
+
+def _kendall_par(a, b, base):
+    """Tau-b de Kendall y su p-valor (aproximación normal con corrección por empates)"""
+    n = len(a)
+    if n < 2:
+        return np.nan, np.nan
+    orden = np.argsort(a * base + b, kind='stable')
+    clave = (a * base + b)[orden]
+    discordantes = _inversiones(b[orden], base)
+
+    # Tamaños de los grupos empatados en cada variable y en ambas a la vez
+    empates_a = np.bincount(a).astype(np.float64)
+    empates_b = np.bincount(b).astype(np.float64)
+    conjuntos = np.diff(np.flatnonzero(np.r_[True, clave[1:] != clave[:-1], True])).astype(np.float64)
+    n0 = n * (n - 1) / 2.0
+    n1 = (empates_a * (empates_a - 1) / 2).sum()
+    n2 = (empates_b * (empates_b - 1) / 2).sum()
+    n3 = (conjuntos * (conjuntos - 1) / 2).sum()
+    s = n0 - n1 - n2 + n3 - 2 * discordantes
+    denominador = np.sqrt((n0 - n1) * (n0 - n2))
+    if denominador == 0:
+        return np.nan, np.nan
+    tau = s / denominador
+
+    v0 = n * (n - 1) * (2 * n + 5)
+    vt = (empates_a * (empates_a - 1) * (2 * empates_a + 5)).sum()
+    vu = (empates_b * (empates_b - 1) * (2 * empates_b + 5)).sum()
+    v1 = (empates_a * (empates_a - 1)).sum() * (empates_b * (empates_b - 1)).sum() / (2 * n * (n - 1))
+    v2 = ((empates_a * (empates_a - 1) * (empates_a - 2)).sum() * (empates_b * (empates_b - 1) * (empates_b - 2)).sum()
+          / (9 * n * (n - 1) * (n - 2))) if n > 2 else 0.0
+    varianza = (v0 - vt - vu) / 18.0 + v1 + v2
+    p = 2 * stats.norm.sf(abs(s) / np.sqrt(varianza)) if varianza > 0 else np.nan
+    return float(np.clip(tau, -1.0, 1.0)), float(p)
+
+
+def _p_valor_t(r, n):
+    """P-valor bilateral de r con n - 2 grados de libertad (igual que pearsonr y spearmanr)"""
+    gl = n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt(gl / np.maximum((1 - r) * (1 + r), 0.0))
+        p = 2 * stats.t.sf(np.abs(t), np.maximum(gl, 1))
+    return np.where(gl > 0, p, np.nan)
+
+
+class ResultadoCorrelacion:
+    """Coeficientes, p-valores y filas usadas por par, como DataFrames con las columnas por nombre"""
+
+    def __init__(self, metodo, columnas, r, p_valores, n):
+        self.metodo = metodo
+        self.columnas = list(columnas)
+        self.r = pd.DataFrame(r, index=self.columnas, columns=self.columnas)
+        self.p_valores = pd.DataFrame(p_valores, index=self.columnas, columns=self.columnas)
+        self.n = pd.DataFrame(n.astype(np.int64), index=self.columnas, columns=self.columnas)
+
+    def contra(self, objetivo):
+        """Tabla de cada variable contra `objetivo`, ordenada por coeficiente"""
+        tabla = pd.DataFrame({objetivo: self.r[objetivo], 'p_valor': self.p_valores[objetivo],
+                              'n': self.n[objetivo]})
+        return tabla.sort_values(by=objetivo, ascending=False)
+
+
+class MotorCorrelacion:
+    """
+    Matrices de correlación de un conjunto de columnas que crece por filas.
+    - Pearson sale de MomentosConjuntos, que se actualiza solo con las filas nuevas.
+    - Spearman y Kendall se calculan desde rangos con un argsort por columna.
+    - Los resultados se guardan por (versión de los datos, columnas, método); la versión
+      cambia cada vez que se agregan o reemplazan filas.
+    Los faltantes se manejan por pares: cada par usa las filas en las que ambas columnas tienen valor.
+    """
+
+    def __init__(self, columnas):
+        self.columnas = [str(c) for c in columnas]
+        self._posiciones = {c: i for i, c in enumerate(self.columnas)}
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.momentos = MomentosConjuntos(len(self.columnas))
+        self._bloques = [np.empty((0, len(self.columnas)))]
+        self.version = 0
+        self._cache = {}
+        self._rangos = None
+        return self
+
+    def agregar(self, X):
+        """Incorpora filas nuevas (DataFrame con las columnas del motor o matriz en ese orden)"""
+        if hasattr(X, 'columns'):
+            X = X[self.columnas]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if len(X) == 0:
+            return self
+        self.momentos.agregar(X)
+        self._bloques.append(X)
+        self.version += 1
+        self._cache.clear()
+        self._rangos = None
+        return self
+
+    def sincronizar(self, X):
+        """
+        Deja el motor con exactamente las filas de X. Si las filas ya acumuladas son
+        el comienzo de X (caso de un archivo al que se le agregaron filas) solo se
+        agregan las nuevas; si no, se empieza de cero. Devuelve True si algo cambió.
+        """
+        if hasattr(X, 'columns'):
+            X = X[self.columnas]
+        X = np.asarray(X, dtype=np.float64)
+        previas = self.valores
+        if len(X) >= len(previas) and np.array_equal(X[:len(previas)], previas, equal_nan=True):
+            if len(X) == len(previas):
+                return False
+            self.agregar(X[len(previas):])
+        else:
+            self.reiniciar()
+            self.agregar(X)
+        return True
+
+    @property
+    def valores(self):
+        """Todas las filas acumuladas (los bloques se unen solo cuando se piden)"""
+        if len(self._bloques) > 1:
+            self._bloques = [np.concatenate(self._bloques)]
+        return self._bloques[0]
+
+    def correlacion(self, metodo='pearson', columnas=None):
+        """ResultadoCorrelacion para `metodo` (pearson, spearman o kendall) sobre `columnas`"""
+        if metodo not in METODOS:
+            raise ValueError(f"Método de correlación desconocido: {metodo}. Use uno de {', '.join(METODOS)}")
+        columnas = tuple(self.columnas if columnas is None else (str(c) for c in columnas))
+        clave = (self.version, columnas, metodo)
+        resultado = self._cache.get(clave)
+        if resultado is None:
+            indices = [self._posiciones[c] for c in columnas]
+            if metodo == 'pearson':
+                resultado = self._pearson(indices)
+            elif metodo == 'spearman':
+                resultado = self._spearman(indices)
+            else:
+                resultado = self._kendall(indices)
+            resultado = ResultadoCorrelacion(metodo, columnas, *resultado)
+            self._cache[clave] = resultado
+        return resultado
+
+    def _pearson(self, indices):
+        sub = np.ix_(indices, indices)
+        r = self.momentos.pearson()[sub]
+        n = self.momentos.n[sub]
+        np.fill_diagonal(r, np.where(n.diagonal() > 1, 1.0, np.nan))
+        return r, _p_valor_t(r, n), n
+
+    def _rangos_columnas(self):
+        if self._rangos is None:
+            rangos = [_rangos(columna) for columna in self.valores.T]
+            self._rangos = (np.column_stack([d for d, _ in rangos]) if rangos else None,
+                            np.column_stack([p for _, p in rangos]) if rangos else None)
+        return self._rangos
+
+    def _spearman(self, indices):
+        densos, promedio = self._rangos_columnas()
+        densos = densos[:, indices]
+        promedio = promedio[:, indices]
+        completas = (densos >= 0).all(axis=0)
+        # Columnas sin faltantes: Pearson de los rangos de todas a la vez
+        r = MomentosConjuntos(len(indices)).agregar(np.where(completas, promedio, np.nan)).pearson()
+        n = self.momentos.n[np.ix_(indices, indices)]
+        # Pares con faltantes: rangos solo sobre las filas comunes, a partir de los rangos densos
+        for i in range(len(indices)):
+            for j in range(i + 1, len(indices)):
+                if completas[i] and completas[j]:
+                    continue
+                filas = (densos[:, i] >= 0) & (densos[:, j] >= 0)
+                a = _promedio_por_grupo(densos[:, i], filas)[filas]
+                b = _promedio_por_grupo(densos[:, j], filas)[filas]
+                r[i, j] = r[j, i] = np.corrcoef(a, b)[0, 1] if len(a) > 1 else np.nan
+        np.fill_diagonal(r, np.where(n.diagonal() > 1, 1.0, np.nan))
+        return r, _p_valor_t(r, n), n
+
+    def _kendall(self, indices):
+        densos, _ = self._rangos_columnas()
+        densos = densos[:, indices]
+        base = max(len(densos), 1)
+        k = len(indices)
+        r = np.eye(k)
+        p = np.zeros((k, k))
+        n = self.momentos.n[np.ix_(indices, indices)]
+        for i in range(k):
+            for j in range(i + 1, k):
+                filas = (densos[:, i] >= 0) & (densos[:, j] >= 0)
+                r[i, j], p[i, j] = _kendall_par(densos[filas, i], densos[filas, j], base)
+                r[j, i], p[j, i] = r[i, j], p[i, j]
+        return r, p, n
@@ -0,0 +1,348 @@
+# MotorStepwise.py - Selección de variables paso a paso sobre un factor de Cholesky actualizable
+import numpy as np
+from scipy import stats
+from scipy.linalg import solve_triangular
+
+DIRECCIONES = ('backward', 'forward', 'bidirectional')
+CRITERIOS = ('p', 'aic', 'bic')
+
+# Umbrales por defecto: p-valor máximo para permanecer/entrar, o mejora mínima del criterio
+UMBRAL_P = 0.05
+UMBRAL_CRITERIO = 0.0
+
+# Una columna cuya parte no explicada por las activas es menor que esto se considera colineal
+TOLERANCIA_COLINEAL = 1e-10
+
+
+class FactorCholesky:
+    """
+    Factor triangular superior R de la submatriz de Gram de las columnas activas
+    (R'R = G[activas, activas]). Agregar una columna es una sustitución triangular
+    y quitarla se resuelve con rotaciones de Givens, sin volver a factorizar.
+    """
+
+    def __init__(self, gram, activas=(), R=None):
+        self.gram = gram
+        if R is None:
+            self.activas = []
+            self.R = np.zeros((0, 0))
+            for j in activas:
+                self.agregar(j)
+        else:
+            self.activas = list(activas)
+            self.R = R
+
+    def _con_columna(self, R, j):
+        k = R.shape[0]
+        nuevo = np.zeros((k + 1, k + 1))
+        nuevo[:k, :k] = R
+        if k:
+            r = solve_triangular(R, self.gram[self.activas[:k], j], trans='T')
+            nuevo[:k, k] = r
+            resto = self.gram[j, j] - r @ r
+        else:
+            resto = self.gram[j, j]
+        if resto <= TOLERANCIA_COLINEAL * max(self.gram[j, j], 1.0):
+            raise np.linalg.LinAlgError(f"La columna {j} es colineal con las activas")
+        nuevo[k, k] = np.sqrt(resto)
+        return nuevo
+
+    def agregar(self, j):
+        self.R = self._con_columna(self.R, j)
+        self.activas.append(j)
+
+    def quitar(self, j):
+        posicion = self.activas.index(j)
+        R = np.delete(self.R, posicion, axis=1)
+        # R queda como Hessenberg superior desde `posicion`; las rotaciones lo vuelven triangular
+        for i in range(posicion, R.shape[1]):
+            a, b = R[i, i], R[i + 1, i]
+            h = np.hypot(a, b)
+            if h == 0:
+                continue
+            c, s = a / h, b / h
+            fila_i, fila_sig = R[i, i:].copy(), R[i + 1, i:].copy()
+            R[i, i:] = c * fila_i + s * fila_sig
+            R[i + 1, i:] = -s * fila_i + c * fila_sig
+        self.R = R[:-1]
+        del self.activas[posicion]
+
+
+class ResultadoStepwise:
+    """Modelo elegido y los pasos que llevaron a él"""
+
+    def __init__(self, variables, coeficientes, errores, t, p_valores, rss, r2, r2_ajustado,
+                 aic, bic, f_pvalor, observaciones, pasos, candidatas):
+        self.variables = variables
+        self.coeficientes = coeficientes
+        self.errores = errores
+        self.t = t
+        self.p_valores = p_valores
+        self.rss = rss
+        self.r2 = r2
+        self.r2_ajustado = r2_ajustado
+        self.aic = aic
+        self.bic = bic
+        self.f_pvalor = f_pvalor
+        self.observaciones = observaciones
+        self.pasos = pasos
+        self.candidatas = candidatas
+
+    def __repr__(self):
+        return (f"ResultadoStepwise(variables={self.variables}, r2={self.r2:.4f}, "
+                f"pasos={len(self.pasos)})")
+
+
+class MotorStepwise:
+    """
+    Selección paso a paso hacia atrás, hacia adelante o en ambos sentidos.
+    X'X y X'y se calculan una sola vez (con columnas escaladas a norma 1 para
+    cuidar el condicionamiento); cada paso solo actualiza el factor de Cholesky
+    y las estadísticas t, p-valores, AIC y BIC salen de ese factor.
+    """
+
+    def __init__(self, X, y, nombres=None, constante=True):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        y = np.asarray(y, dtype=np.float64)
+        if nombres is None:
+            nombres = [f"x{i}" for i in range(X.shape[1])]
+        nombres = [str(n) for n in nombres]
+
+        if constante:
+            X = np.column_stack([np.ones(len(X)), X])
+            nombres = ['const'] + nombres
+        self.nombres = nombres
+        self.constante = constante
+        self.n = len(y)
+
+        self.escala = np.linalg.norm(X, axis=0)
+        self.escala[self.escala == 0] = 1.0
+        Xs = X / self.escala
+        self.gram = Xs.T @ Xs
+        self.xty = Xs.T @ y
+        self.yty = float(y @ y)
+        self.tss = float(((y - y.mean()) ** 2).sum()) if constante else self.yty
+        self._Xs = Xs
+
+    # --- Estadísticas del modelo activo ---------------------------------------------
+
+    def _estadisticas(self, factor):
+        activas = factor.activas
+        k = len(activas)
+        gl = self.n - k
+        if k == 0:
+            rss = self.yty
+            return {'coef': np.zeros(0), 'inversa_diag': np.zeros(0), 'rss': rss, 'gl': gl, 'z': np.zeros(0)}
+        z = solve_triangular(factor.R, self.xty[activas], trans='T')
+        coef = solve_triangular(factor.R, z)
+        rss = max(self.yty - float(z @ z), 0.0)
+        R_inv = solve_triangular(factor.R, np.eye(k))
+        return {'coef': coef, 'inversa_diag': (R_inv ** 2).sum(axis=1), 'rss': rss, 'gl': gl, 'z': z}
+
+    def _criterio_info(self, rss, k, criterio):
+        # Mismas fórmulas que statsmodels (-2 log L + penalización)
+        log_l = -self.n / 2 * (np.log(2 * np.pi * np.maximum(rss, 1e-300) / self.n) + 1)
+        penalizacion = 2 * k if criterio == 'aic' else k * np.log(self.n)
+        return -2 * log_l + penalizacion
+
+    def _valores_p(self, coef, inversa_diag, rss, gl):
+        if gl <= 0:
+            return np.full(len(coef), np.nan), np.full(len(coef), np.nan)
+        error = np.sqrt(rss / gl * inversa_diag)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = coef / error
+        return t, 2 * stats.t.sf(np.abs(t), gl)
+
+    def _candidatas_quitar(self, factor, est, fijas, criterio):
+        """Valor de cada columna removible: su p-valor o el criterio del modelo sin ella"""
+        removibles = [i for i, j in enumerate(factor.activas) if j not in fijas]
+        if not removibles:
+            return [], np.zeros(0)
+        if criterio == 'p':
+            _, p = self._valores_p(est['coef'], est['inversa_diag'], est['rss'], est['gl'])
+            return [factor.activas[i] for i in removibles], p[removibles]
+        # Quitar la columna i aumenta la RSS en coef_i² / (G⁻¹)_ii
+        aumento = est['coef'][removibles] ** 2 / est['inversa_diag'][removibles]
+        valores = self._criterio_info(est['rss'] + aumento, len(factor.activas) - 1, criterio)
+        return [factor.activas[i] for i in removibles], valores
+
+    def _candidatas_agregar(self, factor, est, libres, criterio):
+        """Valor de agregar cada columna libre, todas a la vez con una sola sustitución triangular"""
+        libres = list(libres)
+        if not libres:
+            return [], np.zeros(0)
+        activas = factor.activas
+        if activas:
+            r = solve_triangular(factor.R, self.gram[np.ix_(activas, libres)], trans='T')
+            resto = np.diag(self.gram)[libres] - (r ** 2).sum(axis=0)
+            z_nuevo = self.xty[libres] - r.T @ est['z']
+        else:
+            resto = np.diag(self.gram)[libres].copy()
+            z_nuevo = self.xty[libres].copy()
+
+        validas = resto > TOLERANCIA_COLINEAL * np.maximum(np.diag(self.gram)[libres], 1.0)
+        libres = [j for j, v in zip(libres, validas) if v]
+        resto, z_nuevo = resto[validas], z_nuevo[validas]
+        if not libres:
+            return [], np.zeros(0)
+
+        z_nuevo = z_nuevo / np.sqrt(resto)
+        rss_nueva = np.maximum(est['rss'] - z_nuevo ** 2, 0.0)
+        if criterio == 'p':
+            gl = self.n - len(activas) - 1
+            if gl <= 0:
+                return libres, np.full(len(libres), np.nan)
+            # t de la columna nueva: su componente ortogonal entre el error del modelo ampliado
+            t = z_nuevo / np.sqrt(rss_nueva / gl)
+            return libres, 2 * stats.t.sf(np.abs(t), gl)
+        return libres, self._criterio_info(rss_nueva, len(activas) + 1, criterio)
+
+    # --- Selección -------------------------------------------------------------------
+
+    def seleccionar(self, direccion='backward', criterio='p', umbral=None, umbral_salida=None,
+                    fijas=(), iniciales=None, max_pasos=None):
+        """
+        Corre la selección y devuelve un ResultadoStepwise.
+
+        - criterio 'p': entra la columna con menor p-valor si es menor que `umbral`
+          y sale la de mayor p-valor si supera `umbral_salida` (por defecto `umbral`).
+        - criterio 'aic' / 'bic': se hace el movimiento que más reduce el criterio,
+          siempre que la reducción sea mayor que `umbral`.
+        - `fijas`: nombres que nunca se quitan (la constante siempre es fija).
+        - `iniciales`: modelo de partida; por defecto todas las columnas hacia atrás
+          y solo las fijas hacia adelante o en ambos sentidos.
+        """
+        if direccion not in DIRECCIONES:
+            raise ValueError(f"Dirección desconocida: {direccion!r} (opciones: {', '.join(DIRECCIONES)})")
+        if criterio not in CRITERIOS:
+            raise ValueError(f"Criterio desconocido: {criterio!r} (opciones: {', '.join(CRITERIOS)})")
+        if umbral is None:
+            umbral = UMBRAL_P if criterio == 'p' else UMBRAL_CRITERIO
+        if umbral_salida is None:
+            umbral_salida = umbral
+
+        indice = {nombre: j for j, nombre in enumerate(self.nombres)}
+        fijas = {indice[n] for n in fijas} | ({0} if self.constante else set())
+        if iniciales is None:
+            iniciales = range(len(self.nombres)) if direccion == 'backward' else sorted(fijas)
+        else:
+            iniciales = sorted(fijas | {indice[n] for n in iniciales})
+
+        factor = self._factor_inicial(list(iniciales))
+        if max_pasos is None:
+            max_pasos = 4 * len(self.nombres)
+
+        pasos = []
+        visitados = {frozenset(factor.activas)}
+        est = self._estadisticas(factor)
+        # En ambos sentidos primero se revisa si alguna variable debe salir y luego si otra entra
+        orden = {'backward': (self._mov_quitar,), 'forward': (self._mov_agregar,),
+                 'bidirectional': (self._mov_quitar, self._mov_agregar)}[direccion]
+        while len(pasos) < max_pasos:
+            movimiento = None
+            for buscar in orden:
+                movimiento = buscar(factor, est, fijas, criterio, umbral, umbral_salida, visitados)
+                if movimiento is not None:
+                    break
+            if movimiento is None:
+                break
+
+            accion, columna, valor = movimiento
+            if accion == 'agregar':
+                factor.agregar(columna)
+            else:
+                factor.quitar(columna)
+            visitados.add(frozenset(factor.activas))
+            est = self._estadisticas(factor)
+            pasos.append({'accion': accion, 'variable': self.nombres[columna], 'valor': valor,
+                          'modelo': self._resultado(factor, est, [])})
+
+        return self._resultado(factor, est, pasos)
+
+    def _mov_agregar(self, factor, est, fijas, criterio, umbral, umbral_salida, visitados):
+        libres = [j for j in range(len(self.nombres)) if j not in factor.activas]
+        columnas, valores = self._candidatas_agregar(factor, est, libres, criterio)
+        if not columnas or np.all(np.isnan(valores)):
+            return None
+        mejor = int(np.nanargmin(valores))
+        if criterio == 'p':
+            entra = valores[mejor] < umbral
+        else:
+            entra = self._criterio_info(est['rss'], len(factor.activas), criterio) - valores[mejor] > umbral
+        if entra and frozenset(factor.activas + [columnas[mejor]]) not in visitados:
+            return 'agregar', columnas[mejor], float(valores[mejor])
+        return None
+
+    def _mov_quitar(self, factor, est, fijas, criterio, umbral, umbral_salida, visitados):
+        columnas, valores = self._candidatas_quitar(factor, est, fijas, criterio)
+        if not columnas or np.all(np.isnan(valores)):
+            return None
+        if criterio == 'p':
+            peor = int(np.nanargmax(valores))
+            sale = valores[peor] > umbral_salida
+        else:
+            peor = int(np.nanargmin(valores))
+            sale = self._criterio_info(est['rss'], len(factor.activas), criterio) - valores[peor] > umbral
+        resto = frozenset(j for j in factor.activas if j != columnas[peor])
+        if sale and resto not in visitados:
+            return 'quitar', columnas[peor], float(valores[peor])
+        return None
+
+    def _factor_inicial(self, activas):
+        if len(activas) == len(self.nombres):
+            # Modelo completo: factor directo por QR del diseño (mejor condicionado que Cholesky de X'X)
+            R = np.linalg.qr(self._Xs, mode='r')
+            signos = np.sign(np.diag(R))
+            signos[signos == 0] = 1
+            R = R * signos[:, None]
+            if np.min(np.abs(np.diag(R))) > np.sqrt(TOLERANCIA_COLINEAL):
+                return FactorCholesky(self.gram, activas, R)
+        return FactorCholesky(self.gram, activas)
+
+    def _resultado(self, factor, est, pasos):
+        activas = list(factor.activas)
+        k = len(activas)
+        t, p = self._valores_p(est['coef'], est['inversa_diag'], est['rss'], est['gl'])
+        escala = self.escala[activas]
+        coef = est['coef'] / escala
+        errores = np.sqrt(est['rss'] / est['gl'] * est['inversa_diag']) / escala if est['gl'] > 0 \
+            else np.full(k, np.nan)
+
+        r2 = 1 - est['rss'] / self.tss if self.tss > 0 else np.nan
+        gl_modelo = k - 1 if self.constante else k
+        if est['gl'] > 0 and gl_modelo > 0:
+            r2_ajustado = 1 - (1 - r2) * (self.n - (1 if self.constante else 0)) / est['gl']
+            f = ((self.tss - est['rss']) / gl_modelo) / (est['rss'] / est['gl']) if est['rss'] > 0 else np.inf
+            f_pvalor = float(stats.f.sf(f, gl_modelo, est['gl']))
+        else:
+            r2_ajustado, f_pvalor = np.nan, np.nan
+
+        nombres = [self.nombres[j] for j in activas]
+        return ResultadoStepwise(
+            variables=nombres,
+            coeficientes=dict(zip(nombres, coef.tolist())),
+            errores=dict(zip(nombres, np.asarray(errores).tolist())),
+            t=dict(zip(nombres, np.asarray(t).tolist())),
+            p_valores=dict(zip(nombres, np.asarray(p).tolist())),
+            rss=est['rss'],
+            r2=float(r2),
+            r2_ajustado=float(r2_ajustado),
+            aic=float(self._criterio_info(est['rss'], k, 'aic')),
+            bic=float(self._criterio_info(est['rss'], k, 'bic')),
+            f_pvalor=f_pvalor,
+            observaciones=self.n,
+            pasos=pasos,
+            candidatas=[n for n in self.nombres if n != 'const' or not self.constante],
+        )
+
+
+def seleccion_stepwise(X, y, direccion='backward', criterio='p', umbral=None, umbral_salida=None,
+                       fijas=(), constante=True):
+    """Atajo: acepta un DataFrame (o arreglo) y una serie y devuelve el ResultadoStepwise"""
+    nombres = list(X.columns) if hasattr(X, 'columns') else None
+    motor = MotorStepwise(np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64),
+                          nombres=nombres, constante=constante)
+    return motor.seleccionar(direccion=direccion, criterio=criterio, umbral=umbral,
+                             umbral_salida=umbral_salida, fijas=fijas)
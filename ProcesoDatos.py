@@ -1,50 +1,381 @@
 # ProcesoDatos.py
 import pandas as pd
 import numpy as np
+import os
+from collections import namedtuple
+import CacheDatos
 
-def cargar_limpiar_datos(file_path):
-    # Cargar y limpiar datos
-    data = pd.read_excel(file_path)
-    data_cleaned = data.copy()
-    
-    # Preservar la columna FECHA y extraer AÑO y MES antes de la conversión
-    fecha_column = None
-    if 'FECHA' in data_cleaned.columns:
-        fecha_column = pd.to_datetime(data_cleaned['FECHA'], dayfirst=True, errors='coerce')
-        data_cleaned['AÑO'] = fecha_column.dt.year
-        data_cleaned['MES'] = fecha_column.dt.month
-        data_cleaned['FECHA_DT'] = fecha_column  # Guardar fecha como datetime
-    
-    data_cleaned = data_cleaned.replace('<1', np.nan).replace('<10', np.nan)
-    
-    # Preservar columnas antes de conversión numérica
-    año_column = data_cleaned['AÑO'].copy() if 'AÑO' in data_cleaned.columns else None
-    mes_column = data_cleaned['MES'].copy() if 'MES' in data_cleaned.columns else None
-    fecha_dt_column = data_cleaned['FECHA_DT'].copy() if 'FECHA_DT' in data_cleaned.columns else None
-    
-    data_cleaned = data_cleaned.apply(pd.to_numeric, errors='coerce')
-    
-    # Restaurar columnas
-    if año_column is not None:
-        data_cleaned['AÑO'] = año_column
-    if mes_column is not None:
-        data_cleaned['MES'] = mes_column
-    if fecha_dt_column is not None:
-        data_cleaned['FECHA_DT'] = fecha_dt_column
-    
-    # Quitar filas con valores nulos en columnas relevantes
-    data_cleaned = data_cleaned.dropna(subset=['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA', 'DBO5'])
+# Tamaño de bloque (filas) para la lectura por partes de archivos grandes
+TAMANO_BLOQUE = 50000
+# A partir de este tamaño de archivo se lee por bloques automáticamente
+LIMITE_LECTURA_COMPLETA = 50 * 1024 * 1024  # 50 MB
+
+# Cada cuántas filas leídas se informa el avance durante la lectura por bloques
+INTERVALO_PROGRESO = 5000
+
+class CargaCancelada(Exception):
+    """La función de progreso la lanza para interrumpir una carga en curso"""
+
+def _sin_progreso(etapa, filas=None, total=None):
+    pass
+
+# Esquema declarativo de las columnas que se leen del Excel.
+# censura=True indica que la columna puede traer valores bajo el límite de detección ("<1", "<10"):
+# el valor queda como NaN y el límite se guarda en la columna <nombre>_LIM.
+# requerida=True indica que las filas sin ese valor se descartan.
+ColumnaEsquema = namedtuple('ColumnaEsquema', ['nombre', 'tipo', 'censura', 'requerida'])
+
+ESQUEMA_COLUMNAS = [
+    ColumnaEsquema('pH_CAMPO', 'float32', False, True),
+    ColumnaEsquema('DQO_TOT', 'float32', True, True),
+    ColumnaEsquema('OD_mg/L', 'float32', True, True),
+    ColumnaEsquema('SST', 'float32', True, True),
+    ColumnaEsquema('TEMP_AGUA', 'float32', False, True),
+    ColumnaEsquema('DBO5', 'float32', True, True),
+    ColumnaEsquema('OD_%', 'float32', True, False),
+    ColumnaEsquema('TEMP_AMB', 'float32', False, False),
+]
+
+# Sufijo de las columnas que guardan el límite de detección de los valores censurados
+SUFIJO_LIMITE = '_LIM'
+
+def parsear_columna(serie, columna):
+    """
+    Convierte una columna cruda al tipo del esquema en una sola pasada vectorizada.
+    Devuelve (valores, limites); limites es None si la columna no admite censura.
+    """
+    valores = pd.to_numeric(serie, errors='coerce')
+    limites = None
+    if columna.censura:
+        limites = np.full(len(serie), np.nan, dtype=np.float32)
+        # Solo se analizan como texto las celdas que no se pudieron convertir a número
+        no_numericos = valores.isna().to_numpy() & serie.notna().to_numpy()
+        if no_numericos.any():
+            texto = serie[no_numericos].astype(str)
+            limite = texto.str.extract(r'^\s*<\s*([0-9]+(?:[.,][0-9]+)?)\s*$', expand=False)
+            limites[no_numericos] = pd.to_numeric(limite.str.replace(',', '.'), errors='coerce').to_numpy()
+    return valores.astype(columna.tipo), limites
+
+def _reducir_entero(serie, tipo):
+    # AÑO y MES se guardan como enteros pequeños cuando no hay fechas faltantes
+    if serie.notna().all():
+        return serie.astype(tipo)
+    return serie.astype('float32')
+
+# Formatos de fecha que se prueban al detectar el formato de un archivo (día primero)
+FORMATOS_FECHA = ['%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d-%m-%Y', '%d.%m.%Y',
+                  '%d/%m/%y', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d']
+MUESTRA_FORMATO_FECHA = 50
+
+# Formato detectado por archivo ((ruta absoluta, tamaño, fecha de modificación) -> formato o None);
+# si el archivo se reemplaza o se edita en la misma ruta, el formato se vuelve a detectar
+_formatos_fecha = {}
+
+def _textos_fecha(serie):
+    # Solo las celdas de texto necesitan interpretarse; las fechas nativas de Excel ya vienen como datetime
+    if pd.api.types.is_datetime64_any_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+        return None
+    es_texto = serie.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    return es_texto if es_texto.any() else None
+
+def detectar_formato_fecha(serie):
+    """Detecta con una muestra el formato de las fechas en texto; None si no hay texto o ningún formato cubre la mayoría"""
+    es_texto = _textos_fecha(serie)
+    if es_texto is None:
+        return None
+    muestra = serie[es_texto].str.strip()
+    muestra = muestra[muestra != ''].head(MUESTRA_FORMATO_FECHA)
+    mejor_formato, mejor_aciertos = None, len(muestra) // 2
+    for formato in FORMATOS_FECHA:
+        aciertos = pd.to_datetime(muestra, format=formato, errors='coerce').notna().sum()
+        if aciertos == len(muestra):
+            return formato
+        if aciertos > mejor_aciertos:
+            mejor_formato, mejor_aciertos = formato, aciertos
+    return mejor_formato
+
+def formato_fecha_archivo(file_path, serie):
+    """Formato de fecha del archivo, detectado una vez por versión del archivo y recordado para las siguientes lecturas"""
+    ruta = os.path.abspath(file_path)
+    estado = os.stat(ruta)
+    clave = (ruta, estado.st_size, estado.st_mtime_ns)
+    if clave not in _formatos_fecha:
+        _formatos_fecha[clave] = detectar_formato_fecha(serie)
+    return _formatos_fecha[clave]
+
+def normalizar_fechas(serie, formato=None):
+    """
+    Convierte la columna FECHA a datetime y devuelve las columnas FECHA_DT, AÑO y MES.
+    Los textos se interpretan con el formato explícito; las filas que no coinciden se
+    prueban como ISO (año-mes-día) y solo el resto pasa por la interpretación con día primero.
+    """
+    es_texto = _textos_fecha(serie)
+    if es_texto is None:
+        fechas = pd.to_datetime(serie, errors='coerce')
+    else:
+        fechas = pd.to_datetime(serie.where(~es_texto), errors='coerce')
+        texto = serie[es_texto].str.strip()
+        if formato is not None:
+            convertidas = pd.to_datetime(texto, format=formato, errors='coerce')
+        else:
+            convertidas = pd.Series(pd.NaT, index=texto.index, dtype=fechas.dtype)
+        fallidas = convertidas.isna() & (texto != '')
+        if fallidas.any():
+            # dayfirst invierte día y mes en fechas ISO: 2015-03-04 quedaría como 3 de abril
+            convertidas[fallidas] = pd.to_datetime(texto[fallidas], format='ISO8601', errors='coerce')
+            fallidas = convertidas.isna() & (texto != '')
+        if fallidas.any():
+            convertidas[fallidas] = pd.to_datetime(texto[fallidas], dayfirst=True, errors='coerce', format='mixed')
+        fechas[es_texto] = convertidas.astype(fechas.dtype)
+    
+    return {
+        'AÑO': _reducir_entero(fechas.dt.year, 'int16'),
+        'MES': _reducir_entero(fechas.dt.month, 'int8'),
+        'FECHA_DT': fechas,  # Guardar fecha como datetime
+    }
+
+def limpiar_datos(data, esquema=ESQUEMA_COLUMNAS, formato_fecha=None, columnas_fecha=None):
+    # Limpiar datos ya leídos del Excel según el esquema de columnas
+    faltantes = [c.nombre for c in esquema if c.requerida and c.nombre not in data.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas requeridas en el archivo: {', '.join(faltantes)}")
+    
+    columnas = {}
+    for columna in esquema:
+        if columna.nombre not in data.columns:
+            continue
+        valores, limites = parsear_columna(data[columna.nombre], columna)
+        columnas[columna.nombre] = valores
+        if limites is not None:
+            columnas[columna.nombre + SUFIJO_LIMITE] = limites
+    
+    # Extraer FECHA_DT, AÑO y MES de la columna FECHA (o usar las ya calculadas)
+    if columnas_fecha is not None:
+        columnas.update(columnas_fecha)
+    elif 'FECHA' in data.columns:
+        if formato_fecha is None:
+            formato_fecha = detectar_formato_fecha(data['FECHA'])
+        columnas.update(normalizar_fechas(data['FECHA'], formato_fecha))
+    
+    data_cleaned = pd.DataFrame(columnas, index=data.index)
+    
+    # Quitar filas con valores nulos en columnas requeridas
+    data_cleaned = data_cleaned.dropna(subset=[c.nombre for c in esquema if c.requerida])
     return data_cleaned
 
-def load_validation_data(file_path):
-    # Cargar datos de validación (solo 2012 y 2013)
-    data = pd.read_excel(file_path)
+def leer_excel_por_bloques(file_path, tamano_bloque=TAMANO_BLOQUE, progreso=_sin_progreso):
+    """
+    Lee la primera hoja del Excel en modo de solo lectura y devuelve DataFrames
+    de como máximo `tamano_bloque` filas, sin cargar la hoja completa en memoria.
+    progreso(etapa, filas, total) se llama cada INTERVALO_PROGRESO filas leídas.
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        total = hoja.max_row - 1 if hoja.max_row else None  # Aproximado: puede incluir filas vacías
+        filas = hoja.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        columnas = [c if c is not None else f"Unnamed: {i}" for i, c in enumerate(encabezado)]
+        
+        inicio = 0
+        bloque = []
+        for fila in filas:
+            if all(valor is None for valor in fila):
+                continue  # Filas vacías al final de la hoja
+            bloque.append(fila)
+            if len(bloque) % INTERVALO_PROGRESO == 0:
+                progreso("Leyendo filas", inicio + len(bloque), total)
+            if len(bloque) == tamano_bloque:
+                yield pd.DataFrame(bloque, columns=columnas, index=pd.RangeIndex(inicio, inicio + len(bloque)))
+                inicio += len(bloque)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas, index=pd.RangeIndex(inicio, inicio + len(bloque)))
+        progreso("Leyendo filas", inicio + len(bloque), inicio + len(bloque))
+    finally:
+        libro.close()
+
+def cargar_limpiar_datos_por_bloques(file_path, tamano_bloque=TAMANO_BLOQUE, progreso=_sin_progreso):
+    # Cada bloque se limpia apenas se lee, así solo se conservan las filas válidas
+    bloques_limpios = []
+    for bloque in leer_excel_por_bloques(file_path, tamano_bloque, progreso):
+        # El formato de fecha se detecta con el primer bloque y se reutiliza en los demás
+        formato_fecha = formato_fecha_archivo(file_path, bloque['FECHA']) if 'FECHA' in bloque.columns else None
+        bloques_limpios.append(limpiar_datos(bloque, formato_fecha=formato_fecha))
+    if not bloques_limpios:
+        return limpiar_datos(pd.read_excel(file_path))
+    return pd.concat(bloques_limpios, copy=False)
+
+def _partes_limpieza():
+    # Todo lo que define el resultado de la limpieza; si algo cambia, la caché se invalida
+    return (ESQUEMA_COLUMNAS, limpiar_datos, parsear_columna, normalizar_fechas, _reducir_entero,
+            FORMATOS_FECHA, detectar_formato_fecha, formato_fecha_archivo, _textos_fecha)
+
+def guardar_memmap(file_path, clave, data):
+    """
+    Exporta los datos limpios como ConjuntoDatos memmap junto a la entrada `clave` de la caché,
+    así los procesos trabajadores los abren sin volver a leer ni limpiar el archivo.
+    """
+    from ConjuntoDatos import ConjuntoDatos  # ConjuntoDatos importa este módulo
+    try:
+        ConjuntoDatos.desde_dataframe(data).exportar_memmap(CacheDatos.ruta_memmap(file_path, clave))
+    except (OSError, ValueError):
+        pass  # Igual que la caché, el memmap es opcional
+
+def cargar_limpiar_datos(file_path, usar_cache=True, tamano_bloque=None, progreso=_sin_progreso):
+    # Cargar y limpiar datos, reutilizando la caché si el archivo y la limpieza no cambiaron
+    if usar_cache:
+        progreso("Buscando datos en caché")
+        clave = CacheDatos.clave_cache(file_path, *_partes_limpieza())
+        data_cleaned = CacheDatos.leer_cache(file_path, clave)
+        if data_cleaned is not None:
+            return data_cleaned
     
-    # Extraer año de la fecha
-    if 'FECHA' in data.columns:
-        data['AÑO'] = pd.to_datetime(data['FECHA'], dayfirst=True, errors='coerce').dt.year
+    # Los archivos grandes se leen por bloques para no multiplicar el uso de memoria
+    if tamano_bloque is None and os.path.getsize(file_path) > LIMITE_LECTURA_COMPLETA:
+        tamano_bloque = TAMANO_BLOQUE
     
-    validation_data = data[(data['AÑO'] == 2012) | (data['AÑO'] == 2013)]
-    validation_data = validation_data.dropna(subset=['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA', 'DBO5'])
+    if tamano_bloque:
+        data_cleaned = cargar_limpiar_datos_por_bloques(file_path, tamano_bloque, progreso)
+    else:
+        progreso("Leyendo archivo")
+        data = pd.read_excel(file_path)
+        progreso("Limpiando datos", len(data), len(data))
+        formato_fecha = formato_fecha_archivo(file_path, data['FECHA']) if 'FECHA' in data.columns else None
+        data_cleaned = limpiar_datos(data, formato_fecha=formato_fecha)
+    
+    if usar_cache:
+        progreso("Guardando caché")
+        CacheDatos.guardar_cache(file_path, clave, data_cleaned)
+        guardar_memmap(file_path, clave, data_cleaned)
+    return data_cleaned
+
+def huellas_filas(data):
+    """
+    Huella (uint64) de cada fila cruda. Los números se comparan por su valor,
+    así la huella no depende de si la columna se infirió como entera o decimal.
+    """
+    canonicas = {}
+    for columna in data.columns:
+        serie = data[columna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            canonicas[columna] = serie.astype(str)
+        else:
+            numeros = pd.to_numeric(serie, errors='coerce')
+            canonicas[columna] = numeros.astype(str).where(numeros.notna(), serie.astype(str))
+    return pd.util.hash_pandas_object(pd.DataFrame(canonicas), index=False).to_numpy()
+
+def _ingerir_filas_nuevas(file_path, huellas_previas, tamano_bloque, progreso):
+    # Recorre el archivo por bloques; las filas ya procesadas se reconocen por su posición y huella
+    # y solo se limpian las que vienen después. Devuelve None si el historial cambió.
+    n_previas = len(huellas_previas)
+    huellas = []
+    limpios = []
+    total = 0
+    for bloque in leer_excel_por_bloques(file_path, tamano_bloque, progreso):
+        h = huellas_filas(bloque)
+        inicio = total
+        total += len(bloque)
+        solapadas = max(0, min(len(bloque), n_previas - inicio))
+        if solapadas and not np.array_equal(h[:solapadas], huellas_previas[inicio:inicio + solapadas]):
+            return None
+        huellas.append(h)
+        if solapadas < len(bloque):
+            formato_fecha = formato_fecha_archivo(file_path, bloque['FECHA']) if 'FECHA' in bloque.columns else None
+            limpios.append(limpiar_datos(bloque.iloc[solapadas:], formato_fecha=formato_fecha))
+    if total < n_previas:
+        return None  # Se eliminaron filas del archivo
+    huellas = np.concatenate(huellas) if huellas else np.empty(0, dtype=np.uint64)
+    return limpios, huellas
+
+def cargar_incremental(file_path, tamano_bloque=TAMANO_BLOQUE, progreso=_sin_progreso):
+    """
+    Carga el archivo limpiando solo las filas que se agregaron desde la última carga.
+    Devuelve (datos limpios, cambió); cambió es False si los datos limpios son los mismos
+    que en la carga anterior de este archivo.
+    """
+    progreso("Calculando huella del archivo")
+    huella_contenido = CacheDatos.huella_archivo(file_path)
+    huella_limpieza = CacheDatos.huella_logica(*_partes_limpieza())
     
-    return validation_data
+    estado = CacheDatos.leer_estado_incremental(file_path)
+    if estado is not None and estado[3] != huella_limpieza:
+        estado = None  # La lógica de limpieza cambió: hay que limpiar todo de nuevo
+    if estado is not None and estado[2] == huella_contenido:
+        return estado[0], False
+    
+    resultado = None
+    if estado is not None:
+        resultado = _ingerir_filas_nuevas(file_path, estado[1], tamano_bloque, progreso)
+    if resultado is None:
+        estado = None
+        resultado = _ingerir_filas_nuevas(file_path, np.empty(0, dtype=np.uint64), tamano_bloque, progreso)
+    limpios, huellas = resultado
+    
+    if estado is not None:
+        nuevas = [bloque for bloque in limpios if len(bloque) > 0]
+        cambio = len(nuevas) > 0
+        data_cleaned = pd.concat([estado[0]] + nuevas, copy=False) if cambio else estado[0]
+    else:
+        cambio = True
+        data_cleaned = pd.concat(limpios, copy=False) if limpios else limpiar_datos(pd.read_excel(file_path))
+    
+    progreso("Guardando caché")
+    CacheDatos.guardar_estado_incremental(file_path, data_cleaned, huellas, huella_contenido, huella_limpieza)
+    clave = CacheDatos.clave_cache(file_path, *_partes_limpieza())
+    CacheDatos.guardar_cache(file_path, clave, data_cleaned)
+    guardar_memmap(file_path, clave, data_cleaned)
+    return data_cleaned, cambio
+
+def _filtro_fechas(columnas_fecha, años=None, desde=None, hasta=None):
+    # Máscara booleana de las filas que cumplen los predicados de año y rango de fechas
+    fechas = columnas_fecha['FECHA_DT']
+    mascara = np.ones(len(fechas), dtype=bool)
+    if años is not None:
+        mascara &= columnas_fecha['AÑO'].isin(list(años)).to_numpy()
+    if desde is not None:
+        mascara &= (fechas >= pd.Timestamp(desde)).to_numpy()
+    if hasta is not None:
+        mascara &= (fechas <= pd.Timestamp(hasta)).to_numpy()
+    return mascara
+
+_SIN_COLUMNA_FECHA = "El archivo no tiene columna FECHA para filtrar por fecha o año"
+
+def cargar_filtrado(file_path, años=None, desde=None, hasta=None, tamano_bloque=TAMANO_BLOQUE,
+                    progreso=_sin_progreso):
+    """
+    Carga solo las filas cuyo año está en `años` y cuya fecha está entre `desde` y `hasta`.
+    Si el archivo ya tiene datos limpios en caché se filtran esos; si no, el filtro se aplica
+    a cada bloque al leerlo y solo se limpian las filas que lo cumplen.
+    """
+    clave = CacheDatos.clave_cache(file_path, *_partes_limpieza())
+    data = CacheDatos.leer_cache(file_path, clave)
+    if data is not None:
+        # Igual que en la lectura por bloques: sin fechas limpias no hay filtro que aplicar
+        if 'AÑO' not in data.columns or 'FECHA_DT' not in data.columns:
+            raise ValueError(_SIN_COLUMNA_FECHA)
+        mascara = _filtro_fechas({c: data[c] for c in ('AÑO', 'FECHA_DT')}, años, desde, hasta)
+        return data[mascara]
+    
+    bloques_limpios = []
+    for bloque in leer_excel_por_bloques(file_path, tamano_bloque, progreso):
+        if 'FECHA' not in bloque.columns:
+            raise ValueError(_SIN_COLUMNA_FECHA)
+        formato_fecha = formato_fecha_archivo(file_path, bloque['FECHA'])
+        columnas_fecha = normalizar_fechas(bloque['FECHA'], formato_fecha)
+        mascara = _filtro_fechas(columnas_fecha, años, desde, hasta)
+        if not mascara.any():
+            continue
+        columnas_fecha = {nombre: serie[mascara] for nombre, serie in columnas_fecha.items()}
+        bloques_limpios.append(limpiar_datos(bloque[mascara], columnas_fecha=columnas_fecha))
+    if not bloques_limpios:
+        return limpiar_datos(pd.read_excel(file_path).iloc[:0])
+    return pd.concat(bloques_limpios, copy=False)
+
+def load_validation_data(file_path):
+    # Cargar datos de validación (solo 2012 y 2013)
+    return cargar_filtrado(file_path, años=(2012, 2013))
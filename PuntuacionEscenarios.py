@@ -0,0 +1,259 @@
+# PuntuacionEscenarios.py - Predicción de DBO5 para archivos de escenarios (CSV o Excel) por bloques
+#
+# Uso:
+#   python PuntuacionEscenarios.py escenarios.csv --salida escenarios_dbo5.csv --datos BaseLimpiada.xlsx
+#
+# El archivo de entrada necesita columnas de OD y DQO (OD_mg/L / OD y DQO_TOT / DQO). La salida
+# repite cada fila con la DBO5 predicha, los intervalos del 95% y la banda de calidad del agua.
+import argparse
+import contextlib
+import csv
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from BarridoEscenarios import BANDAS_CALIDAD, SIN_CLASE, clasificar_calidad
+from CacheDatos import _reemplazar_atomico
+from ProcesoDatos import leer_excel_por_bloques, TAMANO_BLOQUE, _sin_progreso
+from RegistroModelos import ModeloAjustado
+
+MODELO = 'dbo5_od_dqo'
+NIVEL = 0.95
+DECIMALES = 4
+COLUMNAS_SALIDA = ('DBO5_predicha', 'ic_inferior', 'ic_superior', 'ip_inferior', 'ip_superior')
+
+# Otros nombres aceptados para cada predictor (se comparan sin distinguir mayúsculas)
+ALIAS_COLUMNAS = {
+    'OD_mg/L': ('OD', 'OD_MGL', 'OXIGENO_DISUELTO'),
+    'DQO_TOT': ('DQO', 'DQO_MG/L', 'COD'),
+    'SST': ('TSS',),
+    'pH_CAMPO': ('PH',),
+    'TEMP_AGUA': ('TEMPERATURA', 'TEMP'),
+}
+
+# Banda de calidad sin el emoji (el texto va a CSV/Excel); la última posición es para filas sin predicción
+_ETIQUETAS_CALIDAD = np.array([etiqueta.split(' ', 1)[1] for _, etiqueta, _ in BANDAS_CALIDAD] + [''], dtype=object)
+
+
+def resolver_columnas(columnas, predictores):
+    """Columna del archivo que corresponde a cada predictor del modelo (nombre exacto o alias)"""
+    por_nombre = {str(c).strip().upper(): c for c in columnas}
+    encontradas, faltantes = [], []
+    for predictor in predictores:
+        candidatos = (predictor,) + ALIAS_COLUMNAS.get(predictor, ())
+        columna = next((por_nombre[c.upper()] for c in candidatos if c.upper() in por_nombre), None)
+        if columna is None:
+            faltantes.append(predictor)
+        encontradas.append(columna)
+    if faltantes:
+        raise ValueError(f"El archivo no tiene las columnas {', '.join(faltantes)} "
+                         f"(columnas encontradas: {', '.join(map(str, columnas))})")
+    return encontradas
+
+
+def _leer_csv_por_bloques(ruta, tamano_bloque, progreso):
+    # Separador detectado en la primera línea; con ';' se asume coma decimal (formato regional)
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as f:
+        muestra = f.readline()
+    try:
+        separador = csv.Sniffer().sniff(muestra, delimiters=',;\t').delimiter
+    except csv.Error:
+        separador = ','
+    filas = 0
+    for bloque in pd.read_csv(ruta, sep=separador, decimal=',' if separador == ';' else '.',
+                              chunksize=tamano_bloque, encoding='utf-8-sig'):
+        filas += len(bloque)
+        progreso("Leyendo filas", filas, None)
+        yield bloque
+
+
+def leer_por_bloques(ruta, tamano_bloque=TAMANO_BLOQUE, progreso=_sin_progreso):
+    """DataFrames de como máximo `tamano_bloque` filas de un CSV o de la primera hoja de un Excel"""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return leer_excel_por_bloques(ruta, tamano_bloque, progreso)
+    if extension in ('.csv', '.txt'):
+        return _leer_csv_por_bloques(ruta, tamano_bloque, progreso)
+    raise ValueError(f"Formato no soportado: {extension or ruta} (use .csv o .xlsx)")
+
+
+def puntuar_bloque(bloque, modelo, columnas, nivel=NIVEL):
+    """
+    Agrega al bloque la DBO5 predicha, los intervalos de confianza y de predicción y la
+    banda de calidad, todo con operaciones vectorizadas sobre el bloque completo. Las
+    filas con valores no numéricos quedan sin predicción y sin banda. Devuelve la tabla
+    y el conteo de filas por banda (la última posición cuenta las filas sin predicción).
+    """
+    valores = [pd.to_numeric(bloque[c], errors='coerce').to_numpy(dtype=np.float64) for c in columnas]
+    dbo5, confianza, prediccion = modelo.intervalos(*valores, nivel=nivel)
+    dbo5 = np.broadcast_to(dbo5, (len(bloque),))
+    # La DBO5 no puede ser negativa: los límites inferiores se recortan en 0, igual que en el simulador
+    confianza = (np.maximum(confianza[0], 0), confianza[1])
+    prediccion = (np.maximum(prediccion[0], 0), prediccion[1])
+    clases = clasificar_calidad(dbo5)
+    # Redondeo a 0.0001 mg/L: muy por debajo de la precisión del análisis y los números
+    # cortos se escriben varias veces más rápido que los 17 dígitos de un float64
+    tabla = bloque.assign(DBO5_predicha=dbo5, ic_inferior=confianza[0], ic_superior=confianza[1],
+                          ip_inferior=prediccion[0], ip_superior=prediccion[1]).round(
+        {c: DECIMALES for c in COLUMNAS_SALIDA})
+    tabla['calidad'] = _ETIQUETAS_CALIDAD[clases]
+    return tabla, np.bincount(clases, minlength=SIN_CLASE + 1)
+
+
+class _EscritorCSV:
+    def __init__(self, ruta):
+        self.archivo = open(ruta, 'w', encoding='utf-8', newline='')
+        self.encabezado = True
+
+    def escribir(self, tabla):
+        tabla.to_csv(self.archivo, header=self.encabezado, index=False)
+        self.encabezado = False
+
+    def cerrar(self):
+        self.archivo.close()
+
+    def descartar(self):
+        self.archivo.close()
+
+
+class _EscritorExcel:
+    # Libro de solo escritura: openpyxl vuelca las filas a disco a medida que se agregan
+    MAX_FILAS = 1048575  # Límite de filas de una hoja de Excel (sin el encabezado)
+
+    def __init__(self, ruta):
+        from openpyxl import Workbook
+        self.ruta = ruta
+        self.libro = Workbook(write_only=True)
+        self.hoja = self.libro.create_sheet("DBO5")
+        self.encabezado = True
+        self.filas = 0
+
+    def escribir(self, tabla):
+        self.filas += len(tabla)
+        if self.filas > self.MAX_FILAS:
+            raise ValueError(f"Excel admite hasta {self.MAX_FILAS:,} filas por hoja; guarde los resultados como .csv")
+        if self.encabezado:
+            self.hoja.append([str(c) for c in tabla.columns])
+            self.encabezado = False
+        tabla = tabla.astype(object).where(tabla.notna(), None)
+        for fila in tabla.itertuples(index=False, name=None):
+            self.hoja.append(fila)
+
+    def cerrar(self):
+        self.libro.save(self.ruta)
+
+    def descartar(self):
+        # Se cierran la hoja y el libro sin guardarlo; el archivo de salida nunca llega a crearse
+        self.hoja.close()
+        self.libro.close()
+
+
+def puntuar_archivo(entrada, salida, modelo=None, tamano_bloque=TAMANO_BLOQUE, nivel=NIVEL,
+                    progreso=_sin_progreso):
+    """
+    Lee `entrada` por bloques, predice DBO5 con `modelo` (ModeloAjustado; por defecto los
+    coeficientes publicados, los mismos de calcular_BOD5) y escribe cada bloque en `salida`
+    (.csv o .xlsx) apenas se calcula, así que la memoria no depende del tamaño del archivo.
+    Se escribe en un archivo temporal único que reemplaza a `salida` solo si todo terminó; si
+    progreso(etapa, filas, total) lanza una excepción (por ejemplo al cancelar) no queda
+    un archivo a medias. Devuelve un resumen con el conteo de filas por banda de calidad.
+    """
+    inicio = time.perf_counter()
+    modelo = modelo or ModeloAjustado.publicado(MODELO)
+    extension = os.path.splitext(salida)[1].lower()
+    if extension not in ('.csv', '.xlsx'):
+        raise ValueError(f"Formato de salida no soportado: {extension or salida} (use .csv o .xlsx)")
+    conteos = np.zeros(SIN_CLASE + 1, dtype=np.int64)
+    columnas = None
+    filas = 0
+
+    def escribir(temporal):
+        nonlocal columnas, filas
+        escritor = _EscritorExcel(temporal) if extension == '.xlsx' else _EscritorCSV(temporal)
+        try:
+            for bloque in leer_por_bloques(entrada, tamano_bloque, progreso):
+                if columnas is None:
+                    columnas = resolver_columnas(bloque.columns, modelo.predictores)
+                tabla, conteo_bloque = puntuar_bloque(bloque, modelo, columnas, nivel)
+                escritor.escribir(tabla)
+                conteos[:] += conteo_bloque
+                filas += len(bloque)
+                progreso("Puntuando escenarios", filas, None)
+            if columnas is None:
+                raise ValueError(f"El archivo {os.path.basename(entrada)} no tiene filas")
+            escritor.cerrar()
+        except BaseException:
+            # Se descarta lo escrito sin guardar; un error al cerrar no debe ocultar el original
+            # (por ejemplo CargaCancelada)
+            with contextlib.suppress(Exception):
+                escritor.descartar()
+            raise
+
+    # Temporal con nombre único junto a `salida`: dos puntuaciones al mismo destino no se pisan
+    # y el temporal se borra si algo falla
+    _reemplazar_atomico(os.path.abspath(salida), escribir)
+    return {
+        'entrada': os.path.abspath(entrada),
+        'salida': os.path.abspath(salida),
+        'modelo': modelo.ecuacion(),
+        'intervalos': modelo.covarianza is not None,
+        'filas': filas,
+        'filas_sin_prediccion': int(conteos[-1]),
+        'calidad': {str(etiqueta): int(n) for etiqueta, n in zip(_ETIQUETAS_CALIDAD[:-1], conteos[:-1])},
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def texto_resumen(resumen):
+    """Resumen legible de puntuar_archivo (para la consola y la interfaz)"""
+    lineas = [
+        f"✔ {resumen['filas']:,} escenarios en {resumen['segundos']:.1f} s",
+        f"  Entrada: {resumen['entrada']}",
+        f"  Resultados: {resumen['salida']}",
+        f"  Modelo: {resumen['modelo']}" + ("" if resumen['intervalos'] else " (publicado, sin intervalos)"),
+        "",
+        "  Escenarios por calidad del agua:",
+    ]
+    validas = resumen['filas'] - resumen['filas_sin_prediccion']
+    for etiqueta, n in resumen['calidad'].items():
+        lineas.append(f"    {etiqueta:<32}{n:>12,}  ({n / validas:.1%})" if validas else f"    {etiqueta:<32}{n:>12,}")
+    if resumen['filas_sin_prediccion']:
+        lineas.append(f"    {'Sin predicción (no numéricos)':<32}{resumen['filas_sin_prediccion']:>12,}")
+    return "\n".join(lineas)
+
+
+def modelo_para_datos(ruta_datos):
+    """Modelo OD + DQO ajustado (o leído del registro) para un libro de datos históricos"""
+    from ConjuntoDatos import ConjuntoDatos
+    from RegistroModelos import RegistroModelos
+    conjunto = ConjuntoDatos.desde_archivo(ruta_datos)
+    return RegistroModelos.para_archivo(ruta_datos).obtener(MODELO, conjunto)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Predicción de DBO5 para un archivo de escenarios OD/DQO.")
+    parser.add_argument('entrada', help="Archivo de escenarios (.csv o .xlsx)")
+    parser.add_argument('--salida', default=None,
+                        help="Archivo de resultados .csv o .xlsx (por defecto: <entrada>_dbo5.csv)")
+    parser.add_argument('--datos', default=None,
+                        help="Libro de datos históricos para ajustar el modelo (sin él: coeficientes publicados, "
+                             "sin intervalos)")
+    parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE,
+                        help=f"Filas por bloque (por defecto: {TAMANO_BLOQUE})")
+    parser.add_argument('--nivel', type=float, default=NIVEL, help="Nivel de los intervalos (por defecto: 0.95)")
+    args = parser.parse_args(argumentos)
+
+    salida = args.salida or os.path.splitext(args.entrada)[0] + "_dbo5.csv"
+    try:
+        modelo = modelo_para_datos(args.datos) if args.datos else None
+        resumen = puntuar_archivo(args.entrada, salida, modelo, args.bloque, args.nivel)
+    except (OSError, ValueError) as e:
+        print(f"✖ {e}", file=sys.stderr)
+        return 1
+    print(texto_resumen(resumen))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
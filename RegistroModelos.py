@@ -0,0 +1,202 @@
+# RegistroModelos.py - Modelos ajustados guardados en disco y evaluados de forma vectorizada
+import json
+import os
+import time
+import numpy as np
+import CacheDatos
+
+# Modelos que usa la aplicación: nombre -> (predictores, objetivo)
+MODELOS = {
+    'dbo5_od_dqo': (('OD_mg/L', 'DQO_TOT'), 'DBO5'),
+    'dbo5_dqo': (('DQO_TOT',), 'DBO5'),
+}
+
+# Coeficientes publicados (constante primero); se usan mientras no haya datos cargados
+COEFICIENTES_PUBLICADOS = {
+    'dbo5_od_dqo': (21.3075, -6.6283, 0.3407),
+    'dbo5_dqo': (1.0979, 0.3597),
+}
+
+_PREFIJO = "modelo_"
+
+
+class ModeloAjustado:
+    """
+    Regresión lineal ya ajustada: predictores, coeficientes (con la constante primero),
+    matriz de covarianza de los coeficientes, huella de los datos de entrenamiento y métricas.
+    """
+
+    def __init__(self, nombre, predictores, objetivo, coeficientes, covarianza=None,
+                 huella_datos=None, metricas=None, creado=None):
+        self.nombre = nombre
+        self.predictores = tuple(predictores)
+        self.objetivo = objetivo
+        self.coeficientes = np.asarray(coeficientes, dtype=np.float64)
+        self.covarianza = None if covarianza is None else np.asarray(covarianza, dtype=np.float64)
+        self.huella_datos = huella_datos
+        self.metricas = metricas or {}
+        self.creado = creado
+        self._cuantiles = {}
+
+    @classmethod
+    def publicado(cls, nombre):
+        predictores, objetivo = MODELOS[nombre]
+        return cls(nombre, predictores, objetivo, COEFICIENTES_PUBLICADOS[nombre])
+
+    @classmethod
+    def ajustar(cls, nombre, X, y, predictores, objetivo, huella_datos=None):
+        """Ajuste por mínimos cuadrados con constante; guarda covarianza y métricas"""
+        X = np.asarray(X, dtype=np.float64).reshape(len(y), -1)
+        y = np.asarray(y, dtype=np.float64)
+        diseño = np.column_stack([np.ones(len(y)), X])
+        coeficientes, _, rango, _ = np.linalg.lstsq(diseño, y, rcond=None)
+        n, p = diseño.shape
+        residuos = y - diseño @ coeficientes
+        rss = float(residuos @ residuos)
+        tss = float(((y - y.mean()) ** 2).sum())
+        gl = n - p
+        sigma2 = rss / gl if gl > 0 else np.nan
+        covarianza = sigma2 * np.linalg.pinv(diseño.T @ diseño)
+        r2 = 1 - rss / tss if tss > 0 else np.nan
+        metricas = {
+            'n': n,
+            'gl': gl,
+            'r2': r2,
+            'r2_ajustado': 1 - (1 - r2) * (n - 1) / gl if gl > 0 else np.nan,
+            'rmse': float(np.sqrt(rss / n)) if n else np.nan,
+            'sigma2': sigma2,
+        }
+        return cls(nombre, predictores, objetivo, coeficientes, covarianza, huella_datos, metricas, time.time())
+
+    @property
+    def ajustado(self):
+        """False para los coeficientes publicados (sin datos de entrenamiento)"""
+        return self.huella_datos is not None
+
+    def predecir(self, *columnas):
+        """
+        DBO5 predicha para arreglos (o escalares) en el orden de self.predictores.
+        Todo es una sola operación vectorizada: constante + X @ b.
+        """
+        if len(columnas) != len(self.predictores):
+            raise ValueError(f"El modelo {self.nombre} espera {len(self.predictores)} predictores "
+                             f"({', '.join(self.predictores)})")
+        resultado = self.coeficientes[0]
+        for coeficiente, columna in zip(self.coeficientes[1:], columnas):
+            resultado = resultado + coeficiente * np.asarray(columna, dtype=np.float64)
+        return resultado
+
+    def _cuantil_t(self, nivel):
+        """Cuantil t de Student para `nivel` con los grados de libertad del ajuste (se calcula una vez)"""
+        if nivel not in self._cuantiles:
+            from scipy import stats
+            self._cuantiles[nivel] = float(stats.t.ppf(0.5 + nivel / 2, self.metricas['gl']))
+        return self._cuantiles[nivel]
+
+    def intervalos(self, *columnas, nivel=0.95):
+        """
+        Predicción con intervalo de confianza de la media y de predicción de una
+        observación nueva: ŷ ± t·√(x'Σx) y ŷ ± t·√(x'Σx + σ²), con Σ la covarianza
+        guardada de los coeficientes. Cada punto cuesta O(p²), sin volver a ajustar.
+        Devuelve (ŷ, (inf, sup) de confianza, (inf, sup) de predicción); sin covarianza
+        (coeficientes publicados) los límites son NaN.
+        """
+        prediccion = self.predecir(*columnas)
+        sigma2 = self.metricas.get('sigma2', np.nan)
+        if self.covarianza is None or not np.isfinite(sigma2) or not self.metricas.get('gl'):
+            sin_limite = np.full(np.shape(prediccion), np.nan)
+            return prediccion, (sin_limite, sin_limite), (sin_limite, sin_limite)
+        x = np.stack(np.broadcast_arrays(1.0, *(np.asarray(c, dtype=np.float64) for c in columnas)), axis=-1)
+        varianza_media = np.einsum('...i,ij,...j->...', x, self.covarianza, x)
+        t = self._cuantil_t(nivel)
+        media = t * np.sqrt(np.maximum(varianza_media, 0.0))
+        nueva = t * np.sqrt(np.maximum(varianza_media, 0.0) + sigma2)
+        return prediccion, (prediccion - media, prediccion + media), (prediccion - nueva, prediccion + nueva)
+
+    def predecir_conjunto(self, conjunto):
+        """Predicción sobre un ConjuntoDatos (o su vista por año)"""
+        return self.predecir(*(conjunto[nombre] for nombre in self.predictores))
+
+    def ecuacion(self, etiquetas=None, decimales=4):
+        """Texto 'DBO5 = a × OD + b × DQO + c' para mostrar en la interfaz"""
+        etiquetas = etiquetas or {}
+        terminos = [f"{b:.{decimales}f} × {etiquetas.get(n, n)}"
+                    for n, b in zip(self.predictores, self.coeficientes[1:])]
+        texto = " + ".join(terminos + [f"{self.coeficientes[0]:.{decimales}f}"])
+        return f"{self.objetivo} = " + texto.replace("+ -", "- ")
+
+    def a_dict(self):
+        return {
+            'nombre': self.nombre,
+            'predictores': list(self.predictores),
+            'objetivo': self.objetivo,
+            'coeficientes': self.coeficientes.tolist(),
+            'covarianza': None if self.covarianza is None else self.covarianza.tolist(),
+            'huella_datos': self.huella_datos,
+            'metricas': {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in self.metricas.items()},
+            'creado': self.creado,
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        metricas = {k: (np.nan if v is None else v) for k, v in (datos.get('metricas') or {}).items()}
+        return cls(datos['nombre'], datos['predictores'], datos['objetivo'], datos['coeficientes'],
+                   datos.get('covarianza'), datos.get('huella_datos'), metricas, datos.get('creado'))
+
+
+class RegistroModelos:
+    """
+    Modelos ajustados guardados como JSON en la carpeta de caché de los datos.
+    Cada archivo corresponde a un (modelo, huella de datos de entrenamiento); los
+    archivos se leen solo cuando se pide un modelo y se recuerdan en memoria, así
+    que el ajuste se repite únicamente cuando cambian los datos.
+    """
+
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        self._modelos = {}
+
+    @classmethod
+    def para_archivo(cls, file_path):
+        return cls(CacheDatos.carpeta_cache(file_path))
+
+    def _ruta(self, nombre, huella):
+        return os.path.join(self.carpeta, f"{_PREFIJO}{nombre}_{huella[:24]}.json")
+
+    def _leer(self, nombre, huella):
+        try:
+            with open(self._ruta(nombre, huella), "r", encoding="utf-8") as f:
+                modelo = ModeloAjustado.desde_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        return modelo if modelo.huella_datos == huella else None
+
+    def guardar(self, modelo):
+        self._modelos[(modelo.nombre, modelo.huella_datos)] = modelo
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            # Temporal único junto al destino: la interfaz y el modo por lotes pueden guardar a la vez
+            def escribir(ruta_tmp):
+                with open(ruta_tmp, "w", encoding="utf-8") as f:
+                    json.dump(modelo.a_dict(), f, ensure_ascii=False)
+            CacheDatos._reemplazar_atomico(self._ruta(modelo.nombre, modelo.huella_datos), escribir)
+        except OSError:
+            pass  # Sin permisos de escritura el modelo sigue disponible en memoria
+
+    def obtener(self, nombre, conjunto):
+        """
+        Modelo `nombre` ajustado a `conjunto`. Si ya existe uno con la misma huella
+        de datos (en memoria o en disco) se reutiliza; si no, se ajusta y se guarda.
+        """
+        predictores, objetivo = MODELOS[nombre]
+        huella = conjunto.huella(list(predictores) + [objetivo])
+        clave = (nombre, huella)
+        modelo = self._modelos.get(clave)
+        if modelo is None:
+            modelo = self._leer(nombre, huella)
+            if modelo is None:
+                X = np.column_stack([conjunto[p] for p in predictores])
+                modelo = ModeloAjustado.ajustar(nombre, X, conjunto[objetivo], predictores, objetivo, huella)
+                self.guardar(modelo)
+            self._modelos[clave] = modelo
+        return modelo
@@ -0,0 +1,99 @@
+# RegresionGrupos.py - Regresiones lineales por grupo (año, mes, sitio...) en una sola pasada
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def regresion_por_grupos(X, y, grupos, nombres=None, constante=True, minimo_filas=None):
+    """
+    Ajusta una regresión lineal por cada valor de `grupos` sin filtrar ni llamar a
+    sm.OLS por grupo: las filas se ordenan una vez por grupo, los X'X, X'y y y'y de
+    cada grupo se acumulan con np.add.reduceat y todos los sistemas se resuelven juntos.
+
+    Devuelve un DataFrame ordenado (una fila por grupo) con n, coeficientes, errores
+    estándar, p-valores, R², R² ajustado y RMSE. Los grupos con menos filas que
+    `minimo_filas` (por defecto, parámetros + 1) quedan con NaN.
+    """
+    if nombres is None:
+        nombres = [str(c) for c in X.columns] if hasattr(X, 'columns') else [f"x{i}" for i in range(np.shape(X)[1])]
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    y = np.asarray(y, dtype=np.float64)
+    grupos = np.asarray(grupos)
+    if constante:
+        X = np.column_stack([np.ones(len(y)), X])
+        nombres = ['const'] + list(nombres)
+    n, p = X.shape
+    if minimo_filas is None:
+        minimo_filas = p + 1
+
+    # Ordenar una sola vez; cada grupo queda como un tramo contiguo
+    orden = np.argsort(grupos, kind='stable')
+    grupos_ordenados = grupos[orden]
+    inicios = np.flatnonzero(np.r_[True, grupos_ordenados[1:] != grupos_ordenados[:-1]]) if n else np.array([], dtype=int)
+    etiquetas = grupos_ordenados[inicios]
+    filas = np.diff(np.r_[inicios, n])
+
+    # Escala común para que los sistemas estén bien condicionados
+    escala = np.linalg.norm(X, axis=0)
+    escala[escala == 0] = 1.0
+    Xs = X[orden] / escala
+    ys = y[orden]
+
+    productos = np.column_stack([(Xs[:, :, None] * Xs[:, None, :]).reshape(n, p * p), Xs * ys[:, None],
+                                 ys * ys, ys])
+    sumas = np.add.reduceat(productos, inicios, axis=0) if n else np.zeros((0, productos.shape[1]))
+    xtx = sumas[:, :p * p].reshape(-1, p, p)
+    xty = sumas[:, p * p:p * p + p]
+    yty = sumas[:, -2]
+    suma_y = sumas[:, -1]
+
+    validos = filas >= minimo_filas
+    # Los grupos con pocas filas se reemplazan por la identidad para no romper el solve apilado
+    xtx_resolver = np.where(validos[:, None, None], xtx, np.eye(p))
+    try:
+        inversa = np.linalg.inv(xtx_resolver)
+    except np.linalg.LinAlgError:
+        inversa = np.linalg.pinv(xtx_resolver)
+    b = np.einsum('gij,gj->gi', inversa, xty)
+
+    rss = np.maximum(yty - np.einsum('gi,gi->g', b, xty), 0.0)
+    gl = filas - p
+    tss = yty - suma_y ** 2 / np.maximum(filas, 1) if constante else yty
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = np.where(gl > 0, rss / gl, np.nan)
+        errores = np.sqrt(sigma2[:, None] * np.diagonal(inversa, axis1=1, axis2=2))
+        t = b / errores
+        p_valores = 2 * stats.t.sf(np.abs(t), np.maximum(gl, 1)[:, None])
+        r2 = np.where(tss > 0, 1 - rss / tss, np.nan)
+        r2_ajustado = 1 - (1 - r2) * (filas - 1) / gl
+        rmse = np.sqrt(rss / filas)
+
+    b = b / escala
+    errores = errores / escala
+
+    tabla = pd.DataFrame({'grupo': etiquetas, 'n': filas})
+    for j, nombre in enumerate(nombres):
+        tabla[f'coef_{nombre}'] = b[:, j]
+    for j, nombre in enumerate(nombres):
+        tabla[f'error_{nombre}'] = errores[:, j]
+    for j, nombre in enumerate(nombres):
+        tabla[f'p_{nombre}'] = p_valores[:, j]
+    tabla['r2'] = r2
+    tabla['r2_ajustado'] = r2_ajustado
+    tabla['rmse'] = rmse
+
+    # Sin filas suficientes no hay ajuste: todo NaN salvo el grupo y su tamaño
+    tabla.loc[~validos, tabla.columns[2:]] = np.nan
+    return tabla
+
+
+def regresion_por_año_y_mes(conjunto, predictores=('OD_mg/L', 'DQO_TOT'), objetivo='DBO5'):
+    """Ajusta objetivo ~ predictores por año y por mes calendario sobre un ConjuntoDatos"""
+    X = conjunto.matriz(list(predictores))
+    y = conjunto[objetivo]
+    con_fecha = conjunto.años >= 0
+    por_año = regresion_por_grupos(X[con_fecha], y[con_fecha], conjunto.años[con_fecha], list(predictores))
+    por_mes = regresion_por_grupos(X[con_fecha], y[con_fecha], conjunto.meses[con_fecha], list(predictores))
+    return por_año, por_mes
@@ -0,0 +1,180 @@
+# RegresionRobusta.py - Regresión robusta (M-estimadores de Huber y Tukey) por mínimos cuadrados reponderados
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+MAX_ITERACIONES = 50
+TOLERANCIA = 1e-8
+ACELERACION = 3  # Pasos que recuerda la aceleración de Anderson (0 = IRLS simple)
+
+# La MAD de una normal estándar; al dividir entre ella la escala MAD estima sigma
+_MAD_NORMAL = stats.norm.ppf(0.75)
+
+
+class NormaHuber:
+    """Huber: cuadrática cerca de cero y lineal en las colas (los atípicos pesan t/|z|)"""
+    nombre = 'huber'
+
+    def __init__(self, t=1.345):
+        self.t = t
+
+    def psi(self, z):
+        return np.clip(z, -self.t, self.t)
+
+    def psi_derivada(self, z):
+        return (np.abs(z) <= self.t).astype(np.float64)
+
+    def pesos(self, z):
+        a = np.abs(z)
+        with np.errstate(divide='ignore'):
+            return np.where(a <= self.t, 1.0, self.t / a)
+
+
+class NormaTukey:
+    """Bicuadrada de Tukey: los residuos más allá de c veces la escala pesan cero"""
+    nombre = 'tukey'
+
+    def __init__(self, c=4.685):
+        self.c = c
+
+    def _dentro(self, z):
+        return np.abs(z) <= self.c
+
+    def psi(self, z):
+        return z * self.pesos(z)
+
+    def psi_derivada(self, z):
+        u = (z / self.c) ** 2
+        return np.where(self._dentro(z), (1 - u) * (1 - 5 * u), 0.0)
+
+    def pesos(self, z):
+        u = (z / self.c) ** 2
+        return np.where(self._dentro(z), (1 - u) ** 2, 0.0)
+
+
+NORMAS = {'huber': NormaHuber, 'tukey': NormaTukey}
+
+
+def escala_mad(residuos):
+    """Escala robusta de los residuos: mediana de |r| / 0.6745 (como statsmodels RLM)"""
+    return float(np.median(np.abs(residuos))) / _MAD_NORMAL
+
+
+class ResultadoRobusto:
+    """
+    Coeficientes del M-estimador con errores estándar (covarianza H1 de Huber, la de
+    statsmodels RLM), p-valores normales, pesos finales de cada fila y datos de la convergencia.
+    """
+
+    def __init__(self, norma, nombres, coeficientes, covarianza, escala, pesos, ajustados, y,
+                 iteraciones, convergio, indice=None):
+        self.norma = norma
+        self.params = pd.Series(coeficientes, index=nombres)
+        self.cov_params = pd.DataFrame(covarianza, index=nombres, columns=nombres)
+        self.bse = pd.Series(np.sqrt(np.diag(covarianza)), index=nombres)
+        self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(2 * stats.norm.sf(np.abs(self.tvalues.to_numpy())), index=nombres)
+        self.scale = escala
+        self.weights = pd.Series(pesos, index=indice)
+        self.fittedvalues = pd.Series(ajustados, index=indice)
+        self.resid = pd.Series(y - ajustados, index=indice)
+        self.nobs = float(len(y))
+        self.df_resid = self.nobs - len(nombres)
+        self.iteraciones = iteraciones
+        self.convergio = convergio
+
+    @property
+    def filas_reponderadas(self):
+        """Cuántas filas terminaron con peso menor que 1 (y cuántas con peso 0, solo en Tukey)"""
+        return int((self.weights < 1 - 1e-12).sum()), int((self.weights <= 0).sum())
+
+    def tabla(self):
+        """Coeficientes, errores, z y p-valores como DataFrame"""
+        return pd.DataFrame({'coeficiente': self.params, 'error_estandar': self.bse,
+                             'z': self.tvalues, 'p_valor': self.pvalues})
+
+
+def _preparar(X, y, constante):
+    nombres = [str(c) for c in X.columns] if hasattr(X, 'columns') else \
+        ([str(X.name)] if getattr(X, 'name', None) is not None else None)
+    indice = y.index if hasattr(y, 'index') else None
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    if nombres is None:
+        nombres = [f"x{i}" for i in range(X.shape[1])]
+    if constante:
+        X = np.column_stack([np.ones(len(X)), X])
+        nombres = ['const'] + nombres
+    return X, np.asarray(y, dtype=np.float64), nombres, indice
+
+
+def regresion_robusta(X, y, norma='huber', constante=True, max_iteraciones=MAX_ITERACIONES,
+                      tolerancia=TOLERANCIA):
+    """
+    M-estimador por mínimos cuadrados iterativamente reponderados (IRLS).
+    Arranca de la solución de mínimos cuadrados; en cada iteración los pesos de todas
+    las filas salen de una sola operación vectorizada sobre los residuos escalados y el
+    ajuste es una resolución p×p de (X'WX) b = X'Wy. La escala (MAD) se actualiza en
+    cada paso, los pasos se aceleran con Anderson y se detiene cuando un paso cambia
+    los coeficientes menos que `tolerancia` (relativa).
+    """
+    if norma not in NORMAS:
+        raise ValueError(f"Norma desconocida: {norma!r} (opciones: {', '.join(NORMAS)})")
+    M = NORMAS[norma]()
+    X, y, nombres, indice = _preparar(X, y, constante)
+    n, p = X.shape
+
+    # Columnas escaladas a norma 1 para que los sistemas estén bien condicionados
+    escala_columnas = np.linalg.norm(X, axis=0)
+    escala_columnas[escala_columnas == 0] = 1.0
+    Xs = X / escala_columnas
+    gram = Xs.T @ Xs
+
+    b = np.linalg.solve(gram, Xs.T @ y)
+    pesos = np.ones(n)
+    convergio = False
+    iteraciones = 0
+    pasos, diferencias = [], []
+    while iteraciones < max_iteraciones:
+        residuos = y - Xs @ b
+        escala = escala_mad(residuos)
+        if escala <= 0:
+            break  # Ajuste exacto de más de la mitad de las filas: no hay nada que reponderar
+        iteraciones += 1
+        pesos = M.pesos(residuos / escala)
+        Xw = Xs * pesos[:, None]
+        paso = np.linalg.solve(Xw.T @ Xs, Xw.T @ y)
+        diferencia = paso - b
+        if np.max(np.abs(diferencia)) <= tolerancia * max(np.max(np.abs(paso)), 1e-300):
+            b = paso
+            convergio = True
+            break
+
+        # Aceleración de Anderson: combina los últimos pasos para saltar hacia el punto fijo
+        pasos = (pasos + [paso])[-(ACELERACION + 1):]
+        diferencias = (diferencias + [diferencia])[-(ACELERACION + 1):]
+        b = paso
+        if len(pasos) > 1:
+            dF = np.diff(np.array(diferencias), axis=0).T
+            dG = np.diff(np.array(pasos), axis=0).T
+            gamma = np.linalg.lstsq(dF, diferencia, rcond=None)[0]
+            acelerado = paso - dG @ gamma
+            if np.all(np.isfinite(acelerado)):
+                b = acelerado
+    residuos = y - Xs @ b
+    escala = escala_mad(residuos)
+
+    # Covarianza H1: corrección k² · Σψ² / (n - p) · s² / (Σψ'/n)² · (X'X)⁻¹
+    z = residuos / escala if escala > 0 else np.zeros(n)
+    derivada = M.psi_derivada(z)
+    media_derivada = derivada.mean()
+    if media_derivada > 0 and n > p:
+        k = 1 + (p if constante else p + 1) / n * derivada.var() / media_derivada ** 2
+        factor = k ** 2 * (M.psi(z) ** 2).sum() / (n - p) * escala ** 2 / media_derivada ** 2
+        covarianza = factor * np.linalg.inv(gram) / np.outer(escala_columnas, escala_columnas)
+    else:
+        covarianza = np.full((p, p), np.nan)
+
+    return ResultadoRobusto(norma, nombres, b / escala_columnas, covarianza, escala, pesos, y - residuos, y,
+                            iteraciones, convergio, indice)
@@ -0,0 +1,286 @@
+# Regularizacion.py - Rutas de ridge y lasso sobre variables expandidas (potencias e interacciones)
+from itertools import combinations_with_replacement
+import numpy as np
+import pandas as pd
+from ValidacionCruzada import pliegues_aleatorios, PLIEGUES
+
+METODOS = ('lasso', 'ridge')
+PREDICTORES = ('pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA')
+NUM_LAMBDAS = 100
+TOLERANCIA = 1e-7
+MAX_BARRIDOS = 1000
+# Rango de la ruta: de lambda_max hasta lambda_max * RAZON_LAMBDA (lasso) o su equivalente en ridge
+RAZON_LAMBDA = 1e-3
+
+
+def expandir_variables(X, grado=2, interacciones=True, nombres=None):
+    """
+    Agrega potencias (hasta `grado`) y, si `interacciones`, productos cruzados de las
+    columnas de X. Devuelve un DataFrame con nombres como 'DQO_TOT^2' o 'OD_mg/L×SST'.
+    """
+    if nombres is None:
+        nombres = [str(c) for c in X.columns] if hasattr(X, 'columns') else [f"x{i}" for i in range(np.shape(X)[1])]
+    X = np.asarray(X, dtype=np.float64)
+    columnas = {nombre: X[:, j] for j, nombre in enumerate(nombres)}
+    for d in range(2, grado + 1):
+        for combinacion in combinations_with_replacement(range(len(nombres)), d):
+            if not interacciones and len(set(combinacion)) > 1:
+                continue
+            if len(set(combinacion)) == 1:
+                nombre = f"{nombres[combinacion[0]]}^{d}"
+            else:
+                nombre = "×".join(nombres[j] for j in combinacion)
+            columnas[nombre] = np.prod(X[:, combinacion], axis=1)
+    return pd.DataFrame(columnas)
+
+
+def _estandarizar(gram, xty, n, suma_x, suma_y):
+    """
+    X'X y X'y centrados y escalados (desviación estándar poblacional) a partir de
+    las sumas crudas, sin volver a recorrer las filas. Devuelve G = X'X/n (diagonal 1),
+    c = X'y/n, las medias y las escalas.
+    """
+    media_x = suma_x / n
+    media_y = suma_y / n
+    sxx = gram - n * np.outer(media_x, media_x)
+    sxy = xty - n * media_x * media_y
+    escala = np.sqrt(np.maximum(np.diag(sxx) / n, 0.0))
+    escala[escala == 0] = 1.0
+    G = sxx / np.outer(escala, escala) / n
+    c = sxy / escala / n
+    return G, c, media_x, media_y, escala
+
+
+def _ridge_eigen(G, c, lambdas):
+    """Coeficientes ridge estandarizados para todos los lambdas con una sola descomposición de G"""
+    valores, vectores = np.linalg.eigh(G)
+    proyeccion = vectores.T @ c
+    return (proyeccion / (np.maximum(valores, 0.0)[None, :] + lambdas[:, None])) @ vectores.T
+
+
+def _umbral_suave(z, umbral):
+    if z > umbral:
+        return z - umbral
+    if z < -umbral:
+        return z + umbral
+    return 0.0
+
+
+def _paso_exacto(G, c, lam, b):
+    """
+    Paso de conjunto activo: con el soporte y los signos de b, la solución lasso cumple
+    G_AA b_A = c_A - λ·signo. Si el candidato cambia algún signo se avanza hacia él hasta
+    que el primer coeficiente llega a cero, se saca del soporte y se repite (el objetivo
+    baja en cada tramo porque es convexo). Devuelve el nuevo b, su gradiente c - G b y si
+    cumple las condiciones KKT en las variables inactivas (|c_j - G_jA b_A| <= λ).
+    """
+    b = b.copy()
+    activos = np.flatnonzero(b)
+    while len(activos):
+        signos = np.sign(b[activos])
+        try:
+            candidato = np.linalg.solve(G[np.ix_(activos, activos)], c[activos] - lam * signos)
+        except np.linalg.LinAlgError:
+            break
+        cruzan = np.sign(candidato) != signos
+        if not np.any(cruzan):
+            b[activos] = candidato
+            break
+        actual = b[activos]
+        fraccion = actual[cruzan] / (actual[cruzan] - candidato[cruzan])
+        primero = np.flatnonzero(cruzan)[np.argmin(fraccion)]
+        b[activos] = actual + fraccion.min() * (candidato - actual)
+        b[activos[primero]] = 0.0
+        activos = np.delete(activos, primero)
+    gradiente = c - G @ b
+    inactivos = b == 0
+    return b, gradiente, not np.any(np.abs(gradiente[inactivos]) > lam * (1 + 1e-9))
+
+
+def _lasso_cd(G, c, lambdas, tolerancia=TOLERANCIA, max_barridos=MAX_BARRIDOS):
+    """
+    Ruta lasso por descenso coordenado sobre la forma de Gram (G = X'X/n, c = X'y/n):
+    cada actualización cuesta O(p) porque se mantiene el gradiente c - G b, y cada lambda
+    arranca de la solución del anterior. Los términos expandidos son muy colineales (x y x²)
+    y ahí el descenso coordenado se arrastra, así que tras cada barrido se da un paso exacto
+    sobre el conjunto activo; con el arranque en caliente suele bastar un barrido.
+    """
+    p = len(c)
+    b = np.zeros(p)
+    gradiente = c.copy()
+    diagonal = [float(d) if d > 0 else 1.0 for d in np.diag(G)]
+    ruta = np.empty((len(lambdas), p))
+    barridos = np.zeros(len(lambdas), dtype=int)
+    for k, lam in enumerate(lambdas):
+        lam = float(lam)
+        for _ in range(max_barridos):
+            barridos[k] += 1
+            cambio_maximo = 0.0
+            for j in range(p):
+                anterior = float(b[j])
+                nuevo = _umbral_suave(float(gradiente[j]) + diagonal[j] * anterior, lam) / diagonal[j]
+                if nuevo != anterior:
+                    gradiente -= G[j] * (nuevo - anterior)  # G es simétrica: la fila j es la columna j
+                    b[j] = nuevo
+                    cambio_maximo = max(cambio_maximo, abs(nuevo - anterior))
+            b, gradiente, optimo = _paso_exacto(G, c, lam, b)
+            if optimo:
+                break
+            if cambio_maximo < tolerancia:
+                break
+        ruta[k] = b
+    return ruta, barridos
+
+
+def _lambdas(metodo, G, c, num_lambdas, razon):
+    if metodo == 'lasso':
+        maximo = float(np.max(np.abs(c)))  # Con lambda >= max|X'y|/n todos los coeficientes son cero
+    else:
+        maximo = float(np.max(np.linalg.eigvalsh(G))) * 1e3
+        razon = razon * 1e-3
+    maximo = max(maximo, 1e-12)
+    return np.geomspace(maximo, maximo * razon, num_lambdas)
+
+
+def _ruta(metodo, G, c, lambdas):
+    if metodo == 'lasso':
+        return _lasso_cd(G, c, lambdas)[0]
+    return _ridge_eigen(G, c, lambdas)
+
+
+class ResultadoRegularizacion:
+    """
+    Ruta completa de coeficientes (una fila por lambda, en unidades originales y con la
+    constante), error de validación cruzada por lambda y los lambdas elegidos: el de menor
+    error (lambda_min) y el mayor cuyo error está a un error estándar del mínimo (lambda_1se).
+    """
+
+    def __init__(self, metodo, nombres, lambdas, coeficientes, constantes, escalas, error_cv, error_cv_se,
+                 grados_libertad):
+        self.metodo = metodo
+        self.nombres = list(nombres)
+        self.lambdas = lambdas
+        self.coeficientes = pd.DataFrame(coeficientes, columns=self.nombres)
+        self.escalas = pd.Series(escalas, index=self.nombres)  # Desviación estándar de cada término
+        self.constantes = constantes
+        self.error_cv = error_cv  # RMSE de validación cruzada por lambda
+        self.error_cv_se = error_cv_se
+        self.grados_libertad = grados_libertad
+        self.indice_min = int(np.nanargmin(error_cv)) if np.any(np.isfinite(error_cv)) else len(lambdas) - 1
+        limite = error_cv[self.indice_min] + error_cv_se[self.indice_min]
+        self.indice_1se = int(np.flatnonzero(error_cv <= limite)[0]) if np.isfinite(limite) else self.indice_min
+
+    @property
+    def coeficientes_estandarizados(self):
+        """Ruta en unidades de desviación estándar de cada término (comparables entre sí)"""
+        return self.coeficientes * self.escalas
+
+    @property
+    def lambda_min(self):
+        return float(self.lambdas[self.indice_min])
+
+    @property
+    def lambda_1se(self):
+        return float(self.lambdas[self.indice_1se])
+
+    def coeficientes_en(self, indice=None):
+        """Serie con la constante y los coeficientes en la posición `indice` de la ruta (por defecto lambda_1se)"""
+        indice = self.indice_1se if indice is None else indice
+        return pd.concat([pd.Series({'const': self.constantes[indice]}), self.coeficientes.iloc[indice]])
+
+    def terminos(self, indice=None):
+        """Términos con coeficiente distinto de cero en `indice` (por defecto lambda_1se)"""
+        coeficientes = self.coeficientes_en(indice).drop('const')
+        return coeficientes[coeficientes != 0]
+
+    def predecir(self, X_expandido, indice=None):
+        """Predicción con los términos expandidos (expandir_variables) en `indice` (por defecto lambda_1se)"""
+        indice = self.indice_1se if indice is None else indice
+        X = np.asarray(X_expandido[self.nombres] if hasattr(X_expandido, 'columns') else X_expandido, dtype=np.float64)
+        return self.constantes[indice] + X @ self.coeficientes.iloc[indice].to_numpy()
+
+    def tabla(self):
+        """Una fila por lambda: lambda, grados de libertad (o términos activos), RMSE de CV y su error estándar"""
+        return pd.DataFrame({'lambda': self.lambdas, 'grados_libertad': self.grados_libertad,
+                             'rmse_cv': self.error_cv, 'rmse_cv_se': self.error_cv_se})
+
+
+def ruta_regularizacion(X, y, metodo='lasso', grado=2, interacciones=True, lambdas=None,
+                        num_lambdas=NUM_LAMBDAS, pliegues=None, semilla=0):
+    """
+    Expande X (potencias e interacciones hasta `grado`; grado=1 deja X igual), estandariza
+    y calcula en una llamada la ruta completa de ridge o lasso y su validación cruzada.
+
+    - Ridge: (1/2n)||y - Xb||² + (λ/2)||b||². Todos los lambdas salen de una sola
+      descomposición espectral de X'X (equivalente a la SVD de X), así que agregar lambdas es casi gratis.
+    - Lasso: (1/2n)||y - Xb||² + λ||b||₁ por descenso coordenado con arranque en caliente.
+
+    Igual que en ValidacionCruzada, las sumas X'X, X'y y y'y de cada pliegue se calculan
+    una vez; cada ajuste de entrenamiento (total menos pliegue, con su propia media y
+    escala) y su error fuera de muestra salen de esas sumas, sin recorrer las filas de nuevo.
+    `pliegues` es una asignación como la de pliegues_aleatorios (por defecto 10 pliegues).
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método desconocido: {metodo!r} (opciones: {', '.join(METODOS)})")
+    expandido = expandir_variables(X, grado, interacciones)
+    nombres = [str(c) for c in expandido.columns]
+    Z = expandido.to_numpy(dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, p = Z.shape
+
+    # Sumas por pliegue con una sola multiplicación por la asignación (uno caliente)
+    if pliegues is None:
+        pliegues = pliegues_aleatorios(n, min(PLIEGUES, n), 1, semilla)[0]
+    pliegues = np.asarray(pliegues).ravel()
+    k = int(pliegues.max()) + 1
+    # Las columnas se desplazan por su media global para que las sumas no pierdan precisión
+    desplazamiento_x = Z.mean(axis=0)
+    desplazamiento_y = y.mean()
+    Zc = Z - desplazamiento_x
+    yc = y - desplazamiento_y
+    productos = np.column_stack([(Zc[:, :, None] * Zc[:, None, :]).reshape(n, p * p), Zc * yc[:, None],
+                                 yc * yc, Zc, yc, np.ones(n)])
+    uno_caliente = np.zeros((n, k))
+    uno_caliente[np.arange(n), pliegues] = 1.0
+    sumas = uno_caliente.T @ productos
+    total = sumas.sum(axis=0)
+
+    def separar(s):
+        return (s[:p * p].reshape(p, p), s[p * p:p * p + p], s[p * p + p], s[p * p + p + 1:p * p + 2 * p + 1],
+                s[-2], s[-1])
+
+    # Ruta sobre todos los datos
+    gram, xty, yty, suma_x, suma_y, filas = separar(total)
+    G, c, media_x, media_y, escala = _estandarizar(gram, xty, filas, suma_x, suma_y)
+    if lambdas is None:
+        lambdas = _lambdas(metodo, G, c, num_lambdas, RAZON_LAMBDA)
+    lambdas = np.asarray(lambdas, dtype=np.float64)
+    ruta = _ruta(metodo, G, c, lambdas)
+    coeficientes = ruta / escala
+    constantes = media_y + desplazamiento_y - coeficientes @ (media_x + desplazamiento_x)
+    if metodo == 'ridge':
+        valores = np.maximum(np.linalg.eigvalsh(G), 0.0)
+        grados_libertad = (valores[None, :] / (valores[None, :] + lambdas[:, None])).sum(axis=1)
+    else:
+        grados_libertad = (ruta != 0).sum(axis=1).astype(np.float64)
+
+    # Validación cruzada: cada pliegue se ajusta con total - pliegue y se evalúa con las sumas del pliegue
+    sse = np.empty((k, len(lambdas)))
+    filas_pliegue = np.empty(k)
+    for f in range(k):
+        gram_f, xty_f, yty_f, sx_f, sy_f, n_f = separar(sumas[f])
+        G_t, c_t, mx_t, my_t, esc_t = _estandarizar(gram - gram_f, xty - xty_f, filas - n_f, suma_x - sx_f,
+                                                    suma_y - sy_f)
+        B = _ruta(metodo, G_t, c_t, lambdas) / esc_t
+        # Sumas del pliegue centradas en las medias de entrenamiento
+        sxx = gram_f - np.outer(sx_f, mx_t) - np.outer(mx_t, sx_f) + n_f * np.outer(mx_t, mx_t)
+        sxy = xty_f - sx_f * my_t - mx_t * sy_f + n_f * mx_t * my_t
+        syy = yty_f - 2 * my_t * sy_f + n_f * my_t ** 2
+        sse[f] = syy - 2 * B @ sxy + np.einsum('li,ij,lj->l', B, sxx, B)
+        filas_pliegue[f] = n_f
+    rmse_pliegue = np.sqrt(np.maximum(sse, 0.0) / filas_pliegue[:, None])
+    error_cv = np.sqrt(np.maximum(sse, 0.0).sum(axis=0) / filas)
+    error_cv_se = rmse_pliegue.std(axis=0, ddof=1) / np.sqrt(k) if k > 1 else np.zeros(len(lambdas))
+
+    return ResultadoRegularizacion(metodo, nombres, lambdas, coeficientes, constantes, escala, error_cv,
+                                   error_cv_se, grados_libertad)
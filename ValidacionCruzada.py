@@ -0,0 +1,159 @@
+# ValidacionCruzada.py - Validación cruzada k-fold, repetida y por año a partir de estadísticas suficientes
+import numpy as np
+import pandas as pd
+from ConjuntoDatos import SIN_FECHA
+
+PLIEGUES = 10
+REPETICIONES = 20
+# Pliegue de las filas que no entran en la validación (ni en entrenamiento ni en prueba)
+SIN_PLIEGUE = -1
+
+
+def pliegues_aleatorios(n, k=PLIEGUES, repeticiones=1, semilla=None):
+    """
+    Asignación de cada fila a un pliegue, una fila del resultado por repetición
+    (forma (repeticiones, n)). Los pliegues quedan de tamaños casi iguales.
+    """
+    if k < 2 or k > n:
+        raise ValueError(f"El número de pliegues debe estar entre 2 y {n}")
+    generador = np.random.default_rng(semilla)
+    base = np.arange(n) % k
+    return np.stack([generador.permutation(base) for _ in range(repeticiones)])
+
+
+def pliegues_por_año(años, bloques=None):
+    """
+    Pliegues por año: cada año queda fuera completo una vez, así el modelo se evalúa
+    en años que no vio. Con `bloques` los años consecutivos se agrupan en ese número de pliegues.
+    Las filas sin fecha (SIN_FECHA o NaN) quedan en SIN_PLIEGUE y no cuentan como un año más.
+    """
+    años = np.asarray(años, dtype=np.float64)
+    con_fecha = np.isfinite(años) & (años != SIN_FECHA)
+    unicos, pliegue = np.unique(años[con_fecha], return_inverse=True)
+    if len(unicos) < 2:
+        raise ValueError("Se necesitan al menos dos años distintos para validar por año")
+    if bloques is not None and bloques < len(unicos):
+        pliegue = np.arange(len(unicos))[pliegue] * bloques // len(unicos)
+    asignacion = np.full(len(años), SIN_PLIEGUE, dtype=np.intp)
+    asignacion[con_fecha] = pliegue
+    return asignacion[None, :]
+
+
+def _filas_en_pliegues(pliegues, *arreglos):
+    """Quita las filas que alguna repetición deja en SIN_PLIEGUE"""
+    usadas = (pliegues != SIN_PLIEGUE).all(axis=0)
+    if usadas.all():
+        return (pliegues, *arreglos)
+    return (pliegues[:, usadas], *(a[usadas] for a in arreglos))
+
+
+def _estadisticas_por_pliegue(productos, y, pliegues, k):
+    """
+    X'X, X'y y y'y de cada pliegue. `productos` trae por fila [x⊗x, x·y, y²] ya aplanados,
+    así que sumar por pliegue es una sola multiplicación matricial con la asignación.
+    """
+    uno_caliente = np.zeros((len(y), k))
+    uno_caliente[np.arange(len(y)), pliegues] = 1.0
+    return uno_caliente.T @ productos
+
+
+def _metricas_por_pliegue(y, predicho, pliegues, k, sse=None):
+    n = np.bincount(pliegues, minlength=k).astype(np.float64)
+    errores = y - predicho
+    if sse is None:
+        sse = np.bincount(pliegues, weights=errores ** 2, minlength=k)
+    sae = np.bincount(pliegues, weights=np.abs(errores), minlength=k)
+    suma_y = np.bincount(pliegues, weights=y, minlength=k)
+    sst = np.bincount(pliegues, weights=y ** 2, minlength=k) - suma_y ** 2 / np.maximum(n, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(sse / n), sae / n, np.where(sst > 0, 1 - sse / sst, np.nan)
+
+
+class ResultadoValidacion:
+    """Métricas fuera de muestra por repetición y pliegue (arreglos de forma (repeticiones, pliegues))"""
+
+    def __init__(self, rmse, mae, r2, coeficientes=None, nombres=None):
+        self.rmse = rmse
+        self.mae = mae
+        self.r2 = r2
+        self.coeficientes = coeficientes
+        self.nombres = nombres
+
+    def resumen(self):
+        """Media, desviación estándar y percentiles 2.5 / 50 / 97.5 de cada métrica"""
+        filas = {}
+        for nombre in ('rmse', 'mae', 'r2'):
+            valores = getattr(self, nombre).ravel()
+            valores = valores[np.isfinite(valores)]
+            filas[nombre] = {
+                'media': float(np.mean(valores)) if len(valores) else np.nan,
+                'desviacion': float(np.std(valores, ddof=1)) if len(valores) > 1 else np.nan,
+                'p2.5': float(np.percentile(valores, 2.5)) if len(valores) else np.nan,
+                'mediana': float(np.median(valores)) if len(valores) else np.nan,
+                'p97.5': float(np.percentile(valores, 97.5)) if len(valores) else np.nan,
+            }
+        return pd.DataFrame(filas).T
+
+
+def validacion_cruzada(X, y, pliegues, constante=True):
+    """
+    Validación cruzada de una regresión lineal por mínimos cuadrados.
+    Por cada repetición se calculan una vez X'X, X'y y y'y de cada pliegue; el
+    ajuste de entrenamiento de cada pliegue sale del total menos el pliegue, sin
+    volver a recorrer las filas, y el error cuadrático fuera de muestra se obtiene
+    de las mismas estadísticas.
+    """
+    nombres = [str(c) for c in X.columns] if hasattr(X, 'columns') else None
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    y = np.asarray(y, dtype=np.float64)
+    pliegues, X, y = _filas_en_pliegues(np.atleast_2d(pliegues), X, y)
+    if constante:
+        X = np.column_stack([np.ones(len(y)), X])
+        nombres = ['const'] + nombres if nombres is not None else None
+
+    # Escala común de las columnas para que los sistemas estén bien condicionados
+    escala = np.linalg.norm(X, axis=0)
+    escala[escala == 0] = 1.0
+    Xc = X / escala
+
+    k = int(pliegues.max()) + 1
+    repeticiones = len(pliegues)
+    rmse = np.empty((repeticiones, k))
+    mae = np.empty((repeticiones, k))
+    r2 = np.empty((repeticiones, k))
+    coeficientes = np.empty((repeticiones, k, X.shape[1]))
+    p = Xc.shape[1]
+    productos = np.column_stack([(Xc[:, :, None] * Xc[:, None, :]).reshape(len(y), p * p),
+                                 Xc * y[:, None], y * y])
+    for r, asignacion in enumerate(pliegues):
+        sumas = _estadisticas_por_pliegue(productos, y, asignacion, k)
+        xtx = sumas[:, :p * p].reshape(k, p, p)
+        xty = sumas[:, p * p:p * p + p]
+        yty = sumas[:, -1]
+        entrenamiento_xtx = xtx.sum(axis=0) - xtx
+        entrenamiento_xty = xty.sum(axis=0) - xty
+        b = np.linalg.solve(entrenamiento_xtx, entrenamiento_xty[..., None])[..., 0]
+
+        # SSE del pliegue: y'y - 2 b'X'y + b'X'X b, todo con las estadísticas del pliegue
+        sse = yty - 2 * np.einsum('fi,fi->f', b, xty) + np.einsum('fi,fij,fj->f', b, xtx, b)
+        predicho = np.einsum('ni,ni->n', Xc, b[asignacion])
+        rmse[r], mae[r], r2[r] = _metricas_por_pliegue(y, predicho, asignacion, k, np.maximum(sse, 0.0))
+        coeficientes[r] = b / escala
+
+    return ResultadoValidacion(rmse, mae, r2, coeficientes, nombres)
+
+
+def validacion_modelo_fijo(y, predicho, pliegues):
+    """
+    Mismas métricas por pliegue para un modelo que no se reentrena (por ejemplo
+    calcular_BOD5 con sus coeficientes publicados): solo mide la dispersión del error.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    predicho = np.asarray(predicho, dtype=np.float64)
+    pliegues, y, predicho = _filas_en_pliegues(np.atleast_2d(pliegues), y, predicho)
+    k = int(pliegues.max()) + 1
+    metricas = [_metricas_por_pliegue(y, predicho, asignacion, k) for asignacion in pliegues]
+    rmse, mae, r2 = (np.array(m) for m in zip(*metricas))
+    return ResultadoValidacion(rmse, mae, r2)
@@ -0,0 +1,32 @@
+# conftest.py - Datos sintéticos compartidos por las pruebas de los motores numéricos
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# Los módulos viven en la raíz del repositorio (se importan igual que desde Main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PREDICTORES = ['pH_CAMPO', 'DQO_TOT', 'OD_mg/L', 'SST', 'TEMP_AGUA']
+
+
+def generar_datos(n=200, semilla=0):
+    """Predictores con escalas y correlaciones parecidas a las de la base y una DBO5 lineal con ruido"""
+    generador = np.random.default_rng(semilla)
+    dqo = generador.gamma(4.0, 40.0, n)
+    X = pd.DataFrame({
+        'pH_CAMPO': generador.normal(7.5, 0.4, n),
+        'DQO_TOT': dqo,
+        'OD_mg/L': np.clip(8 - 0.01 * dqo + generador.normal(0, 1.0, n), 0.1, None),
+        'SST': 0.6 * dqo + generador.normal(0, 30.0, n),
+        'TEMP_AGUA': generador.normal(20.0, 3.0, n),
+    })
+    y = pd.Series(25 + 0.34 * X['DQO_TOT'] - 7.6 * X['OD_mg/L'] + 0.05 * X['SST'] + generador.normal(0, 8.0, n),
+                  name='DBO5')
+    return X, y
+
+
+@pytest.fixture
+def datos():
+    return generar_datos()
@@ -0,0 +1,70 @@
+# Pruebas del bootstrap por pesos: ajustes contra OLS sobre filas repetidas e intervalos contra scipy
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from scipy import stats
+from Bootstrap import _intervalos, _jackknife, _productos, _resolver_pesos, bootstrap_regresion
+
+
+def test_pesos_igual_a_filas_repetidas(datos):
+    X, y = datos
+    diseño = sm.add_constant(X).to_numpy()
+    n, p = diseño.shape
+    pesos = np.random.default_rng(5).multinomial(n, np.full(n, 1.0 / n), size=4).astype(np.float64)
+    coeficientes = _resolver_pesos(_productos(diseño, y.to_numpy()), pesos, p)
+    for fila, w in zip(coeficientes, pesos.astype(int)):
+        ols = sm.OLS(np.repeat(y.to_numpy(), w), np.repeat(diseño, w, axis=0)).fit()
+        np.testing.assert_allclose(fila, ols.params, rtol=1e-7)
+
+
+def test_jackknife_igual_a_dejar_uno_fuera(datos):
+    X, y = datos
+    diseño = sm.add_constant(X).to_numpy()
+    jackknife = _jackknife(diseño, y.to_numpy())
+    for i in (0, 17, len(y) - 1):
+        dentro = np.arange(len(y)) != i
+        ols = sm.OLS(y.to_numpy()[dentro], diseño[dentro]).fit()
+        np.testing.assert_allclose(jackknife[i], ols.params, rtol=1e-7)
+
+
+@pytest.mark.parametrize('metodo', ['percentile', 'BCa'])
+def test_intervalos_como_scipy(metodo):
+    # Media de una muestra asimétrica: sesgo y aceleración distintos de cero
+    muestra = np.random.default_rng(6).exponential(2.0, 60)
+    scipy_bootstrap = stats.bootstrap((muestra,), np.mean, n_resamples=3000, method=metodo,
+                                      confidence_level=0.9, rng=np.random.default_rng(7))
+    muestras = scipy_bootstrap.bootstrap_distribution[:, None]
+    jackknife = ((muestra.sum() - muestra) / (len(muestra) - 1))[:, None]
+    percentil, bca = _intervalos(np.array([muestra.mean()]), muestras, jackknife, 0.9)
+    esperado = percentil if metodo == 'percentile' else bca
+    intervalo = scipy_bootstrap.confidence_interval
+    np.testing.assert_allclose(esperado[:, 0], [intervalo.low, intervalo.high], rtol=1e-10)
+
+
+def test_bootstrap_regresion(datos):
+    X, y = datos
+    X_nuevo = X.iloc[:3].to_numpy()
+    resultado = bootstrap_regresion(X, y, repeticiones=400, semilla=11, X_nuevo=X_nuevo, lote=64)
+    ols = sm.OLS(y, sm.add_constant(X)).fit()
+    assert resultado.nombres == ['const'] + list(X.columns)
+    np.testing.assert_allclose(resultado.coeficientes, ols.params, rtol=1e-8)
+    np.testing.assert_allclose(resultado.predicciones, ols.fittedvalues[:3], rtol=1e-8)
+    assert resultado.muestras.shape == (400, X.shape[1] + 1)
+    np.testing.assert_allclose(resultado.muestras_prediccion,
+                               resultado.muestras @ sm.add_constant(X_nuevo, has_constant='add').T, rtol=1e-10)
+
+    tabla = resultado.intervalos
+    np.testing.assert_allclose(tabla['percentil_inf'], np.percentile(resultado.muestras, 2.5, axis=0))
+    np.testing.assert_allclose(tabla['error_estandar'], resultado.muestras.std(axis=0, ddof=1))
+    # Con 200 filas el error estándar bootstrap queda cerca del error estándar de OLS
+    np.testing.assert_allclose(tabla['error_estandar'], ols.bse, rtol=0.25)
+
+
+def test_bootstrap_reproducible(datos):
+    X, y = datos
+    a = bootstrap_regresion(X, y, repeticiones=50, semilla=3)
+    b = bootstrap_regresion(X, y, repeticiones=50, semilla=3, lote=7)  # El tamaño del lote no cambia los remuestreos
+    np.testing.assert_allclose(a.muestras, b.muestras, rtol=1e-8, atol=1e-10)
+    c = bootstrap_regresion(X, y, repeticiones=50, semilla=3, procesos=2)
+    d = bootstrap_regresion(X, y, repeticiones=50, semilla=3, procesos=2)
+    np.testing.assert_array_equal(c.muestras, d.muestras)
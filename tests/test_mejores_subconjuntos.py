@@ -0,0 +1,56 @@
+# Pruebas de best_subset_regression (búsqueda sobre la matriz de Gram) contra OLS de statsmodels
+from itertools import combinations
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from AnalisisRegresion import best_subset_regression, mejores_subconjuntos
+
+
+def _referencia(X, y):
+    completo = sm.OLS(y, sm.add_constant(X)).fit()
+    sigma2 = completo.ssr / completo.df_resid
+    filas = {}
+    for k in range(1, X.shape[1] + 1):
+        for variables in combinations(X.columns, k):
+            ols = sm.OLS(y, sm.add_constant(X[list(variables)])).fit()
+            filas[variables] = {'rss': ols.ssr, 'r2': ols.rsquared, 'r2_ajustado': ols.rsquared_adj,
+                                'aic': ols.aic, 'bic': ols.bic, 'cp': ols.ssr / sigma2 - len(y) + 2 * (k + 1)}
+    return filas
+
+
+def test_todos_los_subconjuntos(datos):
+    X, y = datos
+    resultado = best_subset_regression(X, y)
+    referencia = _referencia(X, y)
+    assert len(resultado) == len(referencia) == 2 ** X.shape[1] - 1
+    for fila in resultado.itertuples(index=False):
+        esperado = referencia[fila.variables]
+        assert fila.num_variables == len(fila.variables)
+        for metrica, valor in esperado.items():
+            assert getattr(fila, metrica) == pytest.approx(valor, rel=1e-9), (fila.variables, metrica)
+    assert resultado['bic'].is_monotonic_increasing
+
+
+def test_max_variables(datos):
+    X, y = datos
+    resultado = best_subset_regression(X, y, max_variables=2)
+    assert resultado['num_variables'].max() == 2
+    assert len(resultado) == 5 + 10
+
+
+def test_procesos_igual_que_serie(datos):
+    # Lotes pequeños para que el grupo de procesos reciba varios lotes por trabajador
+    X, y = datos
+    serie = best_subset_regression(X, y, procesos=1, tamano_lote=3)
+    paralelo = best_subset_regression(X, y, procesos=2, tamano_lote=3)
+    assert list(serie['variables']) == list(paralelo['variables'])
+    np.testing.assert_allclose(serie[['rss', 'aic', 'bic', 'cp']], paralelo[['rss', 'aic', 'bic', 'cp']], rtol=1e-12)
+
+
+def test_mejores_por_criterio(datos):
+    X, y = datos
+    resultado = best_subset_regression(X, y)
+    mejores = mejores_subconjuntos(resultado, top=3)
+    assert mejores['r2_ajustado']['r2_ajustado'].iloc[0] == resultado['r2_ajustado'].max()
+    for criterio in ('aic', 'bic', 'cp'):
+        assert mejores[criterio][criterio].iloc[0] == resultado[criterio].min()
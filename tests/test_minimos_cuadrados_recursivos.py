@@ -0,0 +1,80 @@
+# Pruebas de mínimos cuadrados recursivos (actualizaciones, downdates de la ventana y olvido) contra OLS/WLS
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from MinimosCuadradosRecursivos import MinimosCuadradosRecursivos, trayectoria
+
+COLUMNAS = ['DQO_TOT', 'OD_mg/L']
+
+
+def test_sin_ventana_igual_a_ols(datos):
+    X, y = datos
+    modelo = MinimosCuadradosRecursivos(COLUMNAS).actualizar_lote(X[COLUMNAS], y)
+    ols = sm.OLS(y, sm.add_constant(X[COLUMNAS])).fit()
+    assert modelo.nobs == len(y)
+    np.testing.assert_allclose(modelo.params, ols.params, rtol=1e-8)
+    np.testing.assert_allclose(modelo.bse, ols.bse, rtol=1e-7)
+    np.testing.assert_allclose(modelo.pvalues, ols.pvalues, rtol=1e-6)
+    for atributo in ('ssr', 'rsquared', 'rsquared_adj', 'aic', 'bic', 'df_resid'):
+        assert getattr(modelo, atributo) == pytest.approx(getattr(ols, atributo), rel=1e-7), atributo
+    np.testing.assert_allclose(modelo.predict(X[COLUMNAS].iloc[:5]), ols.fittedvalues[:5], rtol=1e-8)
+    assert modelo.predict([3.0, 150.0]) == pytest.approx(ols.params @ [1.0, 3.0, 150.0], rel=1e-8)
+
+
+def test_ventana_igual_a_ols_de_las_ultimas_filas(datos):
+    # Cada fila que sale de la ventana se descuenta (downdate); tras cada paso el modelo
+    # debe coincidir con el OLS de exactamente las últimas `ventana` filas
+    X, y = datos
+    ventana = 25
+    modelo = MinimosCuadradosRecursivos(COLUMNAS, ventana=ventana)
+    diseño = sm.add_constant(X[COLUMNAS]).to_numpy()
+    for i in range(len(y)):
+        modelo.actualizar(X[COLUMNAS].iloc[i], y.iloc[i])
+        if i + 1 >= ventana and i % 7 == 0:
+            inicio = i + 1 - ventana
+            ols = sm.OLS(y.to_numpy()[inicio:i + 1], diseño[inicio:i + 1]).fit()
+            assert modelo.nobs == ventana
+            np.testing.assert_allclose(modelo.params, ols.params, rtol=1e-6)
+            assert modelo.rsquared == pytest.approx(ols.rsquared, rel=1e-6)
+
+
+def test_olvido_igual_a_wls(datos):
+    X, y = datos
+    olvido = 0.97
+    modelo = MinimosCuadradosRecursivos(COLUMNAS, olvido=olvido).actualizar_lote(X[COLUMNAS], y)
+    pesos = olvido ** np.arange(len(y))[::-1]
+    wls = sm.WLS(y, sm.add_constant(X[COLUMNAS]), weights=pesos).fit()
+    np.testing.assert_allclose(modelo.params, wls.params, rtol=1e-7)
+    assert modelo.ssr == pytest.approx(wls.ssr, rel=1e-7)
+
+
+def test_ventana_con_olvido(datos):
+    X, y = datos
+    olvido, ventana = 0.9, 30
+    modelo = MinimosCuadradosRecursivos(COLUMNAS, olvido=olvido, ventana=ventana).actualizar_lote(X[COLUMNAS], y)
+    ultimas = slice(len(y) - ventana, len(y))
+    wls = sm.WLS(y[ultimas], sm.add_constant(X[COLUMNAS][ultimas]), weights=olvido ** np.arange(ventana)[::-1]).fit()
+    np.testing.assert_allclose(modelo.params, wls.params, rtol=1e-6)
+
+
+def test_no_listo_hasta_tener_filas_suficientes():
+    modelo = MinimosCuadradosRecursivos(['x'])
+    modelo.actualizar([1.0], 2.0)
+    assert not modelo.listo
+    assert np.isnan(modelo.params).all()
+    modelo.actualizar([2.0], 3.0)
+    assert modelo.listo
+    np.testing.assert_allclose(modelo.params, [1.0, 1.0])
+    with pytest.raises(ValueError):
+        MinimosCuadradosRecursivos(['x'], olvido=0)
+
+
+def test_trayectoria_predice_un_paso_adelante(datos):
+    X, y = datos
+    ventana = 20
+    tabla = trayectoria(X[COLUMNAS], y, ventana=ventana)
+    diseño = sm.add_constant(X[COLUMNAS]).to_numpy()
+    assert tabla['error_un_paso'].iloc[:3].isna().all()
+    for i in (ventana, 77, len(y) - 1):
+        ols = sm.OLS(y.to_numpy()[i - ventana:i], diseño[i - ventana:i]).fit()
+        assert tabla['error_un_paso'].iloc[i] == pytest.approx(y.iloc[i] - diseño[i] @ ols.params, rel=1e-6)
@@ -0,0 +1,98 @@
+# Pruebas de MotorStepwise contra ajustes completos de statsmodels en cada paso
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from MotorStepwise import FactorCholesky, seleccion_stepwise
+
+
+def _ajuste(X, y, variables):
+    return sm.OLS(y, sm.add_constant(X[variables], has_constant='add')).fit()
+
+
+def _hacia_atras_p(X, y, umbral=0.05):
+    # Eliminación hacia atrás de referencia: reajusta el modelo completo en cada paso
+    variables = list(X.columns)
+    while variables:
+        p = _ajuste(X, y, variables).pvalues.drop('const')
+        if p.max() <= umbral:
+            break
+        variables.remove(p.idxmax())
+    return variables
+
+
+def _hacia_adelante(X, y, criterio):
+    variables = []
+    actual = getattr(_ajuste(X, y, variables), criterio)
+    while True:
+        candidatos = {v: getattr(_ajuste(X, y, variables + [v]), criterio) for v in X.columns if v not in variables}
+        if not candidatos:
+            return variables
+        mejor = min(candidatos, key=candidatos.get)
+        if candidatos[mejor] >= actual:
+            return variables
+        variables.append(mejor)
+        actual = candidatos[mejor]
+
+
+def test_factor_cholesky_agregar_y_quitar():
+    generador = np.random.default_rng(1)
+    A = generador.normal(size=(40, 6))
+    gram = A.T @ A
+    factor = FactorCholesky(gram, [0, 2, 3, 5])
+    factor.quitar(2)  # Rotaciones de Givens desde el medio
+    factor.agregar(1)
+    factor.quitar(0)
+    activas = factor.activas
+    assert activas == [3, 5, 1]
+    np.testing.assert_allclose(np.tril(factor.R, -1), 0.0, atol=1e-12)  # Triangular salvo redondeo
+    np.testing.assert_allclose(factor.R.T @ factor.R, gram[np.ix_(activas, activas)], rtol=1e-10)
+
+
+def test_factor_cholesky_rechaza_columna_colineal():
+    A = np.random.default_rng(2).normal(size=(30, 3))
+    A = np.column_stack([A, A[:, 0] + A[:, 1]])
+    with pytest.raises(np.linalg.LinAlgError):
+        FactorCholesky(A.T @ A, [0, 1, 3])
+
+
+def test_hacia_atras_por_p_valor(datos):
+    X, y = datos
+    resultado = seleccion_stepwise(X, y, direccion='backward', criterio='p')
+    assert resultado.variables[1:] == _hacia_atras_p(X, y)
+
+
+@pytest.mark.parametrize('criterio', ['aic', 'bic'])
+def test_hacia_adelante_por_criterio(datos, criterio):
+    X, y = datos
+    resultado = seleccion_stepwise(X, y, direccion='forward', criterio=criterio)
+    assert resultado.variables[1:] == _hacia_adelante(X, y, criterio)
+
+
+@pytest.mark.parametrize('direccion', ['backward', 'forward', 'bidirectional'])
+def test_estadisticas_del_modelo_elegido(datos, direccion):
+    X, y = datos
+    resultado = seleccion_stepwise(X, y, direccion=direccion, criterio='p')
+    ols = _ajuste(X, y, resultado.variables[1:])
+    for nombre in resultado.variables:
+        assert resultado.coeficientes[nombre] == pytest.approx(ols.params[nombre], rel=1e-8)
+        assert resultado.errores[nombre] == pytest.approx(ols.bse[nombre], rel=1e-8)
+        assert resultado.t[nombre] == pytest.approx(ols.tvalues[nombre], rel=1e-8)
+        assert resultado.p_valores[nombre] == pytest.approx(ols.pvalues[nombre], rel=1e-6, abs=1e-300)
+    assert resultado.rss == pytest.approx(ols.ssr, rel=1e-8)
+    assert resultado.r2 == pytest.approx(ols.rsquared, rel=1e-10)
+    assert resultado.r2_ajustado == pytest.approx(ols.rsquared_adj, rel=1e-10)
+    assert resultado.aic == pytest.approx(ols.aic, rel=1e-10)
+    assert resultado.bic == pytest.approx(ols.bic, rel=1e-10)
+    assert resultado.f_pvalor == pytest.approx(ols.f_pvalue, rel=1e-6, abs=1e-300)
+
+
+def test_pasos_intermedios(datos):
+    # Cada paso guarda el modelo al que llegó; sus coeficientes son los del OLS de esas variables
+    X, y = datos
+    resultado = seleccion_stepwise(X, y, direccion='bidirectional', criterio='aic')
+    assert resultado.pasos
+    for paso in resultado.pasos:
+        modelo = paso['modelo']
+        ols = _ajuste(X, y, modelo.variables[1:])
+        np.testing.assert_allclose([modelo.coeficientes[v] for v in modelo.variables],
+                                   ols.params[modelo.variables], rtol=1e-8)
@@ -0,0 +1,59 @@
+# Pruebas del IRLS acelerado contra statsmodels RLM (Huber y Tukey, escala MAD, covarianza H1)
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from RegresionRobusta import escala_mad, regresion_robusta
+
+NORMAS_STATSMODELS = {'huber': sm.robust.norms.HuberT, 'tukey': sm.robust.norms.TukeyBiweight}
+COLUMNAS = ['DQO_TOT', 'OD_mg/L', 'SST']
+
+
+@pytest.fixture
+def con_atipicos(datos):
+    X, y = datos
+    y = y.copy()
+    y.iloc[::15] += 120.0  # Muestras contaminadas muy por encima de la recta
+    return X[COLUMNAS], y
+
+
+@pytest.mark.parametrize('norma', ['huber', 'tukey'])
+def test_igual_a_rlm(con_atipicos, norma):
+    X, y = con_atipicos
+    resultado = regresion_robusta(X, y, norma=norma)
+    rlm = sm.RLM(y, sm.add_constant(X), M=NORMAS_STATSMODELS[norma]()).fit(conv='coefs', tol=1e-12, maxiter=500)
+    assert resultado.convergio
+    np.testing.assert_allclose(resultado.params, rlm.params, rtol=1e-6)
+    np.testing.assert_allclose(resultado.bse, rlm.bse, rtol=1e-5)
+    np.testing.assert_allclose(resultado.pvalues, rlm.pvalues, rtol=1e-4, atol=1e-300)
+    assert resultado.scale == pytest.approx(rlm.scale, rel=1e-6)
+    np.testing.assert_allclose(resultado.weights, rlm.weights, atol=1e-6)
+    pd.testing.assert_index_equal(resultado.fittedvalues.index, y.index)
+
+
+def test_menos_iteraciones_que_irls_simple(con_atipicos):
+    X, y = con_atipicos
+    resultado = regresion_robusta(X, y, norma='tukey')
+    rlm = sm.RLM(y, sm.add_constant(X), M=sm.robust.norms.TukeyBiweight()).fit(conv='coefs', tol=1e-8,
+                                                                                maxiter=500)
+    assert resultado.iteraciones <= rlm.fit_history['iteration']
+
+
+def test_tukey_anula_los_atipicos(con_atipicos):
+    X, y = con_atipicos
+    resultado = regresion_robusta(X, y, norma='tukey')
+    atipicos = np.zeros(len(y), dtype=bool)
+    atipicos[::15] = True
+    assert (resultado.weights[atipicos] == 0).all()
+    reponderadas, anuladas = resultado.filas_reponderadas
+    assert anuladas >= atipicos.sum() and reponderadas >= anuladas
+
+
+def test_escala_mad():
+    residuos = np.array([-3.0, -1.0, 0.0, 2.0, 10.0])
+    assert escala_mad(residuos) == pytest.approx(sm.robust.scale.mad(residuos, center=0.0))
+
+
+def test_norma_desconocida(con_atipicos):
+    with pytest.raises(ValueError):
+        regresion_robusta(*con_atipicos, norma='cauchy')
@@ -0,0 +1,88 @@
+# Pruebas de las rutas de lasso y ridge (forma de Gram) contra scikit-learn sobre los términos estandarizados
+import numpy as np
+import pytest
+from sklearn.linear_model import Lasso, Ridge
+from sklearn.preprocessing import StandardScaler
+from Regularizacion import expandir_variables, ruta_regularizacion
+from ValidacionCruzada import pliegues_aleatorios
+
+COLUMNAS = ['DQO_TOT', 'OD_mg/L', 'SST']
+LAMBDAS = np.geomspace(5.0, 5e-3, 8)
+
+
+def _sklearn(metodo, Z, y, lam):
+    # Mismos objetivos que Regularizacion: lasso (1/2n)||r||² + λ||b||₁ y ridge (1/2n)||r||² + (λ/2)||b||²
+    escalador = StandardScaler().fit(Z)
+    if metodo == 'lasso':
+        modelo = Lasso(alpha=lam, tol=1e-14, max_iter=1_000_000)
+    else:
+        modelo = Ridge(alpha=lam * len(y), solver='cholesky')
+    modelo.fit(escalador.transform(Z), y)
+    coeficientes = modelo.coef_ / escalador.scale_
+    return coeficientes, modelo.intercept_ - coeficientes @ escalador.mean_
+
+
+def test_expandir_variables(datos):
+    X, _ = datos
+    expandido = expandir_variables(X[COLUMNAS])
+    assert list(expandido.columns) == COLUMNAS + ['DQO_TOT^2', 'DQO_TOT×OD_mg/L', 'DQO_TOT×SST', 'OD_mg/L^2',
+                                                   'OD_mg/L×SST', 'SST^2']
+    np.testing.assert_allclose(expandido['OD_mg/L×SST'], X['OD_mg/L'] * X['SST'])
+    assert list(expandir_variables(X[COLUMNAS], interacciones=False).columns) == \
+        COLUMNAS + ['DQO_TOT^2', 'OD_mg/L^2', 'SST^2']
+    assert list(expandir_variables(X[COLUMNAS], grado=1).columns) == COLUMNAS
+
+
+@pytest.mark.parametrize('metodo', ['lasso', 'ridge'])
+def test_ruta_igual_a_sklearn(datos, metodo):
+    X, y = datos
+    resultado = ruta_regularizacion(X[COLUMNAS], y, metodo=metodo, lambdas=LAMBDAS)
+    Z = expandir_variables(X[COLUMNAS]).to_numpy()
+    escala = Z.std(axis=0)
+    for i, lam in enumerate(LAMBDAS):
+        coeficientes, constante = _sklearn(metodo, Z, y.to_numpy(), lam)
+        # Se comparan en unidades estandarizadas, donde todos los términos pesan lo mismo
+        np.testing.assert_allclose(resultado.coeficientes.iloc[i] * escala, coeficientes * escala,
+                                   rtol=1e-5, atol=1e-6)
+        assert resultado.constantes[i] == pytest.approx(constante, rel=1e-5)
+        if metodo == 'lasso':
+            assert (resultado.coeficientes.iloc[i] != 0).sum() == (coeficientes != 0).sum()
+
+
+@pytest.mark.parametrize('metodo', ['lasso', 'ridge'])
+def test_validacion_cruzada_igual_a_reajustes(datos, metodo):
+    # Cada pliegue se reestandariza con sus propias filas de entrenamiento
+    X, y = datos
+    pliegues = pliegues_aleatorios(len(y), k=5, semilla=2)[0]
+    resultado = ruta_regularizacion(X[COLUMNAS], y, metodo=metodo, lambdas=LAMBDAS, pliegues=pliegues)
+    Z = expandir_variables(X[COLUMNAS]).to_numpy()
+    y = y.to_numpy()
+    sse = np.zeros((5, len(LAMBDAS)))
+    for f in range(5):
+        prueba = pliegues == f
+        for i, lam in enumerate(LAMBDAS):
+            coeficientes, constante = _sklearn(metodo, Z[~prueba], y[~prueba], lam)
+            sse[f, i] = np.sum((y[prueba] - constante - Z[prueba] @ coeficientes) ** 2)
+    np.testing.assert_allclose(resultado.error_cv, np.sqrt(sse.sum(axis=0) / len(y)), rtol=1e-5)
+    rmse_pliegue = np.sqrt(sse / np.bincount(pliegues)[:, None])
+    np.testing.assert_allclose(resultado.error_cv_se, rmse_pliegue.std(axis=0, ddof=1) / np.sqrt(5), rtol=1e-4)
+
+
+def test_lambdas_elegidos(datos):
+    X, y = datos
+    resultado = ruta_regularizacion(X[COLUMNAS], y, metodo='lasso', num_lambdas=30)
+    assert len(resultado.lambdas) == 30
+    assert (resultado.coeficientes.iloc[0] == 0).all()  # lambda_max deja todos los términos fuera
+    assert resultado.lambda_1se >= resultado.lambda_min
+    assert resultado.error_cv[resultado.indice_1se] <= \
+        resultado.error_cv[resultado.indice_min] + resultado.error_cv_se[resultado.indice_min]
+    terminos = resultado.terminos()
+    assert (terminos != 0).all()
+    Z = expandir_variables(X[COLUMNAS])
+    np.testing.assert_allclose(resultado.predecir(Z),
+                               resultado.constantes[resultado.indice_1se] + Z[terminos.index] @ terminos)
+
+
+def test_metodo_desconocido(datos):
+    with pytest.raises(ValueError):
+        ruta_regularizacion(*datos, metodo='elastic')
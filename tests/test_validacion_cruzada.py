@@ -0,0 +1,90 @@
+# Pruebas de la validación cruzada por estadísticas suficientes contra reajustes explícitos por pliegue
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from ConjuntoDatos import SIN_FECHA
+from ValidacionCruzada import (SIN_PLIEGUE, pliegues_aleatorios, pliegues_por_año, validacion_cruzada,
+                               validacion_modelo_fijo)
+
+
+def _reajustes(X, y, asignacion):
+    # Métricas de referencia: un OLS de statsmodels por pliegue sobre las filas de entrenamiento
+    diseño = sm.add_constant(np.asarray(X, dtype=np.float64))
+    y = np.asarray(y, dtype=np.float64)
+    rmse, mae, r2, coeficientes = [], [], [], []
+    for f in range(asignacion.max() + 1):
+        prueba = asignacion == f
+        ols = sm.OLS(y[~prueba], diseño[~prueba]).fit()
+        error = y[prueba] - diseño[prueba] @ ols.params
+        rmse.append(np.sqrt(np.mean(error ** 2)))
+        mae.append(np.mean(np.abs(error)))
+        r2.append(1 - np.sum(error ** 2) / np.sum((y[prueba] - y[prueba].mean()) ** 2))
+        coeficientes.append(ols.params)
+    return np.array(rmse), np.array(mae), np.array(r2), np.array(coeficientes)
+
+
+def test_pliegues_aleatorios():
+    pliegues = pliegues_aleatorios(23, k=5, repeticiones=3, semilla=4)
+    assert pliegues.shape == (3, 23)
+    for asignacion in pliegues:
+        assert sorted(np.bincount(asignacion)) == [4, 4, 5, 5, 5]
+    np.testing.assert_array_equal(pliegues, pliegues_aleatorios(23, k=5, repeticiones=3, semilla=4))
+    with pytest.raises(ValueError):
+        pliegues_aleatorios(4, k=5)
+
+
+def test_k_pliegues_repetidos(datos):
+    X, y = datos
+    pliegues = pliegues_aleatorios(len(y), k=10, repeticiones=3, semilla=0)
+    resultado = validacion_cruzada(X, y, pliegues)
+    assert resultado.nombres == ['const'] + list(X.columns)
+    for r, asignacion in enumerate(pliegues):
+        rmse, mae, r2, coeficientes = _reajustes(X, y, asignacion)
+        np.testing.assert_allclose(resultado.rmse[r], rmse, rtol=1e-8)
+        np.testing.assert_allclose(resultado.mae[r], mae, rtol=1e-8)
+        np.testing.assert_allclose(resultado.r2[r], r2, rtol=1e-8)
+        np.testing.assert_allclose(resultado.coeficientes[r], coeficientes, rtol=1e-8)
+
+
+def test_resumen(datos):
+    X, y = datos
+    resultado = validacion_cruzada(X, y, pliegues_aleatorios(len(y), repeticiones=2, semilla=1))
+    resumen = resultado.resumen()
+    assert resumen.loc['rmse', 'media'] == pytest.approx(resultado.rmse.mean())
+    assert resumen.loc['r2', 'mediana'] == pytest.approx(np.median(resultado.r2))
+
+
+def test_por_año_sin_filas_sin_fecha(datos):
+    X, y = datos
+    años = np.repeat([2012.0, 2013.0, 2014.0, 2015.0], len(y) // 4)
+    años[:7] = SIN_FECHA
+    años[-5:] = np.nan
+    pliegues = pliegues_por_año(años)
+    assert pliegues.shape == (1, len(y))
+    assert np.all(pliegues[0, :7] == SIN_PLIEGUE) and np.all(pliegues[0, -5:] == SIN_PLIEGUE)
+    assert set(pliegues[0, 7:-5]) == {0, 1, 2, 3}
+
+    resultado = validacion_cruzada(X, y, pliegues)
+    usadas = slice(7, -5)
+    rmse, mae, r2, coeficientes = _reajustes(X[usadas], y[usadas], pliegues[0, usadas])
+    np.testing.assert_allclose(resultado.rmse[0], rmse, rtol=1e-8)
+    np.testing.assert_allclose(resultado.coeficientes[0], coeficientes, rtol=1e-8)
+
+
+def test_por_año_agrupado_y_un_solo_año():
+    años = np.array([2010, 2010, 2011, 2012, 2013, 2013, SIN_FECHA])
+    np.testing.assert_array_equal(pliegues_por_año(años, bloques=2), [[0, 0, 0, 1, 1, 1, SIN_PLIEGUE]])
+    with pytest.raises(ValueError):
+        pliegues_por_año([2010, 2010, SIN_FECHA, np.nan])
+
+
+def test_modelo_fijo():
+    generador = np.random.default_rng(3)
+    y = generador.normal(10, 2, 50)
+    predicho = y + generador.normal(0, 1, 50)
+    asignacion = np.arange(50) % 5
+    resultado = validacion_modelo_fijo(y, predicho, asignacion)
+    for f in range(5):
+        error = (y - predicho)[asignacion == f]
+        assert resultado.rmse[0, f] == pytest.approx(np.sqrt(np.mean(error ** 2)))
+        assert resultado.mae[0, f] == pytest.approx(np.mean(np.abs(error)))